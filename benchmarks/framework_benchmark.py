@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+framework_benchmark.py
+Overhead of the load generators themselves, measured against the local
+target_server, with a JSON baseline and a regression check.
+
+Suites (each runs in its own subprocess, so gevent monkey patching from
+Locust does not leak into the others; a suite whose dependencies are not
+installed is skipped):
+  locust         requests/s and requests/s per CPU core for HttpUser and
+                 FastHttpUser running PracticeLoginScenario
+  listener       per-request cost of the events.request listener (ns)
+  serialization  generate_latest() and histogram dump time for a large registry
+  playwright     iterations/s and RSS (incl. browser processes) of the runner
+  selenium       same for the Selenium runner
+
+Usage:
+  python benchmarks/framework_benchmark.py run --output baseline.json
+  python benchmarks/framework_benchmark.py run --output current.json
+  python benchmarks/framework_benchmark.py compare baseline.json current.json
+
+compare exits with 1 when a metric got worse by more than --threshold and
+a permutation test on the repeated samples gives p < --alpha. The Locust
+login flow (--login-flow) decides how many requests an iteration makes, so
+it is stored in the report's meta and compare warns when it differs.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCUST_DIR = os.path.join(ROOT, "my_locust")
+TARGET_SERVER = os.path.join(ROOT, "target_server", "target_server.py")
+SUITES = ("locust", "listener", "serialization", "playwright", "selenium")
+PERMUTATIONS = 10000
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Target on port {port} did not start")
+
+
+def start_target(processes):
+    port = free_port()
+    target = subprocess.Popen([sys.executable, TARGET_SERVER, "--port", str(port),
+                               "--processes", str(processes)], stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return target, f"http://127.0.0.1:{port}"
+
+
+def metric(results, name, value, unit, better):
+    entry = results.setdefault(name, {"unit": unit, "better": better, "samples": []})
+    entry["samples"].append(value)
+
+
+# --- suites (run inside the child process) ---
+
+def suite_locust(options, results):
+    sys.path.insert(0, LOCUST_DIR)
+    os.environ["LOCUST_HOST"] = options.target
+    os.environ["LOCUST_LOGIN_FLOW"] = options.login_flow
+    from engine_benchmark import run_engine
+    from locust_login_test import WebsiteUser, FastWebsiteUser
+
+    for engine, user_class in (("http", WebsiteUser), ("fast", FastWebsiteUser)):
+        run_engine(user_class, options.target, users=5, iterations=5)  # warm-up
+        for _ in range(options.repeat):
+            r = run_engine(user_class, options.target, options.users, options.iterations)
+            metric(results, f"locust_{engine}_rps", r["rps"], "req/s", "higher")
+            metric(results, f"locust_{engine}_rps_per_core", r["rps_per_core"], "req/s/core", "higher")
+            # Throughput of a failing flow measures the error path
+            metric(results, f"locust_{engine}_failure_ratio", r["failures"] / r["requests"] if r["requests"] else 0.0,
+                   "ratio", "lower")
+
+
+def suite_listener(options, results):
+    sys.path.insert(0, LOCUST_DIR)
+    from listener_benchmark import make_samples, bench_buffered
+
+    samples = make_samples(options.requests)
+    for _ in range(options.repeat):
+        seconds = bench_buffered(samples, flush_every=2500)
+        metric(results, "listener_ns_per_request", seconds / len(samples) * 1e9, "ns", "lower")
+
+
+def suite_serialization(options, results):
+    sys.path.insert(0, LOCUST_DIR)
+    from prometheus_client import CollectorRegistry, Counter, generate_latest
+    from latency_histogram import LatencyHistogramCollector
+
+    rnd = random.Random(42)
+    registry = CollectorRegistry(auto_describe=False)
+    labels = ["method", "name", "response_code", "instance"]
+    counter = Counter("bench_request_success_total", "ok", labels, registry=registry)
+    latency = LatencyHistogramCollector("bench_request_duration_seconds", "duration", instance="bench")
+    registry.register(latency)
+    for i in range(options.names):
+        name = f"/endpoint/{i}"
+        for code in ("200", "302", "404", "500", "503"):
+            counter.labels(method="GET", name=name, response_code=code, instance="bench").inc(rnd.randint(1, 1000))
+        hist = latency.histogram(name)
+        for _ in range(2000):
+            hist.record(rnd.lognormvariate(11, 1))
+
+    path = os.path.join(tempfile.gettempdir(), f"bench_histograms_{os.getpid()}.json")
+    try:
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            generate_latest(registry)
+            metric(results, "serialization_generate_latest_ms", (time.perf_counter() - start) * 1000, "ms", "lower")
+            start = time.perf_counter()
+            latency.dump(path)
+            metric(results, "serialization_histogram_dump_ms", (time.perf_counter() - start) * 1000, "ms", "lower")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def tree_rss(proc):
+    rss = 0
+    for p in [proc] + proc.children(recursive=True):
+        try:
+            rss += p.memory_info().rss
+        except Exception:
+            pass
+    return rss
+
+
+def run_browser_runner(name, script, throughput_pattern, options, results):
+    import psutil
+
+    env = dict(os.environ, TARGET_BASE_URL=options.target, NUM_TESTS=str(options.browser_iterations))
+    workdir = os.path.dirname(script)
+    for _ in range(options.repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [sys.executable, script, "--export-metrics", "--metrics-file", os.path.join(tmp, "metrics.txt")]
+            proc = psutil.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True)
+            samples = []
+            start = time.perf_counter()
+            while proc.poll() is None:
+                samples.append((time.perf_counter() - start, tree_rss(proc)))
+                time.sleep(0.2)
+            output = proc.stdout.read()
+        match = re.search(throughput_pattern, output)
+        if proc.returncode != 0 or not match:
+            raise RuntimeError(f"{name} runner failed (exit {proc.returncode}):\n{output[-2000:]}")
+        it_per_s = float(match.group(1))
+        metric(results, f"{name}_iterations_per_s", it_per_s, "it/s", "higher")
+        if samples:
+            metric(results, f"{name}_peak_rss_mb", max(rss for _, rss in samples) / 2 ** 20, "MB", "lower")
+        if len(samples) >= 3:
+            # RSS growth rate converted to growth per iteration (a leak shows up here)
+            slope = statistics.linear_regression([t for t, _ in samples], [rss for _, rss in samples]).slope
+            metric(results, f"{name}_rss_growth_kb_per_iteration", slope / it_per_s / 1024, "KB", "lower")
+
+
+def suite_playwright(options, results):
+    run_browser_runner("playwright", os.path.join(ROOT, "playwright", "playwright_login_test.py"),
+                       r"\(([\d.]+) it/s", options, results)
+
+
+def suite_selenium(options, results):
+    run_browser_runner("selenium", os.path.join(ROOT, "selenium", "selenium_login_test.py"),
+                       r"Throughput: ([\d.]+) iterations/s", options, results)
+
+
+# --- run / compare ---
+
+def run_suite_subprocess(suite, options, target):
+    with tempfile.TemporaryDirectory() as tmp:
+        result_file = os.path.join(tmp, "result.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "run-suite", suite, "--result-file", result_file,
+               "--target", target, "--repeat", str(options.repeat), "--users", str(options.users),
+               "--iterations", str(options.iterations), "--requests", str(options.requests),
+               "--names", str(options.names), "--browser-iterations", str(options.browser_iterations),
+               "--login-flow", options.login_flow]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0 or not os.path.exists(result_file):
+            lines = (proc.stderr or proc.stdout).strip().splitlines()
+            print(f"[SKIP] {suite}: {lines[-1] if lines else f'exit {proc.returncode}'}")
+            return {}
+        with open(result_file, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def command_run(options):
+    suites = [s.strip() for s in options.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+    target, target_url = start_target(options.target_processes)
+    results = {}
+    try:
+        for suite in suites:
+            print(f"[INFO] running {suite} ...")
+            results.update(run_suite_subprocess(suite, options, target_url))
+    finally:
+        target.terminate()
+        target.wait()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": options.repeat,
+            "locust_login_flow": options.login_flow,
+        },
+        "results": results,
+    }
+    with open(options.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_results(results)
+    print(f"[INFO] results written to {options.output}")
+
+
+def command_run_suite(options):
+    results = {}
+    globals()[f"suite_{options.suite}"](options, results)
+    with open(options.result_file, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+def print_results(results):
+    print(f"{'metric':<44}{'median':>12}{'stdev':>12}  unit")
+    for name, entry in sorted(results.items()):
+        samples = entry["samples"]
+        stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+        print(f"{name:<44}{statistics.median(samples):>12.2f}{stdev:>12.2f}  {entry['unit']}")
+
+
+def permutation_p_value(baseline, current, better):
+    """One-sided p-value that `current` is worse than `baseline` (difference of means)."""
+    sign = 1 if better == "lower" else -1
+    observed = sign * (statistics.fmean(current) - statistics.fmean(baseline))
+    pooled = list(baseline) + list(current)
+    n = len(current)
+    rnd = random.Random(0)
+    extreme = 0
+    for _ in range(PERMUTATIONS):
+        rnd.shuffle(pooled)
+        if sign * (statistics.fmean(pooled[:n]) - statistics.fmean(pooled[n:])) >= observed:
+            extreme += 1
+    return (extreme + 1) / (PERMUTATIONS + 1)
+
+
+def command_compare(options):
+    with open(options.baseline, encoding="utf-8") as f:
+        baseline_report = json.load(f)
+    with open(options.current, encoding="utf-8") as f:
+        current_report = json.load(f)
+    baseline, current = baseline_report["results"], current_report["results"]
+    flows = [report["meta"].get("locust_login_flow") for report in (baseline_report, current_report)]
+    if flows[0] != flows[1]:
+        print(f"[WARN] Locust login flow differs (baseline: {flows[0] or 'not recorded'}, "
+              f"current: {flows[1] or 'not recorded'}); locust_* metrics are not comparable")
+    regressions = 0
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>10}{'p':>8}  verdict")
+    for name in sorted(set(baseline) & set(current)):
+        base, cur = baseline[name], current[name]
+        better = base["better"]
+        base_median = statistics.median(base["samples"])
+        cur_median = statistics.median(cur["samples"])
+        change = (cur_median - base_median) / base_median if base_median else 0.0
+        worse_by = change if better == "lower" else -change
+        p = permutation_p_value(base["samples"], cur["samples"], better)
+        if worse_by > options.threshold and p < options.alpha:
+            verdict = "REGRESSION"
+            regressions += 1
+        elif -worse_by > options.threshold and p > 1 - options.alpha:
+            verdict = "improved"
+        else:
+            verdict = "ok"
+        print(f"{name:<44}{base_median:>12.2f}{cur_median:>12.2f}{change:>+10.1%}{p:>8.3f}  {verdict}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:<44}  only in {'baseline' if name in baseline else 'current'}")
+    if regressions:
+        print(f"[ERROR] {regressions} significant regression(s)")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator overhead benchmarks with regression baselines.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(p):
+        p.add_argument("--repeat", type=int, default=5, help="Samples per metric (more = more sensitive compare).")
+        p.add_argument("--users", type=int, default=50, help="locust: concurrent users")
+        p.add_argument("--iterations", type=int, default=100, help="locust: iterations per user")
+        p.add_argument("--requests", type=int, default=200000, help="listener: requests per sample")
+        p.add_argument("--names", type=int, default=500, help="serialization: distinct request names")
+        p.add_argument("--browser-iterations", type=int, default=20, help="playwright/selenium: NUM_TESTS")
+        p.add_argument("--login-flow", choices=["form", "static"], default="form",
+                       help="locust: LOCUST_LOGIN_FLOW against the target server")
+
+    run = sub.add_parser("run", help="Run suites and write a JSON result file.")
+    run.add_argument("--output", default="benchmark_results.json")
+    run.add_argument("--suites", default=",".join(SUITES))
+    run.add_argument("--target-processes", type=int, default=2)
+    add_run_options(run)
+
+    run_suite = sub.add_parser("run-suite", help=argparse.SUPPRESS)
+    run_suite.add_argument("suite", choices=SUITES)
+    run_suite.add_argument("--result-file", required=True)
+    run_suite.add_argument("--target", required=True)
+    add_run_options(run_suite)
+
+    compare = sub.add_parser("compare", help="Compare a result file against a baseline.")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.05, help="Minimum relative change to flag")
+    compare.add_argument("--alpha", type=float, default=0.05, help="Significance level")
+
+    options = parser.parse_args()
+    {"run": command_run, "run-suite": command_run_suite, "compare": command_compare}[options.command](options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+auth_state_base.py
+Zapamiętany stan zalogowania (cookies + localStorage) dla scenariuszy po logowaniu.
+
+Gdy samo logowanie nie jest przedmiotem testu, logujemy się formularzem raz,
+zapisujemy stan przeglądarki do pliku i każda nowa sesja (także po recyklingu
+i w każdym procesie puli) startuje już zalogowana. Plik jest ważny przez
+max_age sekund, więc kolejne przebiegi nie logują się ponownie. Format pliku to
+storage state Playwright ({"cookies": [...], "origins": [{"origin", "localStorage"}]}),
+więc obie suity mogą dzielić jeden plik. Zapis i wczytanie stanu są w
+auth_state.py każdej suity.
+
+Konfiguracja z ENV (te same zmienne w obu suitach):
+  AUTH_STATE          "1" = iteracje zaczynają od zapamiętanej sesji (tylko scenariusz pozytywny)
+  AUTH_STATE_FILE     ścieżka pliku (domyślnie auth_state.json)
+  AUTH_STATE_MAX_AGE  po ilu sekundach plik jest odświeżany nowym logowaniem
+"""
+
+import os
+import time
+
+
+class AuthStateBase:
+    def __init__(self, enabled=False, path="auth_state.json", max_age=3600):
+        self.enabled = enabled
+        self.path = path
+        self.max_age = max_age
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("AUTH_STATE", "0") == "1",
+            path=os.getenv("AUTH_STATE_FILE", "auth_state.json"),
+            max_age=float(os.getenv("AUTH_STATE_MAX_AGE", 3600)),
+        )
+
+    def fresh(self):
+        try:
+            return time.time() - os.path.getmtime(self.path) < self.max_age
+        except OSError:
+            return False
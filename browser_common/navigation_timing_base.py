@@ -0,0 +1,100 @@
+"""
+navigation_timing_base.py
+Pomiary po stronie przeglądarki (W3C Navigation Timing, Paint Timing, LCP, Resource Timing)
+zamiast zegara Pythona wokół całej iteracji – część wspólna obu suit.
+
+Po każdej nawigacji odczytujemy wpisy `performance` strony (TIMING_JS) i rozbijamy je na fazy:
+  dns, connect, tls, ttfb (requestStart -> responseStart), download,
+  dom_interactive, dom_complete, load, fcp, lcp (od początku nawigacji).
+Wartości trafiają do histogramów w przekazanym rejestrze. Uruchomienie TIMING_JS
+w przeglądarce jest w navigation_timing.py każdej suity.
+"""
+
+from prometheus_client import Histogram
+
+PHASE_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Zwraca Promise – LCP jest dostępne tylko przez PerformanceObserver (buffered)
+TIMING_JS = """() => new Promise(resolve => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+  const resources = performance.getEntriesByType('resource').map(r => [r.initiatorType, r.duration]);
+  let lcp = null;
+  const done = () => resolve({nav: nav ? nav.toJSON() : null, fcp: fcp ? fcp.startTime : null, lcp, resources});
+  try {
+    const po = new PerformanceObserver(list => {
+      const entries = list.getEntries();
+      if (entries.length) lcp = entries[entries.length - 1].startTime;
+    });
+    po.observe({type: 'largest-contentful-paint', buffered: true});
+    setTimeout(() => {
+      const entries = po.takeRecords();
+      if (entries.length) lcp = entries[entries.length - 1].startTime;
+      po.disconnect();
+      done();
+    }, 10);
+  } catch (e) {
+    done();
+  }
+})"""
+
+
+def timing_phases(timing):
+    """Słownik faza -> sekundy; fazy, które jeszcze nie nastąpiły, są pomijane."""
+    phases = {}
+    nav = timing.get("nav")
+    if nav:
+        phases["dns"] = nav["domainLookupEnd"] - nav["domainLookupStart"]
+        phases["connect"] = nav["connectEnd"] - nav["connectStart"]
+        if nav.get("secureConnectionStart", 0) > 0:
+            phases["tls"] = nav["connectEnd"] - nav["secureConnectionStart"]
+        if nav["responseStart"] > 0:
+            phases["ttfb"] = nav["responseStart"] - nav["requestStart"]
+        if nav["responseEnd"] > 0:
+            phases["download"] = nav["responseEnd"] - nav["responseStart"]
+        for phase, key in (("dom_interactive", "domInteractive"),
+                           ("dom_complete", "domComplete"),
+                           ("load", "loadEventEnd")):
+            if nav.get(key, 0) > 0:
+                phases[phase] = nav[key] - nav["startTime"]
+    for phase in ("fcp", "lcp"):
+        if timing.get(phase):
+            phases[phase] = timing[phase]
+    return {phase: max(0.0, ms) / 1000 for phase, ms in phases.items()}
+
+
+class NavigationTimingBase:
+    def __init__(self, registry, prefix):
+        self.phase_histogram = Histogram(
+            f"{prefix}_navigation_phase_seconds",
+            "Browser-side navigation phases (Navigation/Paint Timing, LCP)",
+            ["page", "phase"],
+            buckets=PHASE_BUCKETS,
+            registry=registry
+        )
+        self.resource_histogram = Histogram(
+            f"{prefix}_resource_duration_seconds",
+            "Resource Timing durations of sub-resources",
+            ["initiator_type"],
+            buckets=PHASE_BUCKETS,
+            registry=registry
+        )
+
+    @staticmethod
+    def timing_samples(timing, page):
+        """Próbki (rodzaj, etykiety, sekundy) z wyniku TIMING_JS."""
+        samples = [("phase", (page, phase), seconds) for phase, seconds in timing_phases(timing).items()]
+        samples.extend(("resource", initiator_type or "other", duration_ms / 1000)
+                       for initiator_type, duration_ms in timing.get("resources", []))
+        return samples
+
+    def observe_samples(self, samples):
+        for kind, label, value in samples:
+            if kind == "resource":
+                self.resource_histogram.labels(initiator_type=label).observe(value)
+            else:
+                page, phase = label
+                self.phase_histogram.labels(page=page, phase=phase).observe(value)
+
+    def observe(self, timing, page):
+        self.observe_samples(self.timing_samples(timing, page))
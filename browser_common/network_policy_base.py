@@ -0,0 +1,70 @@
+"""
+network_policy_base.py
+Wspólna część polityki ruchu sieciowego testów Playwright i Selenium:
+  - blokowanie żądań wg typu zasobu (image, font, media, ...) i wzorców URL,
+  - opcjonalne blokowanie wszystkich hostów innych niż testowana strona,
+  - nagrywanie HAR (HAR_MODE=record) i odtwarzanie z HAR (HAR_MODE=replay) –
+    w trybie replay żądania spoza pliku są przerywane, więc przebieg jest offline.
+
+Tu są konfiguracja i decyzja, które żądanie zablokować. Podpięcie polityki pod
+przeglądarkę (trasy Playwright, CDP / selenium-wire) jest w network_policy.py
+każdej suity.
+
+Konfiguracja z ENV (te same zmienne w obu suitach):
+  BLOCK_RESOURCE_TYPES  np. "image,font,media"
+  BLOCK_URL_PATTERNS    np. "*google-analytics.com*,*doubleclick.net*"
+  BLOCK_THIRD_PARTY     "1" = blokuj hosty inne niż testowana strona
+  HAR_MODE              off | record | replay
+  HAR_FILE              ścieżka pliku HAR
+"""
+
+import os
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+
+
+def _split_env(name):
+    return [v.strip() for v in os.getenv(name, "").split(",") if v.strip()]
+
+
+class NetworkPolicyBase:
+    # Domyślny plik HAR suity
+    default_har_file = "browser.har"
+
+    def __init__(self, first_party_url, block_types=(), block_patterns=(), block_third_party=False,
+                 har_mode="off", har_file=None):
+        self.first_party_host = urlsplit(first_party_url).hostname
+        self.block_types = frozenset(block_types)
+        self.block_patterns = tuple(block_patterns)
+        self.block_third_party = block_third_party
+        self.har_mode = har_mode
+        self.har_file = har_file or self.default_har_file
+        if har_mode not in ("off", "record", "replay"):
+            raise ValueError(f"Unknown HAR_MODE: {har_mode}")
+
+    @classmethod
+    def from_env(cls, first_party_url, default_har_file=None):
+        return cls(
+            first_party_url,
+            block_types=_split_env("BLOCK_RESOURCE_TYPES"),
+            block_patterns=_split_env("BLOCK_URL_PATTERNS"),
+            block_third_party=os.getenv("BLOCK_THIRD_PARTY", "0") == "1",
+            har_mode=os.getenv("HAR_MODE", "off").lower(),
+            har_file=os.getenv("HAR_FILE", default_har_file or cls.default_har_file),
+        )
+
+    @property
+    def blocks_anything(self):
+        return bool(self.block_types or self.block_patterns or self.block_third_party)
+
+    def blocks_type(self, resource_type):
+        return resource_type in self.block_types
+
+    def should_block(self, url, resource_type=None):
+        if resource_type and self.blocks_type(resource_type):
+            return True
+        if self.block_third_party:
+            host = urlsplit(url).hostname
+            if host and host != self.first_party_host:
+                return True
+        return any(fnmatchcase(url, p) for p in self.block_patterns)
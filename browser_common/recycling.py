@@ -0,0 +1,96 @@
+"""
+recycling.py
+Polityka recyklingu przeglądarki w długich przebiegach (duże NUM_TESTS).
+
+Przeglądarka żyjąca przez tysiące iteracji rośnie w pamięci (cache, historia,
+wycieki w rendererze), a kolejne iteracje zwalniają. Po każdej iteracji
+check() zwraca powód, dla którego kontekst/driver należy uruchomić od nowa:
+  - "iterations" – sesja wykonała max_iterations iteracji,
+  - "rss"        – RSS procesów potomnych (przeglądarki, sterowniki), w przeliczeniu
+                   na jedną sesję, przekroczył max_rss_mb; sprawdzane dopiero po
+                   min_iterations iteracji od poprzedniego recyklingu, żeby pamięć
+                   procesu przeglądarki, której recykling nie zwalnia, nie powodowała
+                   restartu co iterację.
+
+Pomiar RSS (psutil, całe drzewo procesów potomnych) jest buforowany przez
+rss_interval sekund, więc wiele równoległych sesji nie mnoży kosztu.
+
+Konfiguracja z ENV:
+  RECYCLE_ITERATIONS      po ilu iteracjach nowy kontekst/driver (0 = wyłączone)
+  RECYCLE_RSS_MB          próg RSS przeglądarek na sesję w MB (0 = wyłączone)
+  RECYCLE_MIN_ITERATIONS  minimalna liczba iteracji przed recyklingiem z powodu RSS
+"""
+
+import os
+import time
+import psutil
+
+REASONS = ("iterations", "rss")
+
+
+class RecyclePolicy:
+    def __init__(self, max_iterations=0, max_rss_mb=0, min_iterations=10, rss_interval=1.0):
+        self.max_iterations = max_iterations
+        self.max_rss_bytes = int(max_rss_mb * 2 ** 20)
+        self.min_iterations = min_iterations
+        self.rss_interval = rss_interval
+        self._process = None
+        self._rss = 0
+        self._rss_time = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_iterations=int(os.getenv("RECYCLE_ITERATIONS", 0)),
+            max_rss_mb=float(os.getenv("RECYCLE_RSS_MB", 0)),
+            min_iterations=int(os.getenv("RECYCLE_MIN_ITERATIONS", 10)),
+        )
+
+    @property
+    def process(self):
+        # Procesy puli (fork) dziedziczą politykę z rodzica – mierzymy drzewo bieżącego
+        # procesu, a nie rodzica z sesjami wszystkich procesów puli
+        pid = os.getpid()
+        if self._process is None or self._process.pid != pid:
+            self._process = psutil.Process(pid)
+            self._rss_time = None
+        return self._process
+
+    @property
+    def enabled(self):
+        return self.max_iterations > 0 or self.max_rss_bytes > 0
+
+    def browser_rss(self):
+        """Suma RSS procesów potomnych w bajtach (pomiar buforowany przez rss_interval s)."""
+        now = time.monotonic()
+        if self._rss_time is not None and now - self._rss_time < self.rss_interval:
+            return self._rss
+        rss = 0
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        for child in children:
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                # Proces mógł zniknąć w trakcie pomiaru
+                continue
+        self._rss = rss
+        self._rss_time = now
+        return rss
+
+    def check(self, iterations, sessions=1):
+        """
+        Powód recyklingu (jeden z REASONS) albo None.
+        `iterations` – iteracje sesji od jej uruchomienia, `sessions` – liczba sesji
+        (kontekstów/driverów) dzielących drzewo procesów potomnych.
+        """
+        if self.max_iterations and iterations >= self.max_iterations:
+            return "iterations"
+        if self.max_rss_bytes and iterations >= self.min_iterations:
+            if self.browser_rss() / max(1, sessions) > self.max_rss_bytes:
+                # Po recyklingu mierzymy od nowa
+                self._rss_time = None
+                return "rss"
+        return None
@@ -0,0 +1,184 @@
+"""
+sampling_profiler.py
+Lekki profiler próbkujący (wall-clock) dla skryptów przeglądarkowych.
+
+Osobny wątek co `interval` sekund odczytuje sys._current_frames() i zlicza
+stosy wszystkich wątków w formacie "collapsed" ("korzeń;...;liść liczba"),
+który czytają flamegraph.pl, speedscope i inferno. Playwright sync działa na
+greenletach w wątku głównym, więc próbka pokazuje stos greenleta, który
+akurat się wykonuje.
+
+Próbki wątku głównego są przypisywane do kategorii: decyduje najgłębsza
+ramka funkcji zarejestrowanej przez label() (np. oczekiwanie na przeglądarkę
+wewnątrz iteracji liczy się jako "browser_wait"), reszta to "other".
+Czas samego próbkowania jest mierzony i raportowany jako narzut.
+
+Procesy puli (Selenium --workers) oddają swoje próbki przez take_report(),
+a proces główny scala je merge_report(), więc plik i metryki obejmują całość.
+
+Konfiguracja z ENV:
+  PROFILE              "1" = profilowanie włączone
+  PROFILE_INTERVAL_MS  odstęp między próbkami w ms (domyślnie 10)
+  PROFILE_FILE         plik ze stosami collapsed (domyślnie <prefix>_profile.collapsed)
+"""
+
+import os
+import sys
+import time
+import inspect
+import threading
+from collections import Counter
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+OTHER = "other"
+MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    def __init__(self, prefix, enabled=False, path=None, interval=0.01, max_depth=MAX_DEPTH):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.path = path or f"{prefix}_profile.collapsed"
+        self.interval = interval
+        self.max_depth = max_depth
+        self.labels = {}
+        self.reset()
+        self.main_thread_id = threading.main_thread().ident
+        self._names = {}
+        self._started = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def reset(self):
+        # Także w procesie puli: po fork() liczniki zawierają próbki procesu głównego
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self.overhead = 0.0
+        self.elapsed = 0.0
+
+    @classmethod
+    def from_env(cls, prefix):
+        return cls(
+            prefix,
+            enabled=os.getenv("PROFILE", "0") == "1",
+            path=os.getenv("PROFILE_FILE") or None,
+            interval=int(os.getenv("PROFILE_INTERVAL_MS", 10)) / 1000,
+        )
+
+    def label(self, category, *functions):
+        """Próbki wewnątrz tych funkcji (lub metod) trafiają do kategorii `category`."""
+        for function in functions:
+            code = getattr(inspect.unwrap(getattr(function, "__func__", function)), "__code__", None)
+            if code is not None:
+                self.labels[code] = category
+
+    def _frame_name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    def sample(self):
+        self.samples += 1
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            names = []
+            category = None
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(self._frame_name(code))
+                if category is None:
+                    category = self.labels.get(code)
+                frame = frame.f_back
+            names.reverse()
+            if thread_id == self.main_thread_id:
+                self.categories[category or OTHER] += 1
+                root = "MainThread"
+            else:
+                root = f"thread-{thread_id}"
+            self.stacks[(root, *names)] += 1
+
+    def _run(self):
+        next_sample = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            self.sample()
+            end = time.perf_counter()
+            self.overhead += end - start
+            next_sample += self.interval
+            if next_sample <= end:
+                # Zaległe próbki (np. długie trzymanie GIL) pomijamy
+                next_sample = end
+            if self._stop_event.wait(next_sample - end):
+                return
+
+    def start(self):
+        self._stop_event.clear()
+        self.main_thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.elapsed += time.perf_counter() - self._started
+
+    @property
+    def overhead_ratio(self):
+        return self.overhead / self.elapsed if self.elapsed else 0.0
+
+    # --- procesy puli ---
+    def take_report(self):
+        """Próbki od poprzedniego raportu (wywoływane w procesie puli)."""
+        now = time.perf_counter()
+        elapsed = self.elapsed + (now - self._started if self._thread is not None else 0.0)
+        report = {"stacks": dict(self.stacks), "categories": dict(self.categories), "samples": self.samples,
+                  "overhead": self.overhead, "elapsed": elapsed}
+        self.reset()
+        if self._thread is not None:
+            self._started = now
+        return report
+
+    def merge_report(self, report, worker):
+        for stack, count in report["stacks"].items():
+            # Korzeń stosu wskazuje proces puli
+            self.stacks[(worker, *stack)] += count
+        self.categories.update(report["categories"])
+        self.samples += report["samples"]
+        self.overhead += report["overhead"]
+        self.elapsed += report["elapsed"]
+
+    # --- wyniki ---
+    def write_collapsed(self, file_path=None):
+        with open(file_path or self.path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def collect(self):
+        samples = CounterMetricFamily(f"{self.prefix}_profile_samples", "Profiler samples of the main thread by category",
+                                      labels=["category"])
+        for category, count in sorted(self.categories.items()):
+            samples.add_metric([category], count)
+        yield samples
+        yield GaugeMetricFamily(f"{self.prefix}_profile_overhead_ratio", "Share of wall time spent sampling",
+                                value=self.overhead_ratio)
+
+    def print_summary(self, top=10):
+        total = sum(self.categories.values())
+        if not total:
+            return
+        shares = ", ".join(f"{c} {n / total:.1%}" for c, n in self.categories.most_common())
+        print(f"[INFO] Profile: {self.samples} samples, overhead {self.overhead_ratio:.2%}; main thread: {shares}")
+        # Tylko stosy wątku głównego (także z procesów puli), jak w udziałach kategorii
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            if "MainThread" in stack[:2]:
+                leaves[stack[-1]] += count
+        for name, count in leaves.most_common(top):
+            print(f"[INFO]   {count / total:>6.1%}  {name}")
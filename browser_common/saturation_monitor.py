@@ -0,0 +1,174 @@
+"""
+saturation_monitor.py
+Monitorowanie nasycenia maszyny generującej ruch (skrypt + przeglądarki).
+
+Wątek w tle co `interval` sekund (domyślnie 250 ms) zbiera:
+  - CPU i RSS procesu skryptu,
+  - CPU i RSS procesów potomnych (przeglądarki, sterowniki, workery puli),
+  - użycie CPU na rdzeń (cały host),
+  - liczbę otwartych deskryptorów plików,
+  - co slow_every próbek (domyślnie co ~1 s, bo to droższe) liczbę gniazd TCP/UDP.
+
+Każda próbka jest porównywana z progami; powód (cpu, children_cpu, core, fds)
+"zadziała", gdy próg przekroczono w więcej niż max_breach_ratio próbek.
+Jeśli zadziała którykolwiek powód, przebieg jest eksportowany jako
+generator-bound – wyniki mierzą wtedy maszynę testującą, a nie stronę.
+"""
+
+import os
+import threading
+import psutil
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REASONS = ("cpu", "children_cpu", "core", "fds")
+
+
+def fd_limit():
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return soft if soft != resource.RLIM_INFINITY else None
+
+
+class SaturationMonitor:
+    def __init__(self, prefix, interval=0.25, slow_every=4, max_cpu_percent=90.0, max_children_cpu_percent=None,
+                 max_core_percent=95.0, max_fds=None, max_breach_ratio=0.01):
+        self.prefix = prefix
+        self.interval = interval
+        self.slow_every = slow_every
+        self.max_cpu_percent = max_cpu_percent
+        # Domyślnie: przeglądarki razem zajmują ~wszystkie rdzenie
+        self.max_children_cpu_percent = max_children_cpu_percent or 90.0 * (os.cpu_count() or 1)
+        self.max_core_percent = max_core_percent
+        limit = fd_limit()
+        self.max_fds = max_fds or (int(limit * 0.9) if limit else None)
+        self.max_breach_ratio = max_breach_ratio
+        self.process = psutil.Process(os.getpid())
+        self.samples = 0
+        self.breaches = dict.fromkeys(REASONS, 0)
+        self.peak = {"cpu_percent": 0.0, "rss": 0, "children_cpu_percent": 0.0, "children_rss": 0,
+                     "children": 0, "fds": 0, "sockets": 0}
+        self.cores = []
+        self._children = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _count_fds(self, proc):
+        return proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+
+    def _count_sockets(self, proc):
+        connections = getattr(proc, "net_connections", None) or proc.connections
+        return len(connections(kind="inet"))
+
+    def sample(self):
+        self.samples += 1
+        peak = self.peak
+        cpu = self.process.cpu_percent(interval=None)
+        peak["cpu_percent"] = max(peak["cpu_percent"], cpu)
+        peak["rss"] = max(peak["rss"], self.process.memory_info().rss)
+        if cpu > self.max_cpu_percent:
+            self.breaches["cpu"] += 1
+
+        count_sockets = (self.samples - 1) % self.slow_every == 0
+        fds = self._count_fds(self.process)
+        sockets = self._count_sockets(self.process) if count_sockets else 0
+        children_cpu = 0.0
+        children_rss = 0
+        alive = {}
+        for child in self.process.children(recursive=True):
+            # Ten sam obiekt Process między próbkami – cpu_percent() liczy od poprzedniego wywołania
+            child = self._children.get(child.pid, child)
+            try:
+                children_cpu += child.cpu_percent(interval=None)
+                children_rss += child.memory_info().rss
+                fds += self._count_fds(child)
+                if count_sockets:
+                    sockets += self._count_sockets(child)
+            except psutil.Error:
+                continue
+            alive[child.pid] = child
+        self._children = alive
+        peak["children_cpu_percent"] = max(peak["children_cpu_percent"], children_cpu)
+        peak["children_rss"] = max(peak["children_rss"], children_rss)
+        peak["children"] = max(peak["children"], len(alive))
+        peak["fds"] = max(peak["fds"], fds)
+        peak["sockets"] = max(peak["sockets"], sockets)
+        if children_cpu > self.max_children_cpu_percent:
+            self.breaches["children_cpu"] += 1
+        if self.max_fds and fds > self.max_fds:
+            self.breaches["fds"] += 1
+
+        cores = psutil.cpu_percent(percpu=True)
+        self.cores = [max(a, b) for a, b in zip(self.cores, cores)] if self.cores else cores
+        if cores and max(cores) > self.max_core_percent:
+            self.breaches["core"] += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except psutil.Error:
+                # Proces potomny mógł zniknąć w trakcie próbki
+                pass
+
+    def start(self):
+        self._stop_event.clear()
+        # Pierwsze wywołania cpu_percent() ustawiają punkt odniesienia
+        self.process.cpu_percent(interval=None)
+        psutil.cpu_percent(percpu=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def tripped(self):
+        return [r for r in REASONS if self.samples and self.breaches[r] > self.max_breach_ratio * self.samples]
+
+    def collect(self):
+        p = self.prefix
+        gauges = [
+            (f"{p}_runner_cpu_usage_percent", "Peak CPU of the runner process", "cpu_percent"),
+            (f"{p}_runner_memory_usage_bytes", "Peak RSS of the runner process", "rss"),
+            (f"{p}_browser_cpu_usage_percent", "Peak total CPU of child processes (browsers, drivers)",
+             "children_cpu_percent"),
+            (f"{p}_browser_memory_usage_bytes", "Peak total RSS of child processes (browsers, drivers)",
+             "children_rss"),
+            (f"{p}_browser_processes", "Peak number of child processes", "children"),
+            (f"{p}_open_fds", "Peak open file descriptors (runner + children)", "fds"),
+            (f"{p}_open_sockets", "Peak open inet sockets (runner + children)", "sockets"),
+        ]
+        for name, documentation, key in gauges:
+            yield GaugeMetricFamily(name, documentation, value=self.peak[key])
+        cores = GaugeMetricFamily(f"{p}_cpu_core_usage_percent", "Peak per-core host CPU", labels=["core"])
+        for core, percent in enumerate(self.cores):
+            cores.add_metric([str(core)], percent)
+        yield cores
+        breaches = CounterMetricFamily(f"{p}_saturation_breaches", "Monitor samples above a saturation threshold",
+                                       labels=["reason"])
+        for reason in REASONS:
+            breaches.add_metric([reason], self.breaches[reason])
+        yield breaches
+        tripped = self.tripped()
+        yield GaugeMetricFamily(f"{p}_generator_bound",
+                                "1 if the test machine itself was saturated; results are not trustworthy",
+                                value=1 if tripped else 0)
+        bound_reason = GaugeMetricFamily(f"{p}_generator_bound_reason", "Saturation reasons that tripped",
+                                         labels=["reason"])
+        for reason in REASONS:
+            bound_reason.add_metric([reason], 1 if reason in tripped else 0)
+        yield bound_reason
+
+    def print_summary(self):
+        peak = self.peak
+        print(f"[INFO] Peak runner CPU {peak['cpu_percent']:.0f}%, browsers CPU {peak['children_cpu_percent']:.0f}% "
+              f"/ RSS {peak['children_rss'] / 2 ** 20:.0f} MB ({peak['children']} processes), "
+              f"fds {peak['fds']}, sockets {peak['sockets']}")
+        tripped = self.tripped()
+        if tripped:
+            print(f"[WARN] Test machine saturated ({', '.join(tripped)}); results are generator-bound.")
@@ -0,0 +1,54 @@
+import os
+import json
+import signal
+
+import pytest
+
+from recycling import RecyclePolicy
+
+# Like the Selenium runner: created at import, inherited by the forked pool workers
+POLICY = RecyclePolicy(max_rss_mb=1, min_iterations=0)
+
+
+def fork(child):
+    """Runs child() in a forked process; returns (pid, pipe for its JSON result)."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            os.write(write_fd, json.dumps(child()).encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    return pid, read_fd
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_workers_measure_their_own_process_tree():
+    # A sibling worker holding memory, as another pool process with its browser would
+    sibling, sibling_fd = fork(lambda: signal.pause())
+    try:
+        # The parent's tree holds the sibling; its cached value must not leak into the worker
+        assert POLICY.browser_rss() > 0
+        worker, worker_fd = fork(lambda: (os.getpid(), POLICY.process.pid, POLICY.browser_rss()))
+        with os.fdopen(worker_fd) as f:
+            pid, measured_pid, rss = json.loads(f.read())
+        os.waitpid(worker, 0)
+    finally:
+        os.kill(sibling, signal.SIGKILL)
+        os.waitpid(sibling, 0)
+        os.close(sibling_fd)
+    assert measured_pid == pid == worker
+    assert rss == 0
+    assert POLICY.process.pid == os.getpid()
+
+
+def test_iteration_limit_and_rss_threshold():
+    policy = RecyclePolicy(max_iterations=5, max_rss_mb=1, min_iterations=2)
+    policy.browser_rss = lambda: 3 * 2 ** 20
+    assert policy.check(5) == "iterations"
+    assert policy.check(1) is None
+    assert policy.check(2) == "rss"
+    # The threshold is per session
+    assert policy.check(2, sessions=4) is None
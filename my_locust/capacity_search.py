@@ -0,0 +1,233 @@
+"""
+capacity_search.py
+Automatic max-throughput search for Locust (LOCUST_SHAPE=search).
+
+The search runs the test in steps of a fixed length. Each step holds a user
+count; after a settle period the request totals and latency histograms of
+RequestMetrics are snapshotted, and at the end of the step the difference
+gives the step's throughput, p95 and error rate. The search:
+
+  1. ramps users geometrically (start, start*factor, ...) while every step
+     meets the SLO (p95, error rate) and throughput still grows by min_gain,
+  2. at the knee: when throughput stopped growing, accepts the last good
+     step (more users would only add latency); when the SLO broke, bisects
+     between the last good and the first bad user count for a few more steps,
+  3. stops the test; the best step that met the SLO is the maximum
+     sustainable throughput and is exported as locust_capacity_* metrics.
+
+A step's clock starts only when the runner reports the step's user count, so
+the settle period and the measurement never include spawning. The spawn
+rate is raised above spawn_rate when needed to spawn a step's user change in
+SPAWN_SHARE of the step length.
+
+In the open model every user is a scheduler, so ramping users ramps the
+arrival rate in multiples of the per-user rate.
+
+The search only reads data that has already been flushed (standalone) or
+merged from worker reports (master), so on a distributed run step_seconds
+should be several times the worker report interval (3 s by default).
+"""
+
+import math
+import time
+from prometheus_client.core import GaugeMetricFamily
+from latency_histogram import LatencyHistogram
+
+STEP_QUANTILES = (0.5, 0.95, 0.99)
+# Share of the step length a user change may take to spawn
+SPAWN_SHARE = 0.25
+
+
+class StepResult:
+    __slots__ = ("users", "rps", "requests", "error_rate", "p50", "p95", "p99", "ok", "slo_met")
+
+    def __init__(self, users, rps, requests, error_rate, p50, p95, p99):
+        self.users = users
+        self.rps = rps
+        self.requests = requests
+        self.error_rate = error_rate
+        self.p50 = p50
+        self.p95 = p95
+        self.p99 = p99
+        self.ok = False
+        self.slo_met = False
+
+
+class CapacitySearch:
+    def __init__(self, request_metrics, latency_collector, instance,
+                 start_users=10, max_users=10000, factor=2.0, spawn_rate=10.0,
+                 step_seconds=60.0, settle_seconds=15.0, slo_p95_ms=1000.0,
+                 max_error_rate=0.01, min_gain=0.05, bisect_steps=3):
+        if factor <= 1:
+            raise ValueError("Search factor must be greater than 1")
+        if settle_seconds >= step_seconds:
+            raise ValueError("Settle time must be shorter than the step")
+        self.request_metrics = request_metrics
+        self.latency_collector = latency_collector
+        self.instance = instance
+        self.start_users = start_users
+        self.max_users = max_users
+        self.factor = factor
+        self.spawn_rate = spawn_rate
+        self.step_seconds = step_seconds
+        self.settle_seconds = settle_seconds
+        self.slo_p95_ms = slo_p95_ms
+        self.max_error_rate = max_error_rate
+        self.min_gain = min_gain
+        self.bisect_steps = bisect_steps
+        self.reset()
+
+    def reset(self):
+        self.steps = []
+        self.best = None
+        self.phase = "ramp"
+        self.users = self.start_users
+        self.low = None
+        self.high = None
+        self.bisected = 0
+        self.done = False
+        self._step_start = None
+        self._spawn_start = None
+        self._snapshot = None
+        self._rate = self._spawn_rate_for(self.users)
+
+    def _spawn_rate_for(self, user_change):
+        return max(self.spawn_rate, abs(user_change) / (self.step_seconds * SPAWN_SHARE))
+
+    def _merged_histogram(self):
+        merged = LatencyHistogram(self.latency_collector.precision_bits, self.latency_collector.max_value_us)
+        for hist in list(self.latency_collector.histograms.values()):
+            merged.merge(hist)
+        return merged
+
+    def _take_snapshot(self):
+        metrics = self.request_metrics
+        return (time.monotonic(), metrics.total_requests, metrics.total_failures, self._merged_histogram())
+
+    def _measure(self):
+        started, requests, failures, hist = self._snapshot
+        now, total_requests, total_failures, window = self._take_snapshot()
+        window.subtract(hist)
+        requests = total_requests - requests
+        elapsed = max(now - started, 1e-9)
+        p50, p95, p99 = (window.percentile(q) / 1000 for q in STEP_QUANTILES)
+        return StepResult(self.users, requests / elapsed, requests,
+                          (total_failures - failures) / requests if requests else 0.0, p50, p95, p99)
+
+    def _meets_slo(self, step):
+        return step.requests > 0 and step.p95 <= self.slo_p95_ms and step.error_rate <= self.max_error_rate
+
+    def _evaluate(self, step):
+        step.slo_met = self._meets_slo(step)
+        if self.phase == "ramp":
+            # A step that adds users without adding throughput is past the knee
+            step.ok = step.slo_met and (
+                self.best is None or step.rps >= self.best.rps * (1 + self.min_gain))
+        else:
+            step.ok = step.slo_met and (
+                self.best is None or step.rps >= self.best.rps * (1 - self.min_gain))
+        if step.ok and (self.best is None or step.rps > self.best.rps):
+            self.best = step
+        self.steps.append(step)
+        print(f"[capacity] users={step.users} rps={step.rps:.1f} p95={step.p95:.1f} ms "
+              f"errors={step.error_rate:.2%} -> {'ok' if step.ok else 'knee'}")
+
+    def _next_users(self, step):
+        if self.phase == "ramp":
+            if step.ok:
+                self.low = step.users
+                if step.users >= self.max_users:
+                    return None
+                return min(self.max_users, max(step.users + 1, math.ceil(step.users * self.factor)))
+            if self.low is None:
+                # Already the first step is past the knee; nothing to bisect
+                return None
+            if step.slo_met:
+                # Throughput stopped growing within the SLO: the last good step is the capacity
+                return None
+            self.phase = "bisect"
+            self.high = step.users
+        elif step.ok:
+            self.low = step.users
+        else:
+            self.high = step.users
+        if self.bisected >= self.bisect_steps or self.high - self.low <= max(1, self.low * self.min_gain):
+            return None
+        self.bisected += 1
+        return (self.low + self.high) // 2
+
+    def tick(self, run_time, user_count=None):
+        """
+        (users, spawn_rate) for LoadTestShape.tick(), or None when the search is over.
+        `user_count` is the runner's current user count; the step starts once it is reached
+        (or after a full step length, if the runner never gets there).
+        """
+        if self.done:
+            return None
+        if self._step_start is None:
+            if self._spawn_start is None:
+                self._spawn_start = run_time
+            spawning = user_count is not None and user_count != self.users
+            if spawning and run_time - self._spawn_start < self.step_seconds:
+                return self.users, self._rate
+            self._step_start = run_time
+            self._spawn_start = None
+        elapsed = run_time - self._step_start
+        if self._snapshot is None and elapsed >= self.settle_seconds:
+            self._snapshot = self._take_snapshot()
+        if elapsed >= self.step_seconds and self._snapshot is not None:
+            step = self._measure()
+            self._evaluate(step)
+            users = self._next_users(step)
+            self._step_start = None
+            self._snapshot = None
+            if users is None:
+                self.done = True
+                return None
+            self._rate = self._spawn_rate_for(users - self.users)
+            self.users = users
+        return self.users, self._rate
+
+    def print_summary(self):
+        if not self.steps:
+            return
+        print(f"{'users':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>10}")
+        for step in self.steps:
+            marker = " *" if step is self.best else ""
+            print(f"{step.users:>8}{step.rps:>10.1f}{step.p50:>10.1f}{step.p95:>10.1f}"
+                  f"{step.p99:>10.1f}{step.error_rate:>10.2%}{marker}")
+        if self.best is None:
+            print("Capacity search: no step met the SLO")
+        else:
+            print(f"Capacity search: max sustainable {self.best.rps:.1f} rps at {self.best.users} users "
+                  f"(p95 {self.best.p95:.1f} ms, SLO {self.slo_p95_ms:g} ms)")
+
+    def collect(self):
+        labels = ["instance"]
+        rps = GaugeMetricFamily("locust_capacity_max_sustainable_rps",
+                                "Highest throughput of a search step that met the SLO", labels=labels)
+        users = GaugeMetricFamily("locust_capacity_users", "User count of the max sustainable step", labels=labels)
+        latency = GaugeMetricFamily("locust_capacity_latency_seconds",
+                                    "Latency percentiles of the max sustainable step", labels=labels + ["quantile"])
+        errors = GaugeMetricFamily("locust_capacity_error_ratio",
+                                   "Error ratio of the max sustainable step", labels=labels)
+        step_rps = GaugeMetricFamily("locust_capacity_step_rps", "Throughput of each search step",
+                                     labels=labels + ["users"])
+        step_p95 = GaugeMetricFamily("locust_capacity_step_p95_seconds", "p95 latency of each search step",
+                                     labels=labels + ["users"])
+        if self.best is not None:
+            best = self.best
+            rps.add_metric([self.instance], best.rps)
+            users.add_metric([self.instance], best.users)
+            for q, value in zip(STEP_QUANTILES, (best.p50, best.p95, best.p99)):
+                latency.add_metric([self.instance, str(q)], value / 1000)
+            errors.add_metric([self.instance], best.error_rate)
+        for step in self.steps:
+            step_rps.add_metric([self.instance, str(step.users)], step.rps)
+            step_p95.add_metric([self.instance, str(step.users)], step.p95 / 1000)
+        yield rps
+        yield users
+        yield latency
+        yield errors
+        yield step_rps
+        yield step_p95
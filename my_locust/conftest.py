@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules import their siblings by bare name, as when Locust loads the locustfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
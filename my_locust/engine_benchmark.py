@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+engine_benchmark.py
+Compares requests/sec per core of the HttpUser and FastHttpUser engines
+running PracticeLoginScenario against a local target.
+
+Usage:
+  python engine_benchmark.py --users 50 --iterations 200
+
+The target is started in a separate process, so only the client side
+(scenario + engine + listeners) is counted in the CPU time. It only serves
+the two pages of the static login flow, so LOCUST_LOGIN_FLOW is pinned to
+"static"; run_engine() counts the requests Locust reports, so callers that
+use a real target (framework_benchmark.py) can run the form flow.
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+
+LOGIN_PAGE = b"<html><body><form id='login'><input id='username'/><input id='password'/></form></body></html>"
+SUCCESS_PAGE = b"<html><body><h1>Logged In Successfully</h1><p>Congratulations student.</p></body></html>"
+
+
+def target_app(environ, start_response):
+    path = environ.get("PATH_INFO", "/")
+    if path.startswith("/practice-test-login"):
+        body = LOGIN_PAGE
+    elif path.startswith("/logged-in-successfully"):
+        body = SUCCESS_PAGE
+    else:
+        start_response("404 Not Found", [("Content-Length", "0")])
+        return [b""]
+    start_response("200 OK", [("Content-Type", "text/html; charset=UTF-8"),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def serve_target(port):
+    from gevent.pywsgi import WSGIServer
+    WSGIServer(("127.0.0.1", port), target_app, log=None).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Target on port {port} did not start")
+
+
+def run_engine(user_class, host, users, iterations):
+    import gevent
+    from locust import events
+    from locust.env import Environment
+    from locust_login_test import PracticeLoginScenario
+
+    user_class.host = host
+    env = Environment(user_classes=[user_class], host=host, events=events)
+    scenarios = [PracticeLoginScenario(user_class(env)) for _ in range(users)]
+
+    def worker(scenario):
+        for _ in range(iterations):
+            scenario.login_test()
+
+    counts = {"requests": 0, "failures": 0}
+
+    def on_request(exception=None, **kwargs):
+        counts["requests"] += 1
+        if exception is not None:
+            counts["failures"] += 1
+
+    env.events.request.add_listener(on_request)
+    try:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        gevent.joinall([gevent.spawn(worker, s) for s in scenarios])
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    finally:
+        env.events.request.remove_listener(on_request)
+
+    # Requests per iteration depend on the login flow, so they are counted, not derived
+    total = counts["requests"]
+    return {
+        "requests": total,
+        "failures": counts["failures"],
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "rps": total / wall if wall else 0.0,
+        "rps_per_core": total / cpu if cpu else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HttpUser vs FastHttpUser throughput benchmark.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--serve-target", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_target is not None:
+        serve_target(args.serve_target)
+        return
+
+    port = free_port()
+    target = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-target", str(port)])
+    try:
+        wait_for_port(port)
+        host = f"http://127.0.0.1:{port}"
+        os.environ["LOCUST_HOST"] = host
+        # The stub target has no login form to POST to
+        os.environ["LOCUST_LOGIN_FLOW"] = "static"
+
+        from locust_login_test import WebsiteUser, FastWebsiteUser
+
+        results = {}
+        for name, user_class in (("http", WebsiteUser), ("fast", FastWebsiteUser)):
+            run_engine(user_class, host, users=min(args.users, 5), iterations=5)  # warm-up
+            results[name] = run_engine(user_class, host, args.users, args.iterations)
+    finally:
+        target.terminate()
+        target.wait()
+
+    print(f"{'engine':<8}{'requests':>10}{'failures':>10}{'wall s':>10}{'cpu s':>10}{'req/s':>12}{'req/s/core':>12}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['requests']:>10}{r['failures']:>10}{r['wall_s']:>10.2f}{r['cpu_s']:>10.2f}"
+              f"{r['rps']:>12.0f}{r['rps_per_core']:>12.0f}")
+    if results["http"]["rps_per_core"]:
+        print(f"fast/http speed-up per core: {results['fast']['rps_per_core'] / results['http']['rps_per_core']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+latency_histogram.py
+Array-backed log-linear (HDR-style) latency histogram recorded in microseconds.
+
+Values below 2^precision_bits are counted exactly; above that every octave is
+split into 2^(precision_bits - 1) linear sub-buckets, so the relative error is
+at most 2^-(precision_bits - 1) (~1.6% for the default 7 bits). The counts
+array has a fixed size, so memory does not grow with the number of samples,
+and two histograms with the same layout merge losslessly by adding counts.
+
+Merge dumps from several workers/runs:
+  python latency_histogram.py run1.json run2.json
+"""
+
+import sys
+import json
+import math
+from array import array
+from prometheus_client.core import HistogramMetricFamily, Metric
+
+DEFAULT_PRECISION_BITS = 7
+# 2^36 us ~ 19 h, anything above is clamped into the last bucket
+DEFAULT_MAX_VALUE_US = 2 ** 36
+# Export bucket bounds grow by 2^(1/2^schema), same layout as Prometheus native histograms
+EXPORT_SCHEMA = 2
+EXPORT_MIN_SECONDS = 0.001
+EXPORT_MAX_SECONDS = 60.0
+EXPORT_QUANTILES = (0.5, 0.75, 0.9, 0.95, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    def __init__(self, precision_bits=DEFAULT_PRECISION_BITS, max_value_us=DEFAULT_MAX_VALUE_US):
+        self.precision_bits = precision_bits
+        self.max_value_us = max_value_us
+        self._sub_count = 1 << precision_bits
+        self._half = self._sub_count >> 1
+        self._max_index = self._index(max_value_us)
+        self.counts = array("Q", bytes(8 * (self._max_index + 1)))
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, value):
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._sub_count + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _highest_equivalent(self, index):
+        if index < self._sub_count:
+            return index
+        shift, sub = divmod(index - self._sub_count, self._half)
+        shift += 1
+        return ((sub + self._half + 1) << shift) - 1
+
+    def record(self, value_us, count=1):
+        value_us = int(value_us)
+        if value_us < 0:
+            value_us = 0
+        index = self._index(value_us) if value_us <= self.max_value_us else self._max_index
+        self.counts[index] += count
+        self.total += count
+        self.sum_us += value_us * count
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if self.max_us is None or value_us > self.max_us:
+            self.max_us = value_us
+
+    def _check_compatible(self, other):
+        if (other.precision_bits, other.max_value_us) != (self.precision_bits, self.max_value_us):
+            raise ValueError("Cannot merge histograms with different precision/range")
+
+    def merge(self, other):
+        self._check_compatible(other)
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        if other.max_us is not None and (self.max_us is None or other.max_us > self.max_us):
+            self.max_us = other.max_us
+        return self
+
+    def copy(self):
+        return LatencyHistogram(self.precision_bits, self.max_value_us).merge(self)
+
+    def subtract(self, earlier):
+        """Samples recorded since `earlier` (a copy of this histogram taken before)."""
+        self._check_compatible(earlier)
+        counts = self.counts
+        for index, count in enumerate(earlier.counts):
+            if count:
+                counts[index] -= count
+        self.total -= earlier.total
+        self.sum_us -= earlier.sum_us
+        # The exact min of the window is unknown; max stays a valid upper bound
+        self.min_us = 0 if self.total else None
+        return self
+
+    def percentile(self, q):
+        """Value (us) at quantile q in [0, 1], within the histogram's relative error."""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(q * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= target:
+                    return max(self.min_us, min(self._highest_equivalent(index), self.max_us))
+        return self.max_us
+
+    def cumulative_counts(self, bounds_us):
+        """Number of samples <= each bound in bounds_us (ascending)."""
+        result = []
+        seen = 0
+        index = 0
+        size = len(self.counts)
+        for bound in bounds_us:
+            while index < size and self._highest_equivalent(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+    def to_dict(self):
+        return {
+            "precision_bits": self.precision_bits,
+            "max_value_us": self.max_value_us,
+            "total": self.total,
+            "sum_us": self.sum_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "counts": [[i, c] for i, c in enumerate(self.counts) if c],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["precision_bits"], data["max_value_us"])
+        for index, count in data["counts"]:
+            hist.counts[index] = count
+        hist.total = data["total"]
+        hist.sum_us = data["sum_us"]
+        hist.min_us = data["min_us"]
+        hist.max_us = data["max_us"]
+        return hist
+
+
+def export_bounds_seconds(schema=EXPORT_SCHEMA, low=EXPORT_MIN_SECONDS, high=EXPORT_MAX_SECONDS):
+    factor = 2 ** schema
+    first = math.floor(math.log2(low) * factor)
+    last = math.ceil(math.log2(high) * factor)
+    return [2 ** (i / factor) for i in range(first, last + 1)]
+
+
+class LatencyHistogramCollector:
+    """
+    Prometheus collector exporting one LatencyHistogram per request name as
+    a histogram (log-spaced buckets) and a summary with percentiles.
+    """
+
+    def __init__(self, metric_name, documentation, instance,
+                 precision_bits=DEFAULT_PRECISION_BITS, max_value_us=DEFAULT_MAX_VALUE_US):
+        self.metric_name = metric_name
+        self.documentation = documentation
+        self.instance = instance
+        self.precision_bits = precision_bits
+        self.max_value_us = max_value_us
+        self.histograms = {}
+        self.bounds_seconds = export_bounds_seconds()
+        self._bounds_us = [b * 1e6 for b in self.bounds_seconds]
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = LatencyHistogram(self.precision_bits, self.max_value_us)
+            self.histograms[name] = hist
+        return hist
+
+    def merge(self, histograms):
+        for name, hist in histograms.items():
+            self.histogram(name).merge(hist)
+
+    def to_dict(self):
+        return {name: hist.to_dict() for name, hist in self.histograms.items()}
+
+    def merge_dict(self, data):
+        for name, hist_data in data.items():
+            self.histogram(name).merge(LatencyHistogram.from_dict(hist_data))
+
+    def dump(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    def collect(self):
+        histogram = HistogramMetricFamily(self.metric_name, self.documentation, labels=["name", "instance"])
+        summary = Metric(f"{self.metric_name}_quantiles", f"{self.documentation} (percentiles)", "summary")
+        for name, hist in sorted(self.histograms.items()):
+            cumulative = hist.cumulative_counts(self._bounds_us)
+            buckets = [(repr(b), c) for b, c in zip(self.bounds_seconds, cumulative)]
+            buckets.append(("+Inf", hist.total))
+            sum_seconds = hist.sum_us / 1e6
+            histogram.add_metric([name, self.instance], buckets, sum_seconds)
+            labels = {"name": name, "instance": self.instance}
+            for q in EXPORT_QUANTILES:
+                summary.add_sample(summary.name, dict(labels, quantile=str(q)), hist.percentile(q) / 1e6)
+            summary.add_sample(f"{summary.name}_count", labels, hist.total)
+            summary.add_sample(f"{summary.name}_sum", labels, sum_seconds)
+        yield histogram
+        yield summary
+
+
+def print_percentiles(histograms):
+    print(f"{'name':<30}{'count':>10}" + "".join(f"{'p' + str(q * 100).rstrip('0').rstrip('.'):>10}" for q in EXPORT_QUANTILES) + f"{'max':>10}")
+    for name, hist in sorted(histograms.items()):
+        row = "".join(f"{hist.percentile(q) / 1000:>10.1f}" for q in EXPORT_QUANTILES)
+        print(f"{name:<30}{hist.total:>10}{row}{(hist.max_us or 0) / 1000:>10.1f}")
+    print("(values in ms)")
+
+
+if __name__ == "__main__":
+    merged = {}
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as f:
+            for name, data in json.load(f).items():
+                hist = LatencyHistogram.from_dict(data)
+                if name in merged:
+                    merged[name].merge(hist)
+                else:
+                    merged[name] = hist
+    print_percentiles(merged)
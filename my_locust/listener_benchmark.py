@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+listener_benchmark.py
+Per-request cost of the events.request listener: direct .labels() calls
+(previous on_request) vs RequestMetrics buffering (record + amortised flush).
+
+Usage:
+  python listener_benchmark.py --requests 200000 --flush-every 2500
+"""
+
+import time
+import random
+import argparse
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from request_metrics import RequestMetrics
+from latency_histogram import LatencyHistogramCollector
+
+NAMES = ["Load Login Page", "After Login Redirect"]
+
+
+def make_metrics():
+    registry = CollectorRegistry(auto_describe=False)
+    labels = ["method", "name", "response_code", "instance"]
+    success = Counter("bench_request_success_total", "ok", labels, registry=registry)
+    failure = Counter("bench_request_failure_total", "failed", labels, registry=registry)
+    histogram = Histogram("bench_request_duration_seconds", "duration", ["instance"],
+                          buckets=[0.1, 0.3, 1.5, 10.0], registry=registry)
+    return success, failure, histogram
+
+
+def make_samples(n):
+    rnd = random.Random(42)
+    return [(rnd.choice(NAMES), rnd.expovariate(1 / 200.0), rnd.random() < 0.01) for _ in range(n)]
+
+
+def bench_direct(samples):
+    success, failure, histogram = make_metrics()
+
+    def on_request(request_type, name, response_time, response_length, exception, **kwargs):
+        histogram.labels(instance="locust_jenkins").observe(response_time / 1000)
+        if exception is None:
+            success.labels(method=request_type, name=name, response_code="200", instance="locust_jenkins").inc()
+        else:
+            failure.labels(method=request_type, name=name, response_code="0", instance="locust_jenkins").inc()
+
+    start = time.perf_counter()
+    for name, ms, failed in samples:
+        on_request("GET", name, ms, 1024, "error" if failed else None)
+    return time.perf_counter() - start
+
+
+def bench_buffered(samples, flush_every):
+    success, failure, _ = make_metrics()
+    latency = LatencyHistogramCollector("bench_request_duration_seconds", "duration", instance="locust_jenkins")
+    metrics = RequestMetrics(success, failure, latency, instance="locust_jenkins")
+
+    def on_request(request_type, name, response_time, response_length, exception, **kwargs):
+        if exception is None:
+            metrics.record(request_type, name, "200", response_time, True)
+        else:
+            metrics.record(request_type, name, "0", response_time, False)
+
+    start = time.perf_counter()
+    for i, (name, ms, failed) in enumerate(samples, 1):
+        on_request("GET", name, ms, 1024, "error" if failed else None)
+        if i % flush_every == 0:
+            metrics.flush()
+    metrics.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="events.request listener overhead benchmark.")
+    parser.add_argument("--requests", type=int, default=200000)
+    # 2500 = 10k RPS with the default 250 ms flush interval
+    parser.add_argument("--flush-every", type=int, default=2500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = make_samples(args.requests)
+    direct = min(bench_direct(samples) for _ in range(args.repeat))
+    buffered = min(bench_buffered(samples, args.flush_every) for _ in range(args.repeat))
+
+    per_direct = direct / args.requests * 1e9
+    per_buffered = buffered / args.requests * 1e9
+    print(f"direct .labels():  {per_direct:8.0f} ns/request")
+    print(f"buffered record(): {per_buffered:8.0f} ns/request (incl. flush)")
+    print(f"speed-up:          {per_direct / per_buffered:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,41 +2,169 @@
 """
 locust_login_test.py
 Requires: pip install psutil
+
+Engine selection (env):
+  LOCUST_ENGINE=http  - HttpUser (python-requests), default
+  LOCUST_ENGINE=fast  - FastHttpUser (geventhttpclient), pooled keep-alive connections
+
+Load model (env):
+  LOCUST_MODEL=closed - every user loops the scenario with wait_time (default)
+  LOCUST_MODEL=open   - users are schedulers starting LOCUST_ARRIVAL_RATE iterations/s in
+                        total; latencies are also reported from the intended send time
+
+Login flow (env):
+  LOCUST_LOGIN_FLOW=form   - GET the form, POST the credentials (session cookie kept by
+                             the client), log out; default for any other host
+  LOCUST_LOGIN_FLOW=static - only GET the login and success pages; default for the
+                             public practice site, whose form is checked in JavaScript
+  LOCUST_WARM_SHARE        - share of users reusing sessions from a pool logged in
+                             before the ramp (see session_pool.py); cold logins and
+                             warm traffic get separate latency histograms
+
+Capacity search (env):
+  LOCUST_SHAPE=search - step users up until throughput stops growing or the SLO
+                        breaks, bisect around the knee and report the maximum
+                        sustainable RPS (see capacity_search.py); -u/-r are ignored
+
+Profiling (env):
+  LOCUST_PROFILE=1    - sample the stacks of the running greenlet every
+                        LOCUST_PROFILE_INTERVAL_MS, attribute them to tasks,
+                        event listeners and metrics code and write collapsed
+                        stacks (flamegraph input) at test stop (see sampling_profiler.py)
+
+Result history (env):
+  RESULT_STORE=<path> - the master (or standalone process) saves the final metric
+                        set and the run's settings into a local SQLite store
+                        (see result_store/result_store.py for the query CLI)
+
+Distributed runs (--master/--worker or --processes):
+  workers pre-aggregate request counters, latency histograms and CPU/RSS samples
+  and send them with every stats report; only the master (or a standalone
+  process) writes and pushes the merged metric set.
 """
 
 import os
+import sys
 import time
 import threading
 import psutil
-from locust import HttpUser, TaskSet, task, between, events
+from locust import HttpUser, FastHttpUser, TaskSet, LoadTestShape, task, between, constant, events
+from locust.event import EventHook
+from locust.runners import MasterRunner, WorkerRunner
 from prometheus_client import (
-    CollectorRegistry, Counter, Histogram, Gauge,
-    push_to_gateway, generate_latest, REGISTRY
+    CollectorRegistry, Counter, Gauge,
+    generate_latest
 )
 from colorama import init
+from request_metrics import RequestMetrics
+from latency_histogram import LatencyHistogramCollector, print_percentiles
+from metrics_exporter import MetricsExporter
+from sample_log import SampleLogWriter, STATUS_ERROR_BIT
+from open_model import ScheduleStats, SchedulerCount, run_schedule, slot_client
+from capacity_search import CapacitySearch
+from saturation_monitor import SaturationMonitor
+from response_validation import ResponseValidator, ValidationStats
+from session_pool import SessionPool
+from sampling_profiler import SamplingProfiler
+
+# Result store shared by all suites
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "result_store"))
+from result_store import record_run
 
 init(autoreset=True)
 
-LOCUST_HOST = os.getenv("LOCUST_HOST", "https://practicetestautomation.com")
+# TARGET_BASE_URL is shared with the browser suites (e.g. the local target_server)
+TARGET_BASE_URL = os.getenv("TARGET_BASE_URL", "https://practicetestautomation.com").rstrip("/")
+LOCUST_HOST = os.getenv("LOCUST_HOST", TARGET_BASE_URL)
 USERNAME = os.getenv("LOCUST_USERNAME", "student")
 PASSWORD = os.getenv("LOCUST_PASSWORD", "Password123")
+LOCUST_LOGIN_FLOW = os.getenv(
+    "LOCUST_LOGIN_FLOW", "static" if "practicetestautomation.com" in LOCUST_HOST else "form").lower()
+# Share of users (0..1) that reuse pre-authenticated sessions instead of logging in
+LOCUST_WARM_SHARE = float(os.getenv("LOCUST_WARM_SHARE", 0))
+# Sessions logged in before the ramp, per process; warm users share them round-robin
+LOCUST_SESSION_POOL_SIZE = int(os.getenv("LOCUST_SESSION_POOL_SIZE", 100))
+LOCUST_SESSION_WARMUP_CONCURRENCY = int(os.getenv("LOCUST_SESSION_WARMUP_CONCURRENCY", 20))
 PUSHGATEWAY_ADDRESS = os.getenv("PUSHGATEWAY_ADDRESS", "http://localhost:9091").rstrip("/")
+LOCUST_INSTANCE = os.getenv("LOCUST_INSTANCE", "locust_jenkins")
+LOCUST_ENGINE = os.getenv("LOCUST_ENGINE", "http").lower()
+LOCUST_MODEL = os.getenv("LOCUST_MODEL", "closed").lower()
+# Open model: total scenario iterations started per second, spread over all users
+LOCUST_ARRIVAL_RATE = float(os.getenv("LOCUST_ARRIVAL_RATE", 10))
+LOCUST_ARRIVAL_DISTRIBUTION = os.getenv("LOCUST_ARRIVAL_DISTRIBUTION", "constant").lower()
+# Open model: max iterations in flight per user; further starts wait (and count as late)
+LOCUST_MAX_IN_FLIGHT = int(os.getenv("LOCUST_MAX_IN_FLIGHT", 100))
+LOCUST_LATE_THRESHOLD_MS = float(os.getenv("LOCUST_LATE_THRESHOLD_MS", 10))
+# Generator self-monitoring: sample interval and saturation thresholds
+LOCUST_MONITOR_INTERVAL_MS = int(os.getenv("LOCUST_MONITOR_INTERVAL_MS", 100))
+LOCUST_MAX_LOOP_LAG_MS = float(os.getenv("LOCUST_MAX_LOOP_LAG_MS", 50))
+LOCUST_MAX_CPU_PERCENT = float(os.getenv("LOCUST_MAX_CPU_PERCENT", 90))
+LOCUST_MAX_CORE_PERCENT = float(os.getenv("LOCUST_MAX_CORE_PERCENT", 95))
+# 0 = 90% of the soft RLIMIT_NOFILE
+LOCUST_MAX_FDS = int(os.getenv("LOCUST_MAX_FDS", 0))
+# "search" = adaptive max-throughput search instead of a fixed -u/-r
+LOCUST_SHAPE = os.getenv("LOCUST_SHAPE", "").lower()
+SEARCH_START_USERS = int(os.getenv("SEARCH_START_USERS", 10))
+SEARCH_MAX_USERS = int(os.getenv("SEARCH_MAX_USERS", 10000))
+SEARCH_FACTOR = float(os.getenv("SEARCH_FACTOR", 2.0))
+SEARCH_SPAWN_RATE = float(os.getenv("SEARCH_SPAWN_RATE", 10))
+SEARCH_STEP_SECONDS = float(os.getenv("SEARCH_STEP_SECONDS", 60))
+SEARCH_SETTLE_SECONDS = float(os.getenv("SEARCH_SETTLE_SECONDS", 15))
+SEARCH_SLO_P95_MS = float(os.getenv("SEARCH_SLO_P95_MS", 1000))
+SEARCH_MAX_ERROR_RATE = float(os.getenv("SEARCH_MAX_ERROR_RATE", 0.01))
+SEARCH_MIN_GAIN = float(os.getenv("SEARCH_MIN_GAIN", 0.05))
+SEARCH_BISECT_STEPS = int(os.getenv("SEARCH_BISECT_STEPS", 3))
+# FastHttpUser only: max concurrent keep-alive connections per user
+LOCUST_POOL_SIZE = int(os.getenv("LOCUST_POOL_SIZE", 1))
+LOCUST_CONNECTION_TIMEOUT = float(os.getenv("LOCUST_CONNECTION_TIMEOUT", 60.0))
+LOCUST_NETWORK_TIMEOUT = float(os.getenv("LOCUST_NETWORK_TIMEOUT", 60.0))
+# Request uncompressed bodies (no gzip decoding on the generator)
+LOCUST_SKIP_DECODE = os.getenv("LOCUST_SKIP_DECODE", "0") == "1"
+# Validate headers/body of every N-th response only (status is always checked)
+LOCUST_VALIDATE_SAMPLE_RATE = int(os.getenv("LOCUST_VALIDATE_SAMPLE_RATE", 1))
+# Read validated bodies in chunks and stop scanning at the first decisive match
+LOCUST_VALIDATE_STREAM = os.getenv("LOCUST_VALIDATE_STREAM", "0") == "1"
+# How often buffered request metrics are flushed into the registry
+LOCUST_METRICS_FLUSH_MS = int(os.getenv("LOCUST_METRICS_FLUSH_MS", 250))
+# Serve a live /metrics endpoint on this port (0 = disabled)
+LOCUST_METRICS_PORT = int(os.getenv("LOCUST_METRICS_PORT", 0))
+# Push to the Pushgateway every N seconds during the run (0 = only at test stop)
+LOCUST_PUSH_INTERVAL = float(os.getenv("LOCUST_PUSH_INTERVAL", 0))
+LOCUST_PUSH_RETRIES = int(os.getenv("LOCUST_PUSH_RETRIES", 3))
+# Text snapshot written at test stop (empty = disabled)
+LOCUST_METRICS_FILE = os.getenv("LOCUST_METRICS_FILE", "locust_metrics.txt")
+# Mergeable per-endpoint latency histograms are dumped here at test stop
+LOCUST_HISTOGRAM_FILE = os.getenv("LOCUST_HISTOGRAM_FILE", "locust_latency_histograms.json")
+# Binary per-request sample log (empty = disabled); workers add their PID to the name
+LOCUST_SAMPLE_LOG = os.getenv("LOCUST_SAMPLE_LOG", "")
+# Sampling profiler (opt-in); collapsed stacks go to LOCUST_PROFILE_FILE, workers add their PID
+LOCUST_PROFILE = os.getenv("LOCUST_PROFILE", "0") == "1"
+LOCUST_PROFILE_INTERVAL_MS = float(os.getenv("LOCUST_PROFILE_INTERVAL_MS", 10))
+LOCUST_PROFILE_FILE = os.getenv("LOCUST_PROFILE_FILE", "locust_profile.collapsed")
+# SQLite result store for cross-run trends (empty = disabled)
+RESULT_STORE = os.getenv("RESULT_STORE", "")
 
 print(f"LOCUST_HOST: {LOCUST_HOST}")
 print(f"PUSHGATEWAY_ADDRESS: {PUSHGATEWAY_ADDRESS}")
+print(f"LOCUST_ENGINE: {LOCUST_ENGINE}")
+print(f"LOCUST_MODEL: {LOCUST_MODEL}")
+print(f"LOCUST_LOGIN_FLOW: {LOCUST_LOGIN_FLOW}")
+if LOCUST_SHAPE:
+    print(f"LOCUST_SHAPE: {LOCUST_SHAPE}")
 
 HEADERS = {
     "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                    "AppleWebKit/537.36 (KHTML, like Gecko) "
                    "Chrome/132.0.0.0 Safari/537.36")
 }
+if LOCUST_SKIP_DECODE:
+    HEADERS["Accept-Encoding"] = "identity"
+
+SUCCESS_MARKERS = (b"Logged In Successfully", b"Congratulations")
+LOGIN_FORM = {"username": USERNAME, "password": PASSWORD}
 
+# Own registry: the global REGISTRY (and its default collectors) is left untouched
 registry = CollectorRegistry(auto_describe=False)
-for collector in list(REGISTRY._collector_to_names.keys()):
-    try:
-        REGISTRY.unregister(collector)
-    except Exception as e:
-        print(f"Collector unregister error: {e}")
 
 REQUEST_SUCCESS_COUNTER = Counter(
     "locust_request_success_total",
@@ -50,112 +178,507 @@ REQUEST_FAILURE_COUNTER = Counter(
     ["method", "name", "response_code", "instance"],
     registry=registry
 )
-REQUEST_DURATION_HISTOGRAM = Histogram(
+REQUEST_DURATION_HISTOGRAM = LatencyHistogramCollector(
     "locust_request_duration_seconds",
     "Histogram of request durations in seconds",
-    ["instance"],
-    buckets=[0.1, 0.3, 1.5, 10.0],
-    registry=registry
+    instance=LOCUST_INSTANCE
+)
+registry.register(REQUEST_DURATION_HISTOGRAM)
+REQUEST_CORRECTED_DURATION_HISTOGRAM = LatencyHistogramCollector(
+    "locust_request_corrected_duration_seconds",
+    "Histogram of request durations measured from the intended send time (open model)",
+    instance=LOCUST_INSTANCE
+)
+SESSION_DURATION_HISTOGRAM = LatencyHistogramCollector(
+    "locust_session_request_duration_seconds",
+    "Histogram of request durations by session kind (cold_login = requests of a full login, "
+    "warm = authenticated requests on a pooled session)",
+    instance=LOCUST_INSTANCE
+)
+registry.register(SESSION_DURATION_HISTOGRAM)
+schedule_stats = ScheduleStats(LOCUST_INSTANCE, late_threshold_ms=LOCUST_LATE_THRESHOLD_MS)
+scheduler_count = SchedulerCount()
+if LOCUST_MODEL == "open":
+    registry.register(REQUEST_CORRECTED_DURATION_HISTOGRAM)
+    registry.register(schedule_stats)
+MONITOR_SAMPLES_PER_SECOND = max(1, round(1000 / LOCUST_MONITOR_INTERVAL_MS))
+saturation_monitor = SaturationMonitor(
+    LOCUST_INSTANCE,
+    interval=LOCUST_MONITOR_INTERVAL_MS / 1000,
+    slow_every=MONITOR_SAMPLES_PER_SECOND,
+    max_loop_lag_ms=LOCUST_MAX_LOOP_LAG_MS,
+    max_cpu_percent=LOCUST_MAX_CPU_PERCENT,
+    max_core_percent=LOCUST_MAX_CORE_PERCENT,
+    max_fds=LOCUST_MAX_FDS,
+    bound_checks={"schedule": lambda: schedule_stats.generator_bound} if LOCUST_MODEL == "open" else None
+)
+registry.register(saturation_monitor)
+validation_stats = ValidationStats(LOCUST_INSTANCE)
+registry.register(validation_stats)
+profiler = SamplingProfiler(LOCUST_INSTANCE, interval=LOCUST_PROFILE_INTERVAL_MS / 1000)
+if LOCUST_PROFILE:
+    registry.register(profiler)
+LOGIN_PAGE_VALIDATOR = ResponseValidator("Load Login Page", status=(200,), stream=LOCUST_VALIDATE_STREAM)
+SUCCESS_PAGE_VALIDATOR = ResponseValidator(
+    "After Login Redirect",
+    validation_stats,
+    status=(200,),
+    body_any=SUCCESS_MARKERS,
+    sample_rate=LOCUST_VALIDATE_SAMPLE_RATE,
+    stream=LOCUST_VALIDATE_STREAM
+)
+SUBMIT_LOGIN_VALIDATOR = ResponseValidator(
+    "Submit Login",
+    validation_stats,
+    status=(200,),
+    body_any=SUCCESS_MARKERS,
+    sample_rate=LOCUST_VALIDATE_SAMPLE_RATE,
+    stream=LOCUST_VALIDATE_STREAM
 )
+AUTHENTICATED_PAGE_VALIDATOR = ResponseValidator(
+    "Authenticated Page",
+    validation_stats,
+    status=(200,),
+    body_any=SUCCESS_MARKERS,
+    sample_rate=LOCUST_VALIDATE_SAMPLE_RATE,
+    stream=LOCUST_VALIDATE_STREAM
+)
+LOGOUT_VALIDATOR = ResponseValidator("Logout", status=(200,), stream=LOCUST_VALIDATE_STREAM)
 LOCUST_CPU_USAGE_GAUGE = Gauge(
     "locust_cpu_usage_percent",
-    "CPU usage of the Locust process (percent)",
+    "CPU usage of all Locust processes (percent)",
     ["instance"],
     registry=registry
 )
 LOCUST_MEMORY_USAGE_GAUGE = Gauge(
     "locust_memory_usage_bytes",
-    "Memory usage of the Locust process (in bytes)",
+    "Memory usage of all Locust processes (in bytes)",
     ["instance"],
     registry=registry
 )
+LOCUST_WORKER_CPU_USAGE_GAUGE = Gauge(
+    "locust_worker_cpu_usage_percent",
+    "Average CPU usage of a Locust process since its last report (percent)",
+    ["instance", "worker"],
+    registry=registry
+)
+LOCUST_WORKER_MEMORY_USAGE_GAUGE = Gauge(
+    "locust_worker_memory_usage_bytes",
+    "Peak memory usage of a Locust process since its last report (in bytes)",
+    ["instance", "worker"],
+    registry=registry
+)
+
+request_metrics = RequestMetrics(
+    REQUEST_SUCCESS_COUNTER,
+    REQUEST_FAILURE_COUNTER,
+    REQUEST_DURATION_HISTOGRAM,
+    instance=LOCUST_INSTANCE,
+    flush_interval_ms=LOCUST_METRICS_FLUSH_MS,
+    corrected_collector=REQUEST_CORRECTED_DURATION_HISTOGRAM,
+    session_collector=SESSION_DURATION_HISTOGRAM
+)
+
+capacity_search = CapacitySearch(
+    request_metrics,
+    REQUEST_DURATION_HISTOGRAM,
+    instance=LOCUST_INSTANCE,
+    start_users=SEARCH_START_USERS,
+    max_users=SEARCH_MAX_USERS,
+    factor=SEARCH_FACTOR,
+    spawn_rate=SEARCH_SPAWN_RATE,
+    step_seconds=SEARCH_STEP_SECONDS,
+    settle_seconds=SEARCH_SETTLE_SECONDS,
+    slo_p95_ms=SEARCH_SLO_P95_MS,
+    max_error_rate=SEARCH_MAX_ERROR_RATE,
+    min_gain=SEARCH_MIN_GAIN,
+    bisect_steps=SEARCH_BISECT_STEPS
+)
+if LOCUST_SHAPE == "search":
+    registry.register(capacity_search)
+
+def warm_up_login(session, base_url):
+    # Same login as a cold user, with a plain requests.Session (not recorded by Locust)
+    if LOCUST_LOGIN_FLOW == "form":
+        r = session.post(f"{base_url}/practice-test-login/", data=LOGIN_FORM, headers=HEADERS,
+                         timeout=LOCUST_NETWORK_TIMEOUT)
+    else:
+        r = session.get(f"{base_url}/logged-in-successfully/", headers=HEADERS, timeout=LOCUST_NETWORK_TIMEOUT)
+    return r.status_code == 200 and any(marker in r.content for marker in SUCCESS_MARKERS)
+
+session_pool = SessionPool(
+    warm_up_login,
+    size=LOCUST_SESSION_POOL_SIZE,
+    warm_share=LOCUST_WARM_SHARE,
+    concurrency=LOCUST_SESSION_WARMUP_CONCURRENCY
+)
+
+# "standalone", "master" or "worker"; set in on_locust_init
+runner_role = "standalone"
+# Latest pre-aggregated CPU/RSS sample per process, keyed by worker id
+resource_samples = {}
+# Master only: worker reports that arrived after test_stop already exported
+late_reports = False
+sample_log = None
+# Start time of the current test and its id in RESULT_STORE (replaced on a late re-export)
+test_started = None
+result_run_id = None
+
+metrics_exporter = MetricsExporter(
+    registry,
+    PUSHGATEWAY_ADDRESS,
+    job="locust_tests",
+    grouping_key={"instance": LOCUST_INSTANCE},
+    push_interval=LOCUST_PUSH_INTERVAL,
+    retries=LOCUST_PUSH_RETRIES
+)
 
 def collect_metrics_to_file(file_path):
     try:
-        metrics_data = generate_latest(registry).decode('utf-8')
-        with open(file_path, 'w') as f:
+        metrics_data = generate_latest(registry)
+        with open(file_path, 'wb') as f:
             f.write(metrics_data)
     except Exception as e:
         print(f"Error collecting metrics: {e}")
 
-def push_metrics_from_file(file_path):
-    try:
-        if not os.path.exists(file_path):
-            print(f"File {file_path} does not exist.")
-            return
-        with open(file_path, 'r') as f:
-            print(f.read())
-        push_to_gateway(
-            PUSHGATEWAY_ADDRESS,
-            job="locust_tests",
-            grouping_key={"instance": "locust_jenkins"},
-            registry=registry
-        )
-    except Exception as e:
-        print(f"Error pushing metrics: {e}")
+# cpu_percent() measures since the previous call on the same Process object
+process = psutil.Process(os.getpid())
+cpu_ram_window = {"cpu_sum": 0.0, "samples": 0, "rss_max": 0}
+
+def take_cpu_ram_window():
+    global cpu_ram_window
+    window, cpu_ram_window = cpu_ram_window, {"cpu_sum": 0.0, "samples": 0, "rss_max": 0}
+    samples = window["samples"]
+    return {
+        "cpu_percent": window["cpu_sum"] / samples if samples else 0.0,
+        "rss": window["rss_max"],
+    }
+
+def update_resource_gauges():
+    LOCUST_CPU_USAGE_GAUGE.labels(instance=LOCUST_INSTANCE).set(
+        sum(s["cpu_percent"] for s in resource_samples.values()))
+    LOCUST_MEMORY_USAGE_GAUGE.labels(instance=LOCUST_INSTANCE).set(
+        sum(s["rss"] for s in resource_samples.values()))
+    for worker, sample in resource_samples.items():
+        LOCUST_WORKER_CPU_USAGE_GAUGE.labels(instance=LOCUST_INSTANCE, worker=worker).set(sample["cpu_percent"])
+        LOCUST_WORKER_MEMORY_USAGE_GAUGE.labels(instance=LOCUST_INSTANCE, worker=worker).set(sample["rss"])
 
 def update_cpu_ram_metrics():
-    process = psutil.Process(os.getpid())
-    cpu_percent = process.cpu_percent(interval=None)
-    memory_usage = process.memory_info().rss
-    LOCUST_CPU_USAGE_GAUGE.labels(instance="locust_jenkins").set(cpu_percent)
-    LOCUST_MEMORY_USAGE_GAUGE.labels(instance="locust_jenkins").set(memory_usage)
+    cpu_ram_window["cpu_sum"] += process.cpu_percent(interval=None)
+    cpu_ram_window["samples"] += 1
+    cpu_ram_window["rss_max"] = max(cpu_ram_window["rss_max"], process.memory_info().rss)
+    if runner_role != "worker":
+        resource_samples[runner_role] = take_cpu_ram_window()
+        update_resource_gauges()
 
 stop_event = threading.Event()
+monitor_thread = None
 def cpu_ram_monitor():
-    while not stop_event.is_set():
-        update_cpu_ram_metrics()
-        time.sleep(1)
+    # Sub-second saturation samples; CPU/RAM gauges keep their 1 s cadence
+    tick = 0
+    while True:
+        saturation_monitor.sample()
+        if tick % MONITOR_SAMPLES_PER_SECOND == 0:
+            update_cpu_ram_metrics()
+            if runner_role != "worker":
+                saturation_monitor.update_local(runner_role)
+        tick += 1
+        if saturation_monitor.sleep(stop_event):
+            break
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    global runner_role
+    if isinstance(environment.runner, MasterRunner):
+        runner_role = "master"
+    elif isinstance(environment.runner, WorkerRunner):
+        runner_role = "worker"
+        request_metrics.report_mode = True
+    runner = environment.runner
+    if runner is not None:
+        if LOCUST_MODEL == "open":
+            scheduler_count.install(environment)
+        saturation_monitor.greenlet_count = lambda: len(runner.user_greenlets) + schedule_stats.in_flight
+    if runner_role != "worker":
+        metrics_exporter.serve(LOCUST_METRICS_PORT)
+    if LOCUST_SAMPLE_LOG and runner_role != "master":
+        events.request.add_listener(on_request_sample)
+
+def per_process_path(path):
+    if runner_role != "worker":
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.{os.getpid()}{ext}"
+
+@events.report_to_master.add_listener
+def on_report_to_master(client_id, data, **kwargs):
+    data["prometheus_metrics"] = request_metrics.take_report()
+    data["prometheus_resources"] = take_cpu_ram_window()
+    data["prometheus_saturation"] = saturation_monitor.take_report()
+    data["prometheus_validation"] = validation_stats.take_report()
+    if LOCUST_MODEL == "open":
+        data["prometheus_schedule"] = schedule_stats.take_report()
+    if LOCUST_PROFILE:
+        data["prometheus_profile"] = profiler.take_report()
+
+@events.worker_report.add_listener
+def on_worker_report(client_id, data, **kwargs):
+    global late_reports
+    if "prometheus_metrics" in data:
+        request_metrics.merge_report(data["prometheus_metrics"])
+        late_reports = late_reports or stop_event.is_set()
+    if "prometheus_schedule" in data:
+        schedule_stats.merge_report(data["prometheus_schedule"])
+    if "prometheus_validation" in data:
+        validation_stats.merge_report(data["prometheus_validation"])
+    if "prometheus_saturation" in data:
+        saturation_monitor.merge_report(data["prometheus_saturation"], client_id)
+    if "prometheus_profile" in data:
+        profiler.merge_report(data["prometheus_profile"], client_id)
+    if "prometheus_resources" in data:
+        resource_samples[client_id] = data["prometheus_resources"]
+        update_resource_gauges()
 
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
-    global monitor_thread
+    global monitor_thread, late_reports, sample_log, test_started, result_run_id
+    stop_event.clear()
+    late_reports = False
+    test_started = time.time()
+    result_run_id = None
+    saturation_monitor.reset()
+    if LOCUST_PROFILE:
+        profiler.reset()
+        profiler.start()
+    if LOCUST_SAMPLE_LOG and runner_role != "master":
+        sample_log = SampleLogWriter(per_process_path(LOCUST_SAMPLE_LOG))
     monitor_thread = threading.Thread(target=cpu_ram_monitor)
     monitor_thread.daemon = True
     monitor_thread.start()
+    request_metrics.start()
+    if runner_role != "worker":
+        metrics_exporter.start()
+    if LOCUST_MODEL == "open":
+        # Before the spawn messages, so workers compute the rate from the total
+        scheduler_count.announce(environment)
+    if session_pool.enabled and runner_role != "master":
+        # Blocks the spawning of users until the pool is logged in
+        warmed = session_pool.warm_up(environment.host or LOCUST_HOST)
+        print(f"Session pool warmed up: {warmed}/{LOCUST_SESSION_POOL_SIZE} sessions")
 
 @events.request.add_listener
-def on_request(request_type, name, response_time, response_length, exception, **kwargs):
-    REQUEST_DURATION_HISTOGRAM.labels(instance="locust_jenkins").observe(response_time / 1000)
+def on_request(request_type, name, response_time, response_length, exception, context=None, **kwargs):
+    # Set only by the open model: delay between intended and actual iteration start
+    lag = context.get("schedule_lag_ms") if context else None
+    # "cold_login" or "warm", set by the login flows
+    session = context.get("session") if context else None
     if exception is None:
-        REQUEST_SUCCESS_COUNTER.labels(
-            method=request_type,
-            name=name,
-            response_code="200",
-            instance="locust_jenkins"
-        ).inc()
+        request_metrics.record(request_type, name, "200", response_time, True, lag, session)
+    else:
+        request_metrics.record(request_type, name, "0", response_time, False, lag, session)
+
+def on_request_sample(request_type, name, response_time, response_length, exception,
+                      response=None, start_time=None, **kwargs):
+    if sample_log is None:
+        return
+    status = getattr(response, "status_code", None) or 0
+    if exception is not None:
+        status |= STATUS_ERROR_BIT
+    sample_log.record(name, status, response_time, response_length, start_time or time.time())
+
+def load_login_page(client, context):
+    with client.get("/practice-test-login/", headers=HEADERS, catch_response=True, name="Load Login Page",
+                    context=context, stream=LOCUST_VALIDATE_STREAM) as resp:
+        error = LOGIN_PAGE_VALIDATOR.check(resp)
+        if error is None:
+            resp.success()
+            return True
+        resp.failure(f"Failed to load login page: {error}")
+        return False
+
+def form_login_flow(client, context):
+    cold = dict(context, session="cold_login")
+    if not load_login_page(client, cold):
+        return
+    # The 303 redirect to the success page is followed; its session cookie stays in the client
+    with client.post("/practice-test-login/", data=LOGIN_FORM, headers=HEADERS, catch_response=True,
+                     name="Submit Login", context=cold, stream=LOCUST_VALIDATE_STREAM) as r:
+        error = SUBMIT_LOGIN_VALIDATOR.check(r)
+        if error is None:
+            r.success()
+        else:
+            r.failure(f"Unexpected login result: {error}")
+            return
+    with client.get("/logout/", headers=HEADERS, catch_response=True, name="Logout",
+                    context=context, stream=LOCUST_VALIDATE_STREAM) as r:
+        error = LOGOUT_VALIDATOR.check(r)
+        if error is None:
+            r.success()
+        else:
+            r.failure(f"Logout failed: {error}")
+
+def static_login_flow(client, context):
+    cold = dict(context, session="cold_login")
+    if not load_login_page(client, cold):
+        return
+    with client.get("/logged-in-successfully/", headers=HEADERS, catch_response=True, name="After Login Redirect",
+                    context=cold, stream=LOCUST_VALIDATE_STREAM) as r:
+        error = SUCCESS_PAGE_VALIDATOR.check(r)
+        if error is None:
+            r.success()
+        else:
+            r.failure(f"Unexpected login result: {error}")
+
+def warm_session_flow(client, context):
+    # Pooled sessions are never logged out, other users share them
+    with client.get("/logged-in-successfully/", headers=HEADERS, catch_response=True, name="Authenticated Page",
+                    context=dict(context, session="warm"), stream=LOCUST_VALIDATE_STREAM) as r:
+        error = AUTHENTICATED_PAGE_VALIDATOR.check(r)
+        if error is None:
+            r.success()
+        else:
+            r.failure(f"Session not authenticated: {error}")
+
+def is_warm_user(user):
+    warm = getattr(user, "warm_session", None)
+    if warm is None:
+        warm = user.warm_session = session_pool.enabled and session_pool.assign(user.client)
+    return warm
+
+def login_flow(user, context=None, client=None):
+    context = context or {}
+    if is_warm_user(user):
+        # Pooled sessions are never logged out, so concurrent iterations can share user.client
+        warm_session_flow(user.client, context)
+    elif LOCUST_LOGIN_FLOW == "form":
+        form_login_flow(client or user.client, context)
     else:
-        REQUEST_FAILURE_COUNTER.labels(
-            method=request_type,
-            name=name,
-            response_code="0",
-            instance="locust_jenkins"
-        ).inc()
+        static_login_flow(client or user.client, context)
 
 class PracticeLoginScenario(TaskSet):
     @task
     def login_test(self):
-        with self.client.get("/practice-test-login/", headers=HEADERS, catch_response=True, name="Load Login Page") as resp:
-            if resp.status_code == 200:
-                resp.success()
-            else:
-                resp.failure(f"Failed to load login page. Code: {resp.status_code}")
-                return
-        with self.client.get("/logged-in-successfully/", headers=HEADERS, catch_response=True, name="After Login Redirect") as r:
-            if r.status_code == 200 and ("Logged In Successfully" in r.text or "Congratulations" in r.text):
-                r.success()
-            else:
-                r.failure(f"Unexpected login result. Code: {r.status_code}")
+        login_flow(self.user)
+
+def open_model_iteration(user, lag_ms, client):
+    # Own client per running iteration: concurrent logins must not share a cookie jar
+    login_flow(user, {"schedule_lag_ms": lag_ms}, client)
+
+def open_model_task(user):
+    environment = user.environment
+    if LOCUST_SHAPE == "search":
+        # The search ramps schedulers, so the rate is per user
+        total_users = 1
+    else:
+        total_users = scheduler_count.get(environment); print("DEBUG total_users", total_users, time.time(), flush=True)
+    run_schedule(user, open_model_iteration, LOCUST_ARRIVAL_RATE / total_users, schedule_stats,
+                 max_in_flight=LOCUST_MAX_IN_FLIGHT, distribution=LOCUST_ARRIVAL_DISTRIBUTION,
+                 new_session=slot_client)
+
+def user_class_enabled(engine, model):
+    return LOCUST_ENGINE == engine and LOCUST_MODEL == model
 
 class WebsiteUser(HttpUser):
+    abstract = not user_class_enabled("http", "closed")
     host = LOCUST_HOST
     tasks = [PracticeLoginScenario]
     wait_time = between(1, 3)
 
+class FastWebsiteUser(FastHttpUser):
+    abstract = not user_class_enabled("fast", "closed")
+    host = LOCUST_HOST
+    tasks = [PracticeLoginScenario]
+    wait_time = between(1, 3)
+    concurrency = LOCUST_POOL_SIZE
+    connection_timeout = LOCUST_CONNECTION_TIMEOUT
+    network_timeout = LOCUST_NETWORK_TIMEOUT
+
+class OpenWebsiteUser(HttpUser):
+    abstract = not user_class_enabled("http", "open")
+    host = LOCUST_HOST
+    tasks = [open_model_task]
+    wait_time = constant(0)
+
+class FastOpenWebsiteUser(FastHttpUser):
+    abstract = not user_class_enabled("fast", "open")
+    host = LOCUST_HOST
+    tasks = [open_model_task]
+    wait_time = constant(0)
+    # Warm iterations of one scheduler share user.client concurrently, each needs its own connection
+    concurrency = max(LOCUST_POOL_SIZE, LOCUST_MAX_IN_FLIGHT)
+    connection_timeout = LOCUST_CONNECTION_TIMEOUT
+    network_timeout = LOCUST_NETWORK_TIMEOUT
+
+class CapacitySearchShape(LoadTestShape):
+    abstract = LOCUST_SHAPE != "search"
+
+    def reset_time(self):
+        super().reset_time()
+        capacity_search.reset()
+
+    def tick(self):
+        # The step is measured only once the runner has spawned its users
+        return capacity_search.tick(self.get_run_time(), self.runner.user_count if self.runner else None)
+
+# Profiler categories; the innermost labelled frame of a sample decides
+profiler.label("task", login_flow)
+profiler.label("listener", EventHook.fire, on_request, on_request_sample, on_report_to_master, on_worker_report)
+profiler.label("metrics", RequestMetrics.flush, cpu_ram_monitor, collect_metrics_to_file, MetricsExporter.push,
+               SaturationMonitor.sample)
+
+def export_metrics():
+    global result_run_id
+    print_percentiles(REQUEST_DURATION_HISTOGRAM.histograms)
+    if LOCUST_SHAPE == "search":
+        capacity_search.print_summary()
+    if LOCUST_MODEL == "open":
+        print("Corrected for coordinated omission (from intended send time):")
+        print_percentiles(REQUEST_CORRECTED_DURATION_HISTOGRAM.histograms)
+        schedule_stats.print_summary()
+    if SESSION_DURATION_HISTOGRAM.histograms:
+        print("By session kind:")
+        print_percentiles(SESSION_DURATION_HISTOGRAM.histograms)
+    saturation_monitor.print_summary()
+    validation_stats.print_summary()
+    try:
+        REQUEST_DURATION_HISTOGRAM.dump(LOCUST_HISTOGRAM_FILE)
+    except Exception as e:
+        print(f"Error dumping latency histograms: {e}")
+    if LOCUST_METRICS_FILE:
+        collect_metrics_to_file(LOCUST_METRICS_FILE)
+    metrics_exporter.push()
+    if RESULT_STORE:
+        metadata = {"engine": LOCUST_ENGINE, "model": LOCUST_MODEL, "login_flow": LOCUST_LOGIN_FLOW,
+                    "role": runner_role}
+        result_run_id = record_run(RESULT_STORE, "locust", registry.collect(), test_started or time.time(),
+                                   metadata=metadata, run_id=result_run_id)
+
 @events.test_stop.add_listener
 def on_test_stop(environment, **kwargs):
     stop_event.set()
-    monitor_thread.join()
-    file_path = "locust_metrics.txt"
-    collect_metrics_to_file(file_path)
-    push_metrics_from_file(file_path)
+    if monitor_thread is not None:
+        monitor_thread.join()
+    request_metrics.stop()
+    if sample_log is not None:
+        sample_log.close()
+    if LOCUST_PROFILE:
+        profiler.stop()
+        try:
+            profiler.write_collapsed(per_process_path(LOCUST_PROFILE_FILE))
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+        profiler.print_summary()
+        if runner_role != "worker":
+            profiler.update_local(runner_role)
+    if session_pool.enabled and runner_role != "master":
+        session_pool.print_summary()
+    # Workers hand everything to the master through report_to_master
+    if runner_role != "worker":
+        metrics_exporter.stop()
+        export_metrics()
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    # The workers' final reports can reach the master after its test_stop
+    if runner_role == "master" and late_reports:
+        export_metrics()
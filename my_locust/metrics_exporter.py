@@ -0,0 +1,84 @@
+"""
+metrics_exporter.py
+Live export of a Prometheus registry while a test is running:
+  - optional /metrics scrape endpoint (prometheus_client HTTP server),
+  - optional periodic push to the Pushgateway from a background thread
+    (a greenlet under Locust's monkey patching) with retry and backoff.
+The final push at test stop goes through the same retry logic.
+An empty gateway address disables pushing (e.g. when an orchestrator
+collects the metrics file and pushes everything at once).
+"""
+
+import time
+import threading
+from prometheus_client import start_http_server, push_to_gateway
+
+
+class MetricsExporter:
+    def __init__(self, registry, gateway, job, grouping_key,
+                 push_interval=0.0, retries=3, backoff=0.5, max_backoff=10.0):
+        self.registry = registry
+        self.gateway = gateway
+        self.job = job
+        self.grouping_key = grouping_key
+        self.push_interval = push_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.server_started = False
+        self._stop_event = threading.Event()
+        self._push_lock = threading.Lock()
+        self._thread = None
+
+    def serve(self, port, addr="0.0.0.0"):
+        if self.server_started or not port:
+            return
+        try:
+            start_http_server(port, addr=addr, registry=self.registry)
+            self.server_started = True
+            print(f"Serving metrics on http://{addr}:{port}/metrics")
+        except Exception as e:
+            print(f"Error starting metrics endpoint: {e}")
+
+    def push(self):
+        """Push the current registry; retries with exponential backoff. Returns True on success."""
+        if not self.gateway:
+            return False
+        delay = self.backoff
+        with self._push_lock:
+            for attempt in range(1, self.retries + 2):
+                try:
+                    push_to_gateway(self.gateway, job=self.job,
+                                    grouping_key=self.grouping_key, registry=self.registry)
+                    return True
+                except Exception as e:
+                    if attempt > self.retries:
+                        print(f"Error pushing metrics (giving up after {attempt} attempts): {e}")
+                        return False
+                    print(f"Error pushing metrics (attempt {attempt}, retrying in {delay:.1f}s): {e}")
+                    # A stop request cuts the backoff short, the final push follows anyway
+                    if self._stop_event.wait(delay):
+                        return False
+                    delay = min(delay * 2, self.max_backoff)
+        return False
+
+    def _run(self):
+        next_push = time.monotonic() + self.push_interval
+        while not self._stop_event.wait(max(0.0, next_push - time.monotonic())):
+            self.push()
+            next_push = time.monotonic() + self.push_interval
+
+    def start(self):
+        if self.push_interval <= 0 or not self.gateway or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop_event.clear()
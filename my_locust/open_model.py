@@ -0,0 +1,226 @@
+"""
+open_model.py
+Open-model (constant arrival rate) load for Locust.
+
+Each open-model user is a scheduler: it walks a precomputed schedule of
+intended start times and spawns one scenario iteration per slot, whether or
+not earlier iterations have finished. The lag between the intended and the
+actual start is passed to the request event (context["schedule_lag_ms"]),
+so request latencies can be recorded from the intended send time
+(coordinated-omission corrected) next to the raw ones.
+
+Iterations of one scheduler run concurrently, so they must not share the
+user's client: its cookie jar would mix the sessions of concurrent logins
+and logouts. With new_session=slot_client every running iteration gets a
+client of its own, created on demand and reused by later iterations once
+free (at most max_in_flight per user, keep-alive connections included).
+
+SchedulerCount keeps the total number of schedulers of a distributed run,
+which workers started on their own do not know (see its docstring).
+
+ScheduleStats counts scheduled and late iterations; a run where too many
+iterations start late is generator-bound, because the load generator itself
+could not keep up with the schedule (exported through SaturationMonitor as
+the "schedule" reason of locust_generator_bound).
+"""
+
+import time
+import random
+import gevent
+from array import array
+from gevent.pool import Group
+from gevent.lock import BoundedSemaphore
+from locust import FastHttpUser
+from locust.clients import HttpSession
+from locust.runners import MasterRunner, WorkerRunner
+from locust.contrib.fasthttp import FastHttpSession
+from prometheus_client.core import CounterMetricFamily, Metric
+from latency_histogram import LatencyHistogram
+
+SCHEDULE_BLOCK = 4096
+LAG_QUANTILES = (0.5, 0.99, 0.999)
+
+
+def arrival_offsets(rate, distribution="constant", seed=None):
+    """Intended start offsets (s) for the given rate, precomputed in blocks."""
+    if rate <= 0:
+        raise ValueError("Arrival rate must be positive")
+    rnd = random.Random(seed)
+    interval = 1.0 / rate
+    t = 0.0
+    while True:
+        block = array("d", bytes(8 * SCHEDULE_BLOCK))
+        for i in range(SCHEDULE_BLOCK):
+            t += rnd.expovariate(rate) if distribution == "poisson" else interval
+            block[i] = t
+        yield from block
+
+
+def slot_client(user):
+    """A client configured like user.client, with its own cookie jar and connections."""
+    if isinstance(user, FastHttpUser):
+        # One iteration at a time per slot, so one connection is enough
+        return FastHttpSession(
+            base_url=user.host,
+            request_event=user.environment.events.request,
+            network_timeout=user.network_timeout,
+            connection_timeout=user.connection_timeout,
+            max_redirects=user.max_redirects,
+            max_retries=user.max_retries,
+            insecure=user.insecure,
+            concurrency=1,
+            user=user,
+            ssl_context_factory=user.ssl_context_factory,
+            headers=user.default_headers,
+            proxy_host=user.proxy_host,
+            proxy_port=user.proxy_port,
+        )
+    client = HttpSession(base_url=user.host, request_event=user.environment.events.request, user=user,
+                         pool_manager=user.pool_manager)
+    client.trust_env = False
+    return client
+
+
+class ScheduleStats:
+    def __init__(self, instance, late_threshold_ms=10.0, max_late_ratio=0.01):
+        self.instance = instance
+        self.late_threshold_ms = late_threshold_ms
+        self.max_late_ratio = max_late_ratio
+        self.scheduled = 0
+        self.late = 0
+        self.lag = LatencyHistogram()
+        # Iterations currently running in this process (greenlet count)
+        self.in_flight = 0
+
+    def record(self, lag_ms):
+        self.scheduled += 1
+        if lag_ms > self.late_threshold_ms:
+            self.late += 1
+        self.lag.record(lag_ms * 1000)
+
+    @property
+    def generator_bound(self):
+        return self.scheduled > 0 and self.late > self.max_late_ratio * self.scheduled
+
+    def take_report(self):
+        report = {"scheduled": self.scheduled, "late": self.late, "lag": self.lag.to_dict()}
+        self.scheduled = 0
+        self.late = 0
+        self.lag = LatencyHistogram()
+        return report
+
+    def merge_report(self, report):
+        self.scheduled += report["scheduled"]
+        self.late += report["late"]
+        self.lag.merge(LatencyHistogram.from_dict(report["lag"]))
+
+    def collect(self):
+        labels = ["instance"]
+        scheduled = CounterMetricFamily("locust_open_model_scheduled", "Iterations scheduled by the open model", labels=labels)
+        scheduled.add_metric([self.instance], self.scheduled)
+        late = CounterMetricFamily("locust_open_model_late",
+                                   f"Iterations started more than {self.late_threshold_ms:g} ms after their intended time",
+                                   labels=labels)
+        late.add_metric([self.instance], self.late)
+        lag = Metric("locust_open_model_schedule_lag_seconds",
+                     "Delay between intended and actual iteration start", "summary")
+        for q in LAG_QUANTILES:
+            lag.add_sample(lag.name, {"instance": self.instance, "quantile": str(q)}, self.lag.percentile(q) / 1e6)
+        lag.add_sample(f"{lag.name}_count", {"instance": self.instance}, self.lag.total)
+        lag.add_sample(f"{lag.name}_sum", {"instance": self.instance}, self.lag.sum_us / 1e6)
+        yield scheduled
+        yield late
+        yield lag
+
+    def print_summary(self):
+        if not self.scheduled:
+            return
+        print(f"Open model: {self.scheduled} iterations scheduled, {self.late} late "
+              f"(> {self.late_threshold_ms:g} ms), lag p99 {self.lag.percentile(0.99) / 1000:.1f} ms, "
+              f"max {(self.lag.max_us or 0) / 1000:.1f} ms")
+        if self.generator_bound:
+            print("WARNING: load generator could not keep up with the arrival schedule; "
+                  "results are generator-bound.")
+
+
+class SchedulerCount:
+    """
+    Total number of open-model schedulers, which the per-user rate is divided by.
+
+    A worker started on its own (--worker) gets neither -u from the master
+    (Locust only forwards non-default options) nor the total user count: its
+    target_user_count is just its own share. The master therefore sends its
+    target_user_count at test start and to workers connecting later.
+    """
+
+    MESSAGE = "open_model_users"
+
+    def __init__(self):
+        self.total = None
+
+    def install(self, environment):
+        """At init: workers listen for the master's count, the master sends it to late workers."""
+        runner = environment.runner
+        if isinstance(runner, WorkerRunner):
+            runner.register_message(self.MESSAGE, self._on_message)
+        elif isinstance(runner, MasterRunner):
+            environment.events.worker_connect.add_listener(
+                lambda client_id, **kwargs: self.announce(environment, client_id))
+
+    def announce(self, environment, client_id=None):
+        """Master side (test start): send the total user count to the workers."""
+        runner = environment.runner
+        if isinstance(runner, MasterRunner) and runner.target_user_count:
+            runner.send_message(self.MESSAGE, runner.target_user_count, client_id)
+
+    def _on_message(self, environment, msg, **kwargs):
+        self.total = msg.data
+
+    def get(self, environment):
+        if self.total:
+            return self.total
+        return (getattr(environment.parsed_options, "num_users", None)
+                or environment.runner.target_user_count or 1)
+
+
+def run_schedule(user, iteration, rate, stats, max_in_flight=100, distribution="constant", new_session=None):
+    """
+    Drives iteration(user, lag_ms) at `rate` iterations/s until the user is
+    stopped. When max_in_flight iterations are running, the next start waits;
+    that delay shows up as schedule lag instead of being silently omitted.
+    With new_session, iterations are called as iteration(user, lag_ms, session)
+    with a session no other running iteration uses (new_session(user) creates one
+    when none is free).
+    """
+    group = Group()
+    slots = BoundedSemaphore(max_in_flight)
+    free_sessions = []
+
+    def run_slot(lag_ms):
+        stats.in_flight += 1
+        session = None
+        try:
+            if new_session is None:
+                iteration(user, lag_ms)
+            else:
+                session = free_sessions.pop() if free_sessions else new_session(user)
+                iteration(user, lag_ms, session)
+        finally:
+            if session is not None:
+                free_sessions.append(session)
+            stats.in_flight -= 1
+            slots.release()
+
+    start = time.monotonic()
+    try:
+        for offset in arrival_offsets(rate, distribution):
+            intended = start + offset
+            delay = intended - time.monotonic()
+            if delay > 0:
+                gevent.sleep(delay)
+            slots.acquire()
+            lag_ms = max(0.0, (time.monotonic() - intended) * 1000)
+            stats.record(lag_ms)
+            group.spawn(run_slot, lag_ms)
+    finally:
+        group.kill(block=False)
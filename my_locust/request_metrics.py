@@ -0,0 +1,163 @@
+"""
+request_metrics.py
+Buffered Prometheus updates for the events.request listener.
+
+The listener only appends a tuple to a local buffer; a background thread
+(a greenlet under Locust's monkey patching) flushes the buffer every
+flush_interval_ms. Label children are bound once per (method, name, code)
+and latencies go into per-name LatencyHistograms, so the registry locks are
+taken once per flush instead of on every request.
+
+Requests made by the open model carry their schedule lag; when a
+corrected_collector is given they are also recorded from the intended send
+time (response_time + lag) into it.
+
+Requests tagged with a session kind (e.g. "cold_login" or "warm", see
+session_pool.py) are also recorded, keyed by that kind, into
+session_collector.
+
+On Locust workers (report_mode=True) flushed data is kept as a delta and
+handed to the master via take_report()/merge_report() instead of being
+written into the worker's own registry.
+"""
+
+import threading
+from collections import deque, Counter as CountMap
+from latency_histogram import LatencyHistogram
+
+
+class RequestMetrics:
+    def __init__(self, success_counter, failure_counter, latency_collector,
+                 instance, flush_interval_ms=250, corrected_collector=None, session_collector=None):
+        self.success_counter = success_counter
+        self.failure_counter = failure_counter
+        self.latency_collector = latency_collector
+        self.corrected_collector = corrected_collector
+        self.session_collector = session_collector
+        self.instance = instance
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._pending = deque()
+        self._children = {}
+        self.report_mode = False
+        # Master/standalone: running totals, read by the capacity search shape
+        self.total_requests = 0
+        self.total_failures = 0
+        self._report_counts = CountMap()
+        self._report_histograms = {}
+        self._report_corrected = {}
+        self._report_sessions = {}
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record(self, method, name, code, response_time, success, lag=None, session=None):
+        # Hot path: a single append, everything else happens in flush()
+        self._pending.append((method, name, code, response_time, success, lag, session))
+
+    def _child(self, key):
+        child = self._children.get(key)
+        if child is None:
+            method, name, code, success = key
+            counter = self.success_counter if success else self.failure_counter
+            child = counter.labels(method=method, name=name, response_code=code, instance=self.instance)
+            self._children[key] = child
+        return child
+
+    def flush(self):
+        with self._flush_lock:
+            pending = self._pending
+            n = len(pending)
+            if not n:
+                return 0
+            counts = self._report_counts if self.report_mode else CountMap()
+            histogram = self._report_histogram if self.report_mode else self.latency_collector.histogram
+            corrected = self._report_corrected_histogram if self.report_mode else self._corrected_histogram
+            session_histogram = self._report_session_histogram if self.report_mode else self._session_histogram
+            popleft = pending.popleft
+            for _ in range(n):
+                method, name, code, response_time, success, lag, session = popleft()
+                counts[(method, name, code, success)] += 1
+                # response_time is in ms, histograms record us
+                histogram(name).record(response_time * 1000)
+                if lag is not None:
+                    corrected(name).record((response_time + lag) * 1000)
+                if session is not None and self.session_collector is not None:
+                    session_histogram(session).record(response_time * 1000)
+            if not self.report_mode:
+                self._add_counts(counts.items())
+            return n
+
+    def _add_counts(self, items):
+        for (method, name, code, success), count in items:
+            self._child((method, name, code, success)).inc(count)
+            self.total_requests += count
+            if not success:
+                self.total_failures += count
+
+    def _corrected_histogram(self, name):
+        return self.corrected_collector.histogram(name)
+
+    def _session_histogram(self, session):
+        return self.session_collector.histogram(session)
+
+    def _new_histogram(self, histograms, name):
+        collector = self.latency_collector
+        hist = histograms[name] = LatencyHistogram(collector.precision_bits, collector.max_value_us)
+        return hist
+
+    def _report_histogram(self, name):
+        hist = self._report_histograms.get(name)
+        return hist if hist is not None else self._new_histogram(self._report_histograms, name)
+
+    def _report_corrected_histogram(self, name):
+        hist = self._report_corrected.get(name)
+        return hist if hist is not None else self._new_histogram(self._report_corrected, name)
+
+    def _report_session_histogram(self, session):
+        hist = self._report_sessions.get(session)
+        return hist if hist is not None else self._new_histogram(self._report_sessions, session)
+
+    def take_report(self):
+        """Worker side: everything recorded since the previous report, as plain data."""
+        self.flush()
+        with self._flush_lock:
+            report = {
+                "counts": [[method, name, code, success, count]
+                           for (method, name, code, success), count in self._report_counts.items()],
+                "histograms": {name: hist.to_dict() for name, hist in self._report_histograms.items()},
+                "corrected": {name: hist.to_dict() for name, hist in self._report_corrected.items()},
+                "sessions": {kind: hist.to_dict() for kind, hist in self._report_sessions.items()},
+            }
+            self._report_counts = CountMap()
+            self._report_histograms = {}
+            self._report_corrected = {}
+            self._report_sessions = {}
+        return report
+
+    def merge_report(self, report):
+        """Master side: add a worker's report to the registry."""
+        with self._flush_lock:
+            self._add_counts(((method, name, code, success), count)
+                             for method, name, code, success, count in report["counts"])
+            self.latency_collector.merge_dict(report["histograms"])
+            if report.get("corrected") and self.corrected_collector is not None:
+                self.corrected_collector.merge_dict(report["corrected"])
+            if report.get("sessions") and self.session_collector is not None:
+                self.session_collector.merge_dict(report["sessions"])
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
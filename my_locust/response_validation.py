@@ -0,0 +1,196 @@
+"""
+response_validation.py
+Byte-level response validators for Locust tasks.
+
+A ResponseValidator is built once per request type: status codes go into a
+set, header patterns and body markers are compiled into regular expressions
+(all literal "any" markers into a single alternation), so a check never
+decodes the body to str. Checks run cheapest first (status, headers, body)
+and stop at the first failure.
+
+With stream=True the request must be made with stream=True as well; the
+body is then read in chunks and scanning stops as soon as the outcome is
+known. The rest of the body is drained unscanned so the keep-alive
+connection can be reused. Note that with stream=True Locust records the
+response time when the headers arrive: the body download (and its scan)
+is no longer part of response_time.
+
+With sample_rate=N only every N-th response gets the header/body checks
+(status is always checked). ValidationStats counts checked, skipped and
+failed responses per request name, so the failure ratio of the sampled
+responses is exported as an estimate for all of them.
+"""
+
+import re
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+try:
+    from locust.contrib.fasthttp import FastResponse
+except ImportError:
+    FastResponse = None
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Bytes kept between chunks when a body regex is used (longest match that can span chunks)
+REGEX_OVERLAP = 1024
+
+
+class ValidationStats:
+    def __init__(self, instance):
+        self.instance = instance
+        # name -> [checked, skipped, failed]
+        self.counts = {}
+
+    def record(self, name, checked, failed):
+        counts = self.counts.get(name)
+        if counts is None:
+            counts = self.counts[name] = [0, 0, 0]
+        if checked:
+            counts[0] += 1
+            if failed:
+                counts[2] += 1
+        else:
+            counts[1] += 1
+
+    def take_report(self):
+        report, self.counts = self.counts, {}
+        return report
+
+    def merge_report(self, report):
+        for name, (checked, skipped, failed) in report.items():
+            counts = self.counts.setdefault(name, [0, 0, 0])
+            counts[0] += checked
+            counts[1] += skipped
+            counts[2] += failed
+
+    def collect(self):
+        labels = ["name", "instance"]
+        checked = CounterMetricFamily("locust_validation_checked", "Responses whose body/headers were validated",
+                                      labels=labels)
+        skipped = CounterMetricFamily("locust_validation_skipped", "Responses not validated due to sampling",
+                                      labels=labels)
+        failed = CounterMetricFamily("locust_validation_failed", "Validated responses that failed a check",
+                                     labels=labels)
+        ratio = GaugeMetricFamily("locust_validation_failure_ratio",
+                                  "Failure ratio of validated responses (estimate for all responses)", labels=labels)
+        for name, (n_checked, n_skipped, n_failed) in sorted(self.counts.items()):
+            values = [name, self.instance]
+            checked.add_metric(values, n_checked)
+            skipped.add_metric(values, n_skipped)
+            failed.add_metric(values, n_failed)
+            ratio.add_metric(values, n_failed / n_checked if n_checked else 0.0)
+        yield checked
+        yield skipped
+        yield failed
+        yield ratio
+
+    def print_summary(self):
+        for name, (checked, skipped, failed) in sorted(self.counts.items()):
+            if skipped:
+                total = checked + skipped
+                ratio = failed / checked if checked else 0.0
+                print(f"Validation {name}: {checked}/{total} checked, {failed} failed "
+                      f"(estimated {ratio:.2%} of all {total})")
+
+
+def _literal_pattern(markers):
+    return re.compile(b"|".join(re.escape(m) for m in markers)) if markers else None
+
+
+class ResponseValidator:
+    def __init__(self, name, stats=None, status=(200,), headers=None, body_any=(), body_all=(),
+                 body_absent=(), body_regex=None, sample_rate=1, stream=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.name = name
+        self.stats = stats
+        self.status = frozenset(status)
+        self.headers = [(header, re.compile(pattern)) for header, pattern in (headers or {}).items()]
+        self.body_any = _literal_pattern(body_any)
+        self.body_all = tuple(body_all)
+        self.body_absent = _literal_pattern(body_absent)
+        self.body_regex = re.compile(body_regex) if body_regex is not None else None
+        self.sample_rate = max(1, int(sample_rate))
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.has_body_checks = bool(self.body_any or self.body_all or self.body_absent or self.body_regex)
+        longest = max((len(m) for m in tuple(body_any) + self.body_all + tuple(body_absent)), default=1)
+        self.overlap = max(longest - 1, REGEX_OVERLAP if self.body_regex else 0)
+        self._seen = 0
+
+    def check(self, response):
+        """None when the response passes, otherwise a failure message."""
+        if response.status_code not in self.status:
+            self._drain(response)
+            return f"status {response.status_code}"
+        self._seen += 1
+        if self._seen % self.sample_rate:
+            self._drain(response)
+            if self.stats is not None:
+                self.stats.record(self.name, checked=False, failed=False)
+            return None
+        error = self._check_headers(response)
+        if error is None and self.has_body_checks:
+            error = self._check_body(response)
+        else:
+            self._drain(response)
+        if self.stats is not None:
+            self.stats.record(self.name, checked=True, failed=error is not None)
+        return error
+
+    def _check_headers(self, response):
+        for header, pattern in self.headers:
+            value = response.headers.get(header)
+            if value is None or not pattern.search(value):
+                return f"header {header}: {value!r}"
+        return None
+
+    def _chunks(self, response):
+        if not self.stream:
+            yield response.content or b""
+            return
+        if FastResponse is not None and isinstance(response, FastResponse):
+            # FastHttpUser: its iter_content() decodes to str unless told otherwise
+            yield from response.iter_content(self.chunk_size, decode_content=False)
+            return
+        if hasattr(response, "iter_content"):
+            # HttpUser (requests)
+            yield from response.iter_content(self.chunk_size)
+            return
+        yield response.content or b""
+
+    def _drain(self, response):
+        if self.stream:
+            for _ in self._chunks(response):
+                pass
+
+    def _check_body(self, response):
+        found_any = self.body_any is None
+        missing_all = set(self.body_all)
+        regex_ok = self.body_regex is None
+        tail = b""
+        chunks = self._chunks(response)
+        for chunk in chunks:
+            window = tail + chunk if tail else chunk
+            if self.body_absent is not None:
+                match = self.body_absent.search(window)
+                if match:
+                    for _ in chunks:
+                        pass
+                    return f"unexpected body marker {match.group(0)!r}"
+            if not found_any and self.body_any.search(window):
+                found_any = True
+            if missing_all:
+                missing_all = {m for m in missing_all if m not in window}
+            if not regex_ok and self.body_regex.search(window):
+                regex_ok = True
+            if found_any and not missing_all and regex_ok and self.body_absent is None:
+                # Outcome known: drain the rest without scanning
+                for _ in chunks:
+                    pass
+                return None
+            tail = window[-self.overlap:] if self.overlap else b""
+        if not found_any:
+            return "no expected body marker"
+        if missing_all:
+            return f"missing body marker(s) {sorted(missing_all)!r}"
+        if not regex_ok:
+            return f"body does not match {self.body_regex.pattern!r}"
+        return None
@@ -0,0 +1,137 @@
+"""
+sample_log.py
+Compact binary per-request sample log.
+
+The recorder appends every request to per-column arrays (fixed-width values,
+no per-request objects) and writes them in bulk as one columnar block every
+block_size records:
+
+  file   := header block*
+  header := b"LSMPL1" + byte order (b"<" or b">") + b"\\0"
+  block  := b"BLK1" count:u32 names_len:u32 names_json pad8
+            ts_us:u64[count] latency_us:u32[count] bytes:u32[count]
+            name_id:u16[count] status:u16[count]
+
+names_json lists the request names first seen in that block; ids are
+assigned in order of appearance. status is the HTTP status code (0 = no
+response) with STATUS_ERROR_BIT set for failed requests.
+
+read_blocks() memory-maps the file and yields memoryview columns over the
+mapping, so nothing is copied when analysing large logs.
+"""
+
+import sys
+import mmap
+import json
+import struct
+from array import array
+
+FILE_MAGIC = b"LSMPL1" + (b"<" if sys.byteorder == "little" else b">") + b"\0"
+BLOCK_MAGIC = b"BLK1"
+BLOCK_HEADER = struct.Struct("<4sII")
+STATUS_ERROR_BIT = 0x8000
+U32_MAX = 0xFFFFFFFF
+# (name, array typecode) in on-disk order; 8-byte column first keeps everything aligned
+COLUMNS = (("ts_us", "Q"), ("latency_us", "I"), ("bytes", "I"), ("name_id", "H"), ("status", "H"))
+
+
+def _pad8(n):
+    return (8 - n % 8) % 8
+
+
+class SampleLogWriter:
+    def __init__(self, file_path, block_size=65536):
+        self.file_path = file_path
+        self.block_size = block_size
+        self._file = open(file_path, "wb")
+        self._file.write(FILE_MAGIC)
+        self._name_ids = {}
+        self._new_names = []
+        self._reset()
+
+    def _reset(self):
+        self._ts = array("Q")
+        self._latency = array("I")
+        self._bytes = array("I")
+        self._names = array("H")
+        self._status = array("H")
+
+    def record(self, name, status, response_time, response_length, start_time):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._name_ids)
+            self._new_names.append(name)
+        self._ts.append(int(start_time * 1000000))
+        self._latency.append(min(int(response_time * 1000), U32_MAX))
+        self._bytes.append(min(response_length or 0, U32_MAX))
+        self._names.append(name_id)
+        self._status.append(status)
+        if len(self._ts) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        count = len(self._ts)
+        if not count or self._file is None:
+            return
+        names = json.dumps(self._new_names).encode("utf-8") if self._new_names else b""
+        f = self._file
+        f.write(BLOCK_HEADER.pack(BLOCK_MAGIC, count, len(names)))
+        f.write(names + b"\0" * _pad8(BLOCK_HEADER.size + len(names)))
+        for column in (self._ts, self._latency, self._bytes, self._names, self._status):
+            column.tofile(f)
+        # The 2-byte columns may leave the next block header unaligned
+        f.write(b"\0" * _pad8(count * 20))
+        f.flush()
+        self._new_names = []
+        self._reset()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def read_blocks(file_path):
+    """
+    Yields (names, columns) per block; names is the cumulative id -> name list,
+    columns maps column name -> memoryview over the mapped file. The views
+    are only valid until the next iteration.
+    """
+    with open(file_path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{file_path}: not a sample log or written with a different byte order")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+    names = []
+    view = memoryview(mm)
+    try:
+        offset = len(FILE_MAGIC)
+        size = len(mm)
+        while offset + BLOCK_HEADER.size <= size:
+            magic, count, names_len = BLOCK_HEADER.unpack_from(mm, offset)
+            if magic != BLOCK_MAGIC:
+                raise ValueError(f"{file_path}: corrupt block at offset {offset}")
+            offset += BLOCK_HEADER.size
+            block_end = offset + names_len + _pad8(BLOCK_HEADER.size + names_len) + count * 20 + _pad8(count * 20)
+            if block_end > size:
+                break  # truncated last block (e.g. the run crashed mid-write)
+            if names_len:
+                names.extend(json.loads(bytes(view[offset:offset + names_len])))
+            offset += names_len + _pad8(BLOCK_HEADER.size + names_len)
+            columns = {}
+            for column, typecode in COLUMNS:
+                width = array(typecode).itemsize
+                columns[column] = view[offset:offset + count * width].cast(typecode)
+                offset += count * width
+            offset = block_end
+            try:
+                yield names, columns
+            finally:
+                for column in columns.values():
+                    column.release()
+    finally:
+        view.release()
+        mm.close()
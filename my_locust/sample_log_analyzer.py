@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+sample_log_analyzer.py
+Offline analysis of sample logs written with LOCUST_SAMPLE_LOG.
+
+Usage:
+  python sample_log_analyzer.py endpoints locust_samples.bin
+  python sample_log_analyzer.py windows locust_samples.bin --window 10
+  python sample_log_analyzer.py bursts locust_samples.bin --window 1 --min-error-rate 0.05
+
+Several files (one per worker) can be given at once. The files are memory
+mapped and streamed block by block; percentiles come from LatencyHistograms,
+so memory depends on the number of endpoints/windows, not on the number of
+samples.
+"""
+
+import argparse
+from latency_histogram import LatencyHistogram
+from sample_log import read_blocks, STATUS_ERROR_BIT
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Per-window histograms use a coarser layout (~6% error, ~4 KB each)
+WINDOW_PRECISION_BITS = 5
+WINDOW_MAX_VALUE_US = 2 ** 32
+
+
+class Stats:
+    __slots__ = ("hist", "errors", "bytes")
+
+    def __init__(self, precision_bits=7, max_value_us=2 ** 36):
+        self.hist = LatencyHistogram(precision_bits, max_value_us)
+        self.errors = 0
+        self.bytes = 0
+
+
+def scan_endpoints(paths):
+    stats = {}
+    for path in paths:
+        for names, columns in read_blocks(path):
+            per_id = [None] * len(names)
+            for i, name in enumerate(names):
+                per_id[i] = stats[name] if name in stats else stats.setdefault(name, Stats())
+            for name_id, latency, status, size in zip(columns["name_id"], columns["latency_us"],
+                                                      columns["status"], columns["bytes"]):
+                s = per_id[name_id]
+                s.hist.record(latency)
+                s.bytes += size
+                if status & STATUS_ERROR_BIT:
+                    s.errors += 1
+    return stats
+
+
+def scan_windows(paths, window_s):
+    window_us = int(window_s * 1000000)
+    windows = {}
+    for path in paths:
+        for names, columns in read_blocks(path):
+            for ts, latency, status in zip(columns["ts_us"], columns["latency_us"], columns["status"]):
+                key = ts // window_us
+                s = windows.get(key)
+                if s is None:
+                    s = windows[key] = Stats(WINDOW_PRECISION_BITS, WINDOW_MAX_VALUE_US)
+                s.hist.record(latency)
+                if status & STATUS_ERROR_BIT:
+                    s.errors += 1
+    return windows, min(windows, default=0)
+
+
+def print_endpoints(stats):
+    header = "".join(f"{'p' + str(int(q * 100)):>10}" for q in QUANTILES)
+    print(f"{'name':<30}{'count':>12}{'errors':>10}{'err %':>8}{header}{'max':>10}{'MB':>10}")
+    for name, s in sorted(stats.items()):
+        total = s.hist.total
+        row = "".join(f"{s.hist.percentile(q) / 1000:>10.1f}" for q in QUANTILES)
+        print(f"{name:<30}{total:>12}{s.errors:>10}{100.0 * s.errors / total if total else 0:>8.2f}"
+              f"{row}{(s.hist.max_us or 0) / 1000:>10.1f}{s.bytes / 1e6:>10.1f}")
+    print("(latencies in ms)")
+
+
+def print_windows(windows, first_key, window_s):
+    header = "".join(f"{'p' + str(int(q * 100)):>10}" for q in QUANTILES)
+    print(f"{'t [s]':>10}{'count':>10}{'req/s':>10}{'err %':>8}{header}")
+    for key in sorted(windows):
+        s = windows[key]
+        total = s.hist.total
+        row = "".join(f"{s.hist.percentile(q) / 1000:>10.1f}" for q in QUANTILES)
+        print(f"{(key - first_key) * window_s:>10.0f}{total:>10}{total / window_s:>10.1f}"
+              f"{100.0 * s.errors / total if total else 0:>8.2f}{row}")
+    print("(latencies in ms)")
+
+
+def print_bursts(windows, first_key, window_s, min_error_rate, min_errors):
+    bursts = []
+    current = None
+    for key in sorted(windows):
+        s = windows[key]
+        bad = s.errors >= min_errors and s.errors >= min_error_rate * s.hist.total
+        if bad and current is not None and key == current["end"] + 1:
+            current["end"] = key
+            current["errors"] += s.errors
+            current["requests"] += s.hist.total
+        elif bad:
+            current = {"start": key, "end": key, "errors": s.errors, "requests": s.hist.total}
+            bursts.append(current)
+        else:
+            current = None
+    if not bursts:
+        print("No error bursts found.")
+        return
+    print(f"{'from [s]':>10}{'to [s]':>10}{'errors':>10}{'requests':>10}{'err %':>8}")
+    for b in bursts:
+        print(f"{(b['start'] - first_key) * window_s:>10.0f}{(b['end'] + 1 - first_key) * window_s:>10.0f}"
+              f"{b['errors']:>10}{b['requests']:>10}{100.0 * b['errors'] / b['requests']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse binary Locust sample logs.")
+    parser.add_argument("command", choices=["endpoints", "windows", "bursts"])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--window", type=float, default=10.0, help="Window length in seconds.")
+    parser.add_argument("--min-error-rate", type=float, default=0.05,
+                        help="bursts: minimum error rate of a window.")
+    parser.add_argument("--min-errors", type=int, default=5,
+                        help="bursts: minimum number of errors in a window.")
+    args = parser.parse_args()
+
+    if args.command == "endpoints":
+        print_endpoints(scan_endpoints(args.files))
+        return
+    windows, first_key = scan_windows(args.files, args.window)
+    if args.command == "windows":
+        print_windows(windows, first_key, args.window)
+    else:
+        print_bursts(windows, first_key, args.window, args.min_error_rate, args.min_errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+sampling_profiler.py
+Low-overhead wall-clock sampling profiler for the Locust process.
+
+A native OS thread (not a greenlet, so it also fires while a greenlet hogs
+the CPU) wakes up every `interval` seconds and reads sys._current_frames().
+Under gevent all greenlets share the main thread, so its frame is the stack
+of whichever greenlet is running at that moment. When that stack ends in the
+hub's Hub.run (hub.py), the hub is waiting in the event loop and the sample
+counts as "idle"; only the stacks of running greenlets are attributed to
+categories. A main thread without any Python frame counts as idle as well.
+
+Every main-thread sample is attributed to a category: the innermost frame
+whose function was registered with label() decides (e.g. an on_request
+listener called from inside a task counts as "listener"), unlabelled
+stacks count as "other". Stacks of all threads are aggregated in the
+collapsed format ("root;...;leaf count"), which flamegraph.pl, speedscope
+and inferno read directly.
+
+The time spent sampling is measured, so the overhead is reported along with
+the profile (~20-50 us per sample, i.e. well below 1% at 100 Hz).
+
+Workers hand their category counts to the master via take_report()/
+merge_report(); the collapsed stacks stay in a file per process.
+"""
+
+import os
+import sys
+import time
+import _thread
+import inspect
+from collections import Counter
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+IDLE = "idle"
+OTHER = "other"
+MAX_DEPTH = 128
+
+
+def _idle_codes():
+    # The hub greenlet's only Python frame while libev waits for events
+    if "gevent" in sys.modules:
+        from gevent.hub import Hub
+        code = getattr(Hub.run, "__code__", None)
+        if code is not None:
+            return frozenset((code,))
+    return frozenset()
+
+
+def _original(module, name, default):
+    # Under gevent monkey patching a real OS thread needs the unpatched primitives
+    if "gevent" in sys.modules:
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return default
+
+
+class SamplingProfiler:
+    def __init__(self, instance, interval=0.01, max_depth=MAX_DEPTH):
+        self.instance = instance
+        self.interval = interval
+        self.max_depth = max_depth
+        self.labels = {}
+        self._start_thread = _original("_thread", "start_new_thread", _thread.start_new_thread)
+        self._allocate_lock = _original("_thread", "allocate_lock", _thread.allocate_lock)
+        self._sleep = _original("time", "sleep", time.sleep)
+        self._get_ident = _original("_thread", "get_ident", _thread.get_ident)
+        self.main_thread_id = self._get_ident()
+        self.idle_codes = _idle_codes()
+        self._names = {}
+        self._running = False
+        self._done = None
+        self._thread_id = None
+        self.reset()
+        # Worker id (or the local runner role) -> category counts and overhead
+        self.by_worker = {}
+
+    def reset(self):
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self.overhead = 0.0
+        self.started = None
+        self.elapsed = 0.0
+        self._reported = Counter()
+
+    def label(self, category, *functions):
+        """Attributes samples inside these functions (or methods) to `category`."""
+        for function in functions:
+            code = getattr(inspect.unwrap(getattr(function, "__func__", function)), "__code__", None)
+            if code is not None:
+                self.labels[code] = category
+
+    # --- sampling ---
+    def _frame_name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    def _walk(self, frame):
+        names = []
+        category = None
+        labels = self.labels
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(self._frame_name(code))
+            if category is None:
+                category = labels.get(code)
+            frame = frame.f_back
+        names.reverse()
+        return names, category
+
+    def sample(self):
+        self.samples += 1
+        own = self._thread_id
+        frames = sys._current_frames()
+        main = frames.pop(self.main_thread_id, None)
+        if main is None or main.f_code in self.idle_codes:
+            self.categories[IDLE] += 1
+            self.stacks[("MainThread", f"[{IDLE}]")] += 1
+        else:
+            names, category = self._walk(main)
+            self.categories[category or OTHER] += 1
+            self.stacks[("MainThread", *names)] += 1
+        for thread_id, frame in frames.items():
+            if thread_id == own:
+                continue
+            names, _ = self._walk(frame)
+            self.stacks[(f"thread-{thread_id}", *names)] += 1
+
+    def _run(self):
+        self._thread_id = self._get_ident()
+        next_sample = time.perf_counter()
+        try:
+            while self._running:
+                start = time.perf_counter()
+                self.sample()
+                end = time.perf_counter()
+                self.overhead += end - start
+                next_sample += self.interval
+                delay = next_sample - end
+                if delay > 0:
+                    self._sleep(delay)
+                else:
+                    # Fell behind (e.g. a long GIL hold): skip the missed samples
+                    next_sample = end
+        finally:
+            self._done.release()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        # The calling (main) thread is the one profiled; also correct after a fork
+        self.main_thread_id = self._get_ident()
+        self.started = time.perf_counter()
+        self._done = self._allocate_lock()
+        self._done.acquire()
+        self._start_thread(self._run, ())
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        # Native lock: blocks for at most one interval
+        self._done.acquire()
+        self.elapsed += time.perf_counter() - self.started
+
+    @property
+    def overhead_ratio(self):
+        return self.overhead / self.elapsed if self.elapsed else 0.0
+
+    # --- output ---
+    def write_collapsed(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def top_functions(self, n=10):
+        """Leaf frames (self time) of the main thread with the most samples."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            if stack[0] == "MainThread":
+                leaves[stack[-1]] += count
+        return leaves.most_common(n)
+
+    def print_summary(self):
+        total = sum(self.categories.values())
+        if not total:
+            return
+        shares = ", ".join(f"{c} {n / total:.1%}" for c, n in self.categories.most_common())
+        print(f"Profile: {self.samples} samples every {self.interval * 1000:.0f} ms, "
+              f"overhead {self.overhead_ratio:.2%}; main thread: {shares}")
+        for name, count in self.top_functions():
+            print(f"  {count / total:>6.1%}  {name}")
+
+    # --- distributed runs ---
+    def _running_elapsed(self):
+        return self.elapsed + (time.perf_counter() - self.started if self._running else 0.0)
+
+    def update_local(self, name):
+        self.by_worker[name] = {"categories": Counter(self.categories), "overhead": self.overhead,
+                                "elapsed": self._running_elapsed()}
+
+    def take_report(self):
+        categories = {c: n - self._reported[c] for c, n in self.categories.items() if n != self._reported[c]}
+        self._reported = Counter(self.categories)
+        return {"categories": categories, "overhead": self.overhead, "elapsed": self._running_elapsed()}
+
+    def merge_report(self, report, worker):
+        entry = self.by_worker.setdefault(worker, {"categories": Counter(), "overhead": 0.0, "elapsed": 0.0})
+        entry["categories"].update(report["categories"])
+        # Totals since the worker's profiler started, not deltas
+        entry["overhead"] = report["overhead"]
+        entry["elapsed"] = report["elapsed"]
+
+    def collect(self):
+        labels = ["instance", "worker"]
+        samples = CounterMetricFamily("locust_profile_samples", "Profiler samples of the main thread by category",
+                                      labels=labels + ["category"])
+        overhead = GaugeMetricFamily("locust_profile_overhead_ratio", "Share of wall time spent sampling",
+                                     labels=labels)
+        for worker, entry in sorted(self.by_worker.items()):
+            for category, count in sorted(entry["categories"].items()):
+                samples.add_metric([self.instance, worker, category], count)
+            overhead.add_metric([self.instance, worker],
+                                entry["overhead"] / entry["elapsed"] if entry["elapsed"] else 0.0)
+        yield samples
+        yield overhead
@@ -0,0 +1,253 @@
+"""
+saturation_monitor.py
+Load-generator self-saturation monitoring.
+
+Sampled every `interval` seconds (100 ms by default) from the monitor
+thread, which is a greenlet under Locust's monkey patching:
+  - event-loop lag: how late the monitor wakes up from its sleep; a long
+    lag means something blocked the gevent loop (CPU-bound code, blocking I/O)
+  - greenlet count (from the greenlet_count callable)
+  - open file descriptors
+
+Once per second (slow_every samples), as these are more expensive:
+  - process CPU (own psutil.Process, so it does not disturb other cpu_percent users)
+  - per-core CPU of the host
+  - open sockets
+  - CPU/RSS of child processes (include_children=True, e.g. browsers)
+
+Every sample is checked against the thresholds; a reason (loop_lag, cpu,
+core, fds) trips when it is breached in more than max_breach_ratio of its
+samples. Extra checks (e.g. the open-model schedule lag) can be passed in as
+bound_checks. The run is exported as generator-bound when any reason trips.
+
+Workers hand their window to the master via take_report()/merge_report(),
+as RequestMetrics does.
+"""
+
+import os
+import time
+import psutil
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from latency_histogram import LatencyHistogram
+
+LAG_QUANTILES = (0.5, 0.99, 0.999)
+REASONS = ("loop_lag", "cpu", "core", "fds")
+
+
+def fd_limit():
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return soft if soft != resource.RLIM_INFINITY else None
+
+
+class SaturationMonitor:
+    def __init__(self, instance, interval=0.1, slow_every=10, max_loop_lag_ms=50.0, max_cpu_percent=90.0,
+                 max_core_percent=95.0, max_fds=None, max_breach_ratio=0.01, greenlet_count=None,
+                 include_children=False, bound_checks=None):
+        self.instance = instance
+        self.interval = interval
+        self.slow_every = slow_every
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.max_cpu_percent = max_cpu_percent
+        self.max_core_percent = max_core_percent
+        limit = fd_limit()
+        self.max_fds = max_fds or (int(limit * 0.9) if limit else None)
+        self.max_breach_ratio = max_breach_ratio
+        self.greenlet_count = greenlet_count
+        self.include_children = include_children
+        self.bound_checks = bound_checks or {}
+        self.process = psutil.Process(os.getpid())
+        self._children = {}
+        self._tick = 0
+        self._expected_wakeup = None
+        self.reset()
+        # Worker id (or the local runner role) -> gauges of its latest window
+        self.gauges = {}
+
+    def reset(self):
+        self.samples = {"fast": 0, "slow": 0}
+        self.breaches = dict.fromkeys(REASONS, 0)
+        self.lag = LatencyHistogram()
+        self.window = self._new_window()
+
+    @staticmethod
+    def _new_window():
+        return {"greenlets": 0, "fds": 0, "sockets": 0, "cpu_percent": 0.0,
+                "children_cpu_percent": 0.0, "children_rss": 0, "cores": []}
+
+    # --- sampling ---
+    def sleep(self, stop_event):
+        """Waits one interval; True when stop_event was set."""
+        self._expected_wakeup = time.monotonic() + self.interval
+        return stop_event.wait(self.interval)
+
+    def sample(self):
+        now = time.monotonic()
+        window = self.window
+        self.samples["fast"] += 1
+        if self._expected_wakeup is not None:
+            lag_ms = max(0.0, (now - self._expected_wakeup) * 1000)
+            self.lag.record(lag_ms * 1000)
+            if lag_ms > self.max_loop_lag_ms:
+                self.breaches["loop_lag"] += 1
+        if self.greenlet_count is not None:
+            window["greenlets"] = max(window["greenlets"], self.greenlet_count())
+        fds = self._num_fds()
+        window["fds"] = max(window["fds"], fds)
+        if self.max_fds and fds > self.max_fds:
+            self.breaches["fds"] += 1
+        self._tick += 1
+        if self._tick % self.slow_every == 1 or self.slow_every == 1:
+            self._sample_slow()
+
+    def _num_fds(self):
+        try:
+            return self.process.num_fds() if hasattr(self.process, "num_fds") else self.process.num_handles()
+        except psutil.Error:
+            return 0
+
+    def _sample_slow(self):
+        window = self.window
+        self.samples["slow"] += 1
+        cpu = self.process.cpu_percent(interval=None)
+        window["cpu_percent"] = max(window["cpu_percent"], cpu)
+        if cpu > self.max_cpu_percent:
+            self.breaches["cpu"] += 1
+        cores = psutil.cpu_percent(percpu=True)
+        window["cores"] = [max(a, b) for a, b in zip(window["cores"], cores)] if window["cores"] else cores
+        if cores and max(cores) > self.max_core_percent:
+            self.breaches["core"] += 1
+        try:
+            connections = getattr(self.process, "net_connections", None) or self.process.connections
+            window["sockets"] = max(window["sockets"], len(connections(kind="inet")))
+        except psutil.Error:
+            pass
+        if self.include_children:
+            children_cpu, children_rss = self._sample_children()
+            window["children_cpu_percent"] = max(window["children_cpu_percent"], children_cpu)
+            window["children_rss"] = max(window["children_rss"], children_rss)
+
+    def _sample_children(self):
+        cpu = 0.0
+        rss = 0
+        alive = {}
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        for child in children:
+            # Keep the Process objects: cpu_percent() measures since the previous call on the same object
+            child = self._children.get(child.pid, child)
+            try:
+                cpu += child.cpu_percent(interval=None)
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+            alive[child.pid] = child
+        self._children = alive
+        return cpu, rss
+
+    # --- verdict ---
+    def tripped(self):
+        """Reasons for which the generator is considered saturated."""
+        reasons = []
+        for reason in REASONS:
+            samples = self.samples["fast" if reason in ("loop_lag", "fds") else "slow"]
+            if samples and self.breaches[reason] > self.max_breach_ratio * samples:
+                reasons.append(reason)
+        reasons.extend(name for name, check in self.bound_checks.items() if check())
+        return reasons
+
+    @property
+    def generator_bound(self):
+        return bool(self.tripped())
+
+    # --- distributed runs ---
+    def take_window(self):
+        """Gauges of the current window; starts a new one."""
+        window, self.window = self.window, self._new_window()
+        return window
+
+    def update_local(self, name):
+        self.gauges[name] = self.take_window()
+
+    def take_report(self):
+        report = {"samples": self.samples, "breaches": self.breaches, "lag": self.lag.to_dict(),
+                  "gauges": self.take_window()}
+        self.samples = {"fast": 0, "slow": 0}
+        self.breaches = dict.fromkeys(REASONS, 0)
+        self.lag = LatencyHistogram()
+        return report
+
+    def merge_report(self, report, worker):
+        for key, count in report["samples"].items():
+            self.samples[key] += count
+        for reason, count in report["breaches"].items():
+            self.breaches[reason] = self.breaches.get(reason, 0) + count
+        self.lag.merge(LatencyHistogram.from_dict(report["lag"]))
+        self.gauges[worker] = report["gauges"]
+
+    # --- export ---
+    def collect(self):
+        labels = ["instance"]
+        worker_labels = ["instance", "worker"]
+        lag = Metric("locust_event_loop_lag_seconds", "How late the monitor woke up (gevent loop blocking)", "summary")
+        for q in LAG_QUANTILES:
+            lag.add_sample(lag.name, {"instance": self.instance, "quantile": str(q)}, self.lag.percentile(q) / 1e6)
+        lag.add_sample(f"{lag.name}_count", {"instance": self.instance}, self.lag.total)
+        lag.add_sample(f"{lag.name}_sum", {"instance": self.instance}, self.lag.sum_us / 1e6)
+        breaches = CounterMetricFamily("locust_saturation_breaches", "Monitor samples above a saturation threshold",
+                                       labels=labels + ["reason"])
+        for reason in REASONS:
+            breaches.add_metric([self.instance, reason], self.breaches.get(reason, 0))
+        greenlets = GaugeMetricFamily("locust_greenlets", "Peak greenlet count in the last window", labels=worker_labels)
+        fds = GaugeMetricFamily("locust_open_fds", "Peak open file descriptors in the last window", labels=worker_labels)
+        sockets = GaugeMetricFamily("locust_open_sockets", "Peak open inet sockets in the last window",
+                                    labels=worker_labels)
+        cores = GaugeMetricFamily("locust_cpu_core_usage_percent", "Peak per-core host CPU in the last window",
+                                  labels=worker_labels + ["core"])
+        children_cpu = GaugeMetricFamily("locust_children_cpu_usage_percent", "CPU of child processes",
+                                         labels=worker_labels)
+        children_rss = GaugeMetricFamily("locust_children_memory_usage_bytes", "RSS of child processes",
+                                         labels=worker_labels)
+        for worker, gauges in sorted(self.gauges.items()):
+            values = [self.instance, worker]
+            greenlets.add_metric(values, gauges["greenlets"])
+            fds.add_metric(values, gauges["fds"])
+            sockets.add_metric(values, gauges["sockets"])
+            for core, percent in enumerate(gauges["cores"]):
+                cores.add_metric(values + [str(core)], percent)
+            if self.include_children:
+                children_cpu.add_metric(values, gauges["children_cpu_percent"])
+                children_rss.add_metric(values, gauges["children_rss"])
+        tripped = self.tripped()
+        bound = GaugeMetricFamily("locust_generator_bound",
+                                  "1 if the load generator itself was saturated; results are not trustworthy",
+                                  labels=labels)
+        bound.add_metric([self.instance], 1 if tripped else 0)
+        bound_reason = GaugeMetricFamily("locust_generator_bound_reason", "Saturation reasons that tripped",
+                                         labels=labels + ["reason"])
+        for reason in list(REASONS) + list(self.bound_checks):
+            bound_reason.add_metric([self.instance, reason], 1 if reason in tripped else 0)
+        yield lag
+        yield breaches
+        yield greenlets
+        yield fds
+        yield sockets
+        yield cores
+        if self.include_children:
+            yield children_cpu
+            yield children_rss
+        yield bound
+        yield bound_reason
+
+    def print_summary(self):
+        tripped = self.tripped()
+        print(f"Generator: loop lag p99 {self.lag.percentile(0.99) / 1000:.1f} ms, "
+              f"max {(self.lag.max_us or 0) / 1000:.1f} ms, "
+              f"breaches {', '.join(f'{r}={self.breaches.get(r, 0)}' for r in REASONS)}")
+        if tripped:
+            print(f"WARNING: load generator saturated ({', '.join(tripped)}); results are generator-bound.")
@@ -0,0 +1,75 @@
+"""
+session_pool.py
+Pre-authenticated sessions reused by "warm" Locust users.
+
+warm_up() logs `size` sessions in before the ramp: it is called from the
+test_start listener, which Locust runs before spawning users. The logins run
+concurrently on a gevent pool with plain requests sessions, outside Locust's
+request events, so the warm-up is not part of the measured traffic.
+
+assign() decides per user whether it is warm: warm_share of the users, spread
+evenly in spawn order. A warm user gets the cookies of a pooled session
+(round-robin, so several users can share one session) copied into its
+client's cookie jar and then skips the login; cold users log in themselves.
+"""
+
+import copy
+import requests
+from gevent.pool import Pool
+
+
+class SessionPool:
+    def __init__(self, login, size=100, warm_share=0.0, concurrency=20):
+        # login(session, base_url) -> True when the requests.Session is authenticated
+        self.login = login
+        self.size = size
+        self.warm_share = min(max(warm_share, 0.0), 1.0)
+        self.concurrency = concurrency
+        self.sessions = []
+        self.failed = 0
+        self._users = 0
+        self._next = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self.warm_share > 0
+
+    def warm_up(self, base_url):
+        """Logs in `size` sessions; returns how many succeeded."""
+        self.sessions = []
+        self.failed = 0
+        self._users = 0
+        self._next = 0
+
+        def login_one(_):
+            session = requests.Session()
+            try:
+                ok = self.login(session, base_url)
+            except requests.RequestException:
+                ok = False
+            if ok:
+                self.sessions.append(list(session.cookies))
+            else:
+                self.failed += 1
+            session.close()
+
+        Pool(self.concurrency).map(login_one, range(self.size))
+        return len(self.sessions)
+
+    def assign(self, client):
+        """True when the user got a pooled session (and should not log in)."""
+        n = self._users
+        self._users += 1
+        if not self.sessions or int((n + 1) * self.warm_share) == int(n * self.warm_share):
+            return False
+        cookies = self.sessions[self._next % len(self.sessions)]
+        self._next += 1
+        # FastHttpUser keeps its cookies in client.cookiejar, HttpUser (requests) in client.cookies
+        jar = client.cookiejar if hasattr(client, "cookiejar") else client.cookies
+        for cookie in cookies:
+            jar.set_cookie(copy.copy(cookie))
+        return True
+
+    def print_summary(self):
+        print(f"Session pool: {len(self.sessions)}/{self.size} sessions warmed up ({self.failed} failed), "
+              f"{self._next}/{self._users} users warm")
@@ -0,0 +1,76 @@
+import pytest
+
+from capacity_search import CapacitySearch, StepResult
+
+
+def make_search(**kwargs):
+    options = dict(start_users=10, max_users=1000, factor=2.0, spawn_rate=1000.0, step_seconds=10.0,
+                   settle_seconds=2.0, slo_p95_ms=500.0, max_error_rate=0.01, min_gain=0.05, bisect_steps=3)
+    options.update(kwargs)
+    return CapacitySearch(request_metrics=None, latency_collector=None, instance="test", **options)
+
+
+def run(search, rps, p95=lambda users: 100.0):
+    """Drives tick() with every step's users spawned at once; returns the measured user counts."""
+    search._take_snapshot = lambda: "snapshot"
+    search._measure = lambda: StepResult(search.users, rps(search.users), 1000, 0.0, 1.0, p95(search.users), 1.0)
+    visited = []
+    run_time = 0.0
+    while True:
+        users = search.users
+        if search.tick(run_time, user_count=users) is None:
+            return visited
+        if not visited or search._step_start == run_time:
+            visited.append(users)
+        run_time += 1.0
+
+
+def test_ramp_stops_at_the_last_good_step_when_throughput_is_flat():
+    search = make_search()
+    visited = run(search, rps=lambda users: min(users, 40) * 10.0)
+    assert visited == [10, 20, 40, 80]
+    assert search.phase == "ramp"
+    assert search.best.users == 40
+
+
+def test_slo_breach_is_bisected():
+    search = make_search()
+    visited = run(search, rps=lambda users: users * 10.0, p95=lambda users: 100.0 if users <= 50 else 2000.0)
+    assert visited == [10, 20, 40, 80, 60, 50, 55]
+    assert search.best.users == 50
+
+
+def test_first_step_past_the_knee_ends_the_search():
+    search = make_search()
+    assert run(search, rps=lambda users: 100.0, p95=lambda users: 2000.0) == [10]
+    assert search.best is None
+
+
+def test_ramp_is_capped_at_max_users():
+    search = make_search(max_users=30)
+    assert run(search, rps=lambda users: users * 10.0) == [10, 20, 30]
+    assert search.best.users == 30
+
+
+def test_step_starts_after_the_users_are_spawned():
+    search = make_search(start_users=100, spawn_rate=1.0)
+    search._take_snapshot = lambda: "snapshot"
+    # 100 users must spawn within a quarter of the 10 s step
+    users, rate = search.tick(0.0, user_count=0)
+    assert (users, rate) == (100, pytest.approx(40.0))
+    assert search.tick(5.0, user_count=60) == (100, pytest.approx(40.0))
+    assert search._step_start is None
+    search.tick(6.0, user_count=100)
+    assert search._step_start == 6.0
+
+
+def test_step_starts_anyway_when_the_spawn_stalls():
+    search = make_search()
+    search.tick(0.0, user_count=0)
+    search.tick(10.0, user_count=5)
+    assert search._step_start == 10.0
+
+
+def test_settle_must_be_shorter_than_the_step():
+    with pytest.raises(ValueError):
+        make_search(settle_seconds=10.0)
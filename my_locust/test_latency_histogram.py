@@ -0,0 +1,88 @@
+import math
+import random
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from latency_histogram import LatencyHistogram, LatencyHistogramCollector, export_bounds_seconds
+
+
+def relative_error(precision_bits):
+    return 2.0 ** -(precision_bits - 1)
+
+
+@pytest.mark.parametrize("precision_bits", [3, 7])
+def test_every_value_falls_within_its_bucket_bounds(precision_bits):
+    hist = LatencyHistogram(precision_bits, max_value_us=2 ** 20)
+    exact = 1 << precision_bits
+    for value in list(range(0, 4 * exact)) + [1000, 12345, 99999, 2 ** 20]:
+        index = hist._index(value)
+        upper = hist._highest_equivalent(index)
+        assert value <= upper
+        if value < exact:
+            assert upper == value
+        else:
+            assert upper - value <= value * relative_error(precision_bits)
+        # The bucket below ends before the value
+        assert index == 0 or hist._highest_equivalent(index - 1) < value
+
+
+def test_percentiles_stay_within_the_relative_error():
+    rng = random.Random(7)
+    values = sorted(int(rng.lognormvariate(10, 1)) for _ in range(20000))
+    hist = LatencyHistogram()
+    for value in values:
+        hist.record(value)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        expected = values[math.ceil(q * len(values)) - 1]
+        assert abs(hist.percentile(q) - expected) <= expected * relative_error(hist.precision_bits)
+    assert hist.percentile(0) == pytest.approx(values[0], rel=relative_error(hist.precision_bits))
+    assert hist.percentile(1) == values[-1]
+    assert LatencyHistogram().percentile(0.99) == 0
+
+
+def test_values_outside_the_range_are_clamped():
+    hist = LatencyHistogram(max_value_us=10000)
+    hist.record(-5)
+    hist.record(10 ** 9)
+    assert hist.total == 2
+    assert hist.counts[0] == 1 and hist.counts[-1] == 1
+    # Percentiles report the last bucket's bound; the exact max is kept separately
+    assert 10000 <= hist.percentile(1) <= 10000 * (1 + relative_error(hist.precision_bits))
+    assert hist.max_us == 10 ** 9
+
+
+def test_merge_subtract_and_dict_round_trip():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in (100, 200, 300):
+        first.record(value)
+    second.record(5000, count=3)
+
+    merged = first.copy().merge(second)
+    assert (merged.total, merged.sum_us, merged.min_us, merged.max_us) == (6, 15600, 100, 5000)
+    assert LatencyHistogram.from_dict(merged.to_dict()).to_dict() == merged.to_dict()
+
+    window = merged.copy().subtract(first)
+    assert (window.total, window.sum_us) == (3, 15000)
+    assert window.percentile(0.5) == pytest.approx(5000, rel=relative_error(window.precision_bits))
+
+    with pytest.raises(ValueError):
+        first.merge(LatencyHistogram(precision_bits=5))
+
+
+def test_collector_exports_cumulative_buckets_and_quantiles():
+    collector = LatencyHistogramCollector("duration_seconds", "Durations", "test")
+    for ms in (1, 2, 5, 50, 500):
+        collector.histogram("Login").record(ms * 1000)
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    labels = {"name": "Login", "instance": "test"}
+    bounds = export_bounds_seconds()
+    assert bounds == sorted(bounds) and bounds[0] <= 0.001 and bounds[-1] >= 60
+    assert registry.get_sample_value("duration_seconds_bucket", dict(labels, le="+Inf")) == 5
+    assert registry.get_sample_value("duration_seconds_count", labels) == 5
+    assert registry.get_sample_value("duration_seconds_sum", labels) == pytest.approx(0.558)
+    below_10ms = max(b for b in bounds if b <= 0.01)
+    assert registry.get_sample_value("duration_seconds_bucket", dict(labels, le=repr(below_10ms))) == 3
+    assert registry.get_sample_value("duration_seconds_quantiles", dict(labels, quantile="0.5")) == pytest.approx(0.005, rel=0.02)
@@ -0,0 +1,129 @@
+import socket
+import itertools
+import statistics
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+import gevent
+import pytest
+from gevent.pywsgi import WSGIServer
+from locust import User, HttpUser, FastHttpUser, constant, task
+from locust.env import Environment
+
+from open_model import ScheduleStats, SchedulerCount, arrival_offsets, run_schedule, slot_client
+
+
+def app(environ, start_response):
+    # /login?id=N sets the session cookie, /whoami echoes it back
+    if environ["PATH_INFO"] == "/login":
+        session = parse_qs(environ["QUERY_STRING"])["id"][0]
+        start_response("200 OK", [("Set-Cookie", f"session={session}; Path=/"), ("Content-Length", "0")])
+        return [b""]
+    cookie = SimpleCookie(environ.get("HTTP_COOKIE", ""))
+    body = cookie["session"].value.encode() if "session" in cookie else b""
+    start_response("200 OK", [("Content-Length", str(len(body)))])
+    return [body]
+
+
+@pytest.fixture(scope="module")
+def host():
+    server = WSGIServer(("127.0.0.1", 0), app, log=None)
+    server.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.stop()
+
+
+def run_for(seconds, *args, **kwargs):
+    scheduler = gevent.spawn(run_schedule, *args, **kwargs)
+    gevent.sleep(seconds)
+    scheduler.kill()
+
+
+def test_constant_offsets():
+    assert list(itertools.islice(arrival_offsets(10), 3)) == pytest.approx([0.1, 0.2, 0.3])
+
+
+def test_poisson_offsets_keep_the_mean_rate():
+    offsets = list(itertools.islice(arrival_offsets(50, "poisson", seed=1), 10000))
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert statistics.fmean(gaps) == pytest.approx(1 / 50, rel=0.05)
+
+
+def test_arrival_count_follows_the_rate():
+    stats = ScheduleStats("test")
+    run_for(0.5, None, lambda user, lag_ms: None, 200, stats)
+    # 100 intended starts in 0.5 s; the first one is due after one interval
+    assert 90 <= stats.scheduled <= 100
+    assert stats.in_flight == 0
+
+
+def test_max_in_flight_delays_further_starts():
+    stats = ScheduleStats("test")
+    run_for(0.3, None, lambda user, lag_ms: gevent.sleep(10), 100, stats, max_in_flight=5)
+    assert stats.scheduled == 5
+
+
+@pytest.mark.parametrize("user_base", [HttpUser, FastHttpUser], ids=["http", "fast"])
+def test_concurrent_iterations_keep_their_own_cookies(host, user_base):
+    user = type(user_base.__name__, (user_base,), {"host": host, "abstract": True})(Environment())
+    ids = itertools.count()
+    mismatches = []
+    sessions = set()
+
+    def iteration(user, lag_ms, client):
+        sessions.add(id(client))
+        session = str(next(ids))
+        client.get(f"/login?id={session}")
+        gevent.sleep(0.02)
+        seen = client.get("/whoami").text
+        if seen != session:
+            mismatches.append((session, seen))
+
+    stats = ScheduleStats("test")
+    run_for(0.3, user, iteration, 200, stats, max_in_flight=10, new_session=slot_client)
+    assert stats.scheduled > 20
+    assert mismatches == []
+    # Clients are reused once free: never more than the in-flight limit
+    assert 1 < len(sessions) <= 10
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_separate_workers_divide_the_rate_by_the_master_user_count():
+    counts = {}
+    seen = []
+
+    class Scheduler(User):
+        wait_time = constant(60)
+
+        @task
+        def schedule(self):
+            seen.append(counts[self.environment].get(self.environment))
+
+    port = free_port()
+    master_env = Environment(user_classes=[Scheduler])
+    master = master_env.create_master_runner("127.0.0.1", port)
+    master_env.events.test_start.add_listener(lambda environment, **kwargs: counts[master_env].announce(environment))
+    # Workers started on their own: no parsed options, only their share of the users
+    worker_envs = [Environment(user_classes=[Scheduler]) for _ in range(2)]
+    workers = [env.create_worker_runner("127.0.0.1", port) for env in worker_envs]
+    for env in [master_env] + worker_envs:
+        counts[env] = SchedulerCount()
+        counts[env].install(env)
+    try:
+        with gevent.Timeout(10):
+            while master.worker_count < 2:
+                gevent.sleep(0.05)
+            master.start(10, spawn_rate=100)
+            while len(seen) < 10:
+                gevent.sleep(0.05)
+        assert [worker.target_user_count for worker in workers] == [5, 5]
+        assert seen == [10] * 10
+    finally:
+        master.quit()
+        for worker in workers:
+            worker.quit()
@@ -0,0 +1,74 @@
+import json
+
+from prometheus_client import CollectorRegistry, Counter
+
+from latency_histogram import LatencyHistogramCollector
+from request_metrics import RequestMetrics
+
+LABELS = ["method", "name", "response_code", "instance"]
+
+
+def make_metrics(instance):
+    registry = CollectorRegistry()
+    metrics = RequestMetrics(
+        Counter("requests_success", "Successful requests", LABELS, registry=registry),
+        Counter("requests_failure", "Failed requests", LABELS, registry=registry),
+        LatencyHistogramCollector("duration_seconds", "Durations", instance),
+        instance=instance,
+        corrected_collector=LatencyHistogramCollector("corrected_seconds", "Corrected durations", instance),
+        session_collector=LatencyHistogramCollector("session_seconds", "Session durations", instance),
+    )
+    return metrics, registry
+
+
+def sample(registry, metric, **labels):
+    return registry.get_sample_value(metric, labels) or 0.0
+
+
+def record_login_traffic(metrics):
+    metrics.record("GET", "Login Page", 200, 10.0, True)
+    metrics.record("GET", "Login Page", 200, 30.0, True, lag=5.0)
+    metrics.record("POST", "Login", 500, 100.0, False, session="cold_login")
+
+
+def test_flush_updates_the_registry_and_the_totals():
+    metrics, registry = make_metrics("standalone")
+    record_login_traffic(metrics)
+    assert metrics.flush() == 3
+    assert metrics.flush() == 0
+
+    assert sample(registry, "requests_success_total", method="GET", name="Login Page",
+                  response_code="200", instance="standalone") == 2
+    assert sample(registry, "requests_failure_total", method="POST", name="Login",
+                  response_code="500", instance="standalone") == 1
+    assert (metrics.total_requests, metrics.total_failures) == (3, 1)
+
+    page = metrics.latency_collector.histograms["Login Page"]
+    assert (page.total, page.sum_us) == (2, 40000)
+    corrected = metrics.corrected_collector.histograms["Login Page"]
+    assert (corrected.total, corrected.sum_us) == (1, 35000)
+    assert metrics.session_collector.histograms["cold_login"].total == 1
+
+
+def test_worker_report_is_merged_on_the_master():
+    worker, worker_registry = make_metrics("worker")
+    worker.report_mode = True
+    record_login_traffic(worker)
+    # Workers send reports as plain messages
+    report = json.loads(json.dumps(worker.take_report()))
+
+    # Report mode keeps the data out of the worker's own registry
+    assert sample(worker_registry, "requests_success_total", method="GET", name="Login Page",
+                  response_code="200", instance="worker") == 0
+    assert worker.take_report() == {"counts": [], "histograms": {}, "corrected": {}, "sessions": {}}
+
+    master, master_registry = make_metrics("master")
+    master.merge_report(report)
+    master.merge_report(report)
+    assert sample(master_registry, "requests_success_total", method="GET", name="Login Page",
+                  response_code="200", instance="master") == 4
+    assert (master.total_requests, master.total_failures) == (6, 2)
+    assert master.latency_collector.histograms["Login Page"].total == 4
+    assert master.latency_collector.histograms["Login"].max_us == 100000
+    assert master.corrected_collector.histograms["Login Page"].sum_us == 70000
+    assert master.session_collector.histograms["cold_login"].total == 2
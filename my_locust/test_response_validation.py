@@ -0,0 +1,54 @@
+import pytest
+
+from locust import HttpUser, FastHttpUser
+from locust.env import Environment
+from gevent.pywsgi import WSGIServer
+
+from response_validation import ResponseValidator, ValidationStats
+
+PAGE = b"<html><body>" + b"x" * 200_000 + b"<h1>Logged In Successfully</h1></body></html>"
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/html; charset=UTF-8"), ("Content-Length", str(len(PAGE)))])
+    return [PAGE]
+
+
+@pytest.fixture(scope="module")
+def host():
+    server = WSGIServer(("127.0.0.1", 0), app, log=None)
+    server.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.stop()
+
+
+@pytest.fixture(params=[HttpUser, FastHttpUser], ids=["http", "fast"])
+def client(request, host):
+    user_class = type(request.param.__name__, (request.param,), {"host": host, "abstract": True})
+    return user_class(Environment()).client
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_body_markers(client, stream):
+    stats = ValidationStats("test")
+    passing = ResponseValidator("page", stats=stats, headers={"Content-Type": "text/html"},
+                                body_any=(b"Logged In Successfully",), stream=stream, chunk_size=4096)
+    failing = ResponseValidator("page", stats=stats, body_absent=(b"Logged In",), stream=stream, chunk_size=4096)
+    with client.get("/", stream=stream, catch_response=True) as response:
+        assert passing.check(response) is None
+        response.success()
+    with client.get("/", stream=stream, catch_response=True) as response:
+        assert failing.check(response) == "unexpected body marker b'Logged In'"
+        response.success()
+    assert stats.counts["page"] == [2, 0, 1]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_sampled_responses_are_drained(client, stream):
+    stats = ValidationStats("test")
+    validator = ResponseValidator("page", stats=stats, body_any=(b"Logged In",), sample_rate=2, stream=stream)
+    for _ in range(4):
+        with client.get("/", stream=stream, catch_response=True) as response:
+            assert validator.check(response) is None
+            response.success()
+    assert stats.counts["page"] == [2, 2, 0]
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from sample_log import SampleLogWriter, read_blocks, STATUS_ERROR_BIT
+from sample_log_analyzer import scan_endpoints, scan_windows
+
+# (name, status, response_time ms, response_length, start_time s)
+SAMPLES = [
+    ("Login Page", 200, 12.5, 3000, 1000.0),
+    ("Login", 302, 40.0, 0, 1000.25),
+    ("Login Page", 200, 8.0, None, 1000.5),
+    ("Logout", 0 | STATUS_ERROR_BIT, 5000.0, 0, 1001.0),
+    ("Login", 500 | STATUS_ERROR_BIT, 120.0, 512, 1001.5),
+    ("Login Page", 200, 9.0, 3000, 1002.0),
+    ("Login", 302, 35.0, 0, 1002.1),
+]
+
+
+def write_log(path, samples, block_size):
+    writer = SampleLogWriter(str(path), block_size=block_size)
+    for sample in samples:
+        writer.record(*sample)
+    writer.close()
+
+
+def read_log(path):
+    rows = []
+    for names, columns in read_blocks(str(path)):
+        rows.extend((names[name_id], status, latency, size, ts) for name_id, status, latency, size, ts in
+                    zip(columns["name_id"], columns["status"], columns["latency_us"], columns["bytes"], columns["ts_us"]))
+    return rows
+
+
+def expected_rows(samples):
+    return [(name, status, int(response_time * 1000), length or 0, int(start_time * 1000000))
+            for name, status, response_time, length, start_time in samples]
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 65536])
+def test_round_trip_across_blocks(tmp_path, block_size):
+    path = tmp_path / "samples.bin"
+    write_log(path, SAMPLES, block_size)
+    assert read_log(path) == expected_rows(SAMPLES)
+    # Blocks stay 8-byte aligned whatever the names and counts
+    assert os.path.getsize(path) % 8 == 0
+
+
+def test_truncated_last_block_is_skipped(tmp_path):
+    path = tmp_path / "samples.bin"
+    write_log(path, SAMPLES, block_size=4)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 8)
+    assert read_log(path) == expected_rows(SAMPLES[:4])
+
+
+def test_foreign_files_are_rejected(tmp_path):
+    path = tmp_path / "samples.bin"
+    path.write_bytes(b"not a sample log")
+    with pytest.raises(ValueError):
+        read_log(path)
+
+
+def test_analyzer_aggregates_several_files(tmp_path):
+    first, second = tmp_path / "worker1.bin", tmp_path / "worker2.bin"
+    write_log(first, SAMPLES[:4], block_size=2)
+    write_log(second, SAMPLES[4:], block_size=2)
+
+    stats = scan_endpoints([str(first), str(second)])
+    assert {name: (s.hist.total, s.errors, s.bytes) for name, s in stats.items()} == {
+        "Login Page": (3, 0, 6000),
+        "Login": (3, 1, 512),
+        "Logout": (1, 1, 0),
+    }
+    windows, first_key = scan_windows([str(first), str(second)], window_s=1)
+    assert first_key == 1000
+    assert {key: (s.hist.total, s.errors) for key, s in windows.items()} == {1000: (3, 0), 1001: (2, 2), 1002: (2, 0)}
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import gevent
+
+from sampling_profiler import SamplingProfiler, IDLE
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def task():
+    for _ in range(10):
+        busy(0.01)
+        gevent.sleep(0.01)
+
+
+def test_idle_hub_and_labelled_greenlets():
+    profiler = SamplingProfiler("test", interval=0.002)
+    profiler.label("task", task)
+    profiler.start()
+    gevent.joinall([gevent.spawn(task) for _ in range(2)])
+    gevent.sleep(0.1)
+    profiler.stop()
+    assert profiler.categories["task"] > 0
+    assert profiler.categories[IDLE] > 0
+    # The hub's own frame never ends up as a category of its own
+    assert profiler.categories["other"] < profiler.categories[IDLE]
+
+
+def test_summary_covers_main_thread_only(capsys):
+    profiler = SamplingProfiler("test", interval=0.002)
+    stop = threading.Event()
+    # Background threads sampled on every tick must not inflate the main-thread table
+    threads = [threading.Thread(target=stop.wait) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    profiler.start()
+    busy(0.1)
+    profiler.stop()
+    stop.set()
+    profiler.print_summary()
+    shares = [float(line.split("%")[0]) for line in capsys.readouterr().out.splitlines()[1:]]
+    assert shares and sum(shares) <= 100.05
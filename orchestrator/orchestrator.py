@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+orchestrator.py
+Runs the Locust, Playwright and Selenium suites concurrently on one host and
+exports their results as one metric set with a single Pushgateway push.
+
+Resource plan (printed before the start, --dry-run prints only the plan):
+  - one core (RESERVED_CORES) and RESERVED_MB of memory stay free for the OS
+    and this process
+  - Locust gets one worker process per core: all usable cores when it runs
+    alone, otherwise --locust-share of them (at least one), so the browsers
+    never starve the load generator
+  - the remaining cores and memory are split evenly between the browser
+    suites: Playwright contexts (PLAYWRIGHT_CONTEXTS_PER_CORE per core,
+    PLAYWRIGHT_CONTEXT_MB each, PLAYWRIGHT_CONTEXTS_PER_BROWSER per Chromium)
+    and Selenium drivers (one per core, SELENIUM_DRIVER_MB each), whichever
+    of cores or memory runs out first
+  - on Linux every suite is pinned to its cores (sched_setaffinity, inherited
+    by browsers and Locust workers); --no-pin disables it
+
+Every suite runs as a subprocess with PUSHGATEWAY_ADDRESS empty (no own
+push) and writes its text snapshot into --output-dir together with its log.
+When all have finished, the snapshots are parsed into one registry, next to
+orchestrator_* metrics (plan, exit codes, durations, host size), written to
+--metrics-file and pushed once as --job. With RESULT_STORE set, every suite also
+saves its run into that result store, tagged with a shared RESULT_RUN_GROUP.
+
+Usage:
+  python orchestrator/orchestrator.py --dry-run
+  TARGET_BASE_URL=http://127.0.0.1:8080 python orchestrator/orchestrator.py \\
+      --users 200 --run-time 5m --num-tests 500
+"""
+
+import os
+import sys
+import math
+import time
+import shlex
+import argparse
+import subprocess
+import psutil
+from prometheus_client import CollectorRegistry, Gauge, generate_latest, push_to_gateway
+from prometheus_client.parser import text_string_to_metric_families
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITES = ("locust", "playwright", "selenium")
+BROWSER_SUITES = ("playwright", "selenium")
+SCRIPTS = {
+    "locust": os.path.join(ROOT, "my_locust", "locust_login_test.py"),
+    "playwright": os.path.join(ROOT, "playwright", "playwright_login_test.py"),
+    "selenium": os.path.join(ROOT, "selenium", "selenium_login_test.py"),
+}
+
+RESERVED_CORES = 1
+RESERVED_MB = 1024
+LOCUST_WORKER_MB = 150
+LOCUST_SHARE = 0.25
+PLAYWRIGHT_CONTEXTS_PER_CORE = 2
+PLAYWRIGHT_CONTEXT_MB = 150
+PLAYWRIGHT_CONTEXTS_PER_BROWSER = 10
+PLAYWRIGHT_BROWSER_MB = 300
+SELENIUM_DRIVERS_PER_CORE = 1
+SELENIUM_DRIVER_MB = 500
+POLL_INTERVAL = 0.5
+
+
+def host_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_evenly(items, parts):
+    """`parts` contiguous slices; with fewer items than parts the slices share the last item."""
+    size = len(items) / parts
+    slices = [items[round(i * size):round((i + 1) * size)] for i in range(parts)]
+    return [s or items[-1:] for s in slices]
+
+
+def plan_resources(suites, cpus, memory_mb, locust_workers=0, playwright_concurrency=0, selenium_workers=0,
+                   locust_share=LOCUST_SHARE):
+    """suite -> {"workers", "cpus", "memory_mb"} (+ "browsers" for Playwright)."""
+    usable = cpus[:-RESERVED_CORES] if len(cpus) > RESERVED_CORES else list(cpus)
+    usable_mb = max(0, memory_mb - RESERVED_MB)
+    browsers = [s for s in suites if s in BROWSER_SUITES]
+    plan = {}
+    if "locust" in suites:
+        workers = locust_workers or (max(1, round(len(usable) * locust_share)) if browsers else len(usable))
+        workers = max(1, min(workers, usable_mb // LOCUST_WORKER_MB or 1))
+        cores = usable[:workers] if browsers else usable
+        plan["locust"] = {"workers": workers, "cpus": cores, "memory_mb": workers * LOCUST_WORKER_MB}
+        if browsers:
+            # Browsers share the last core when Locust took them all
+            usable = usable[workers:] or usable[-1:]
+            usable_mb = max(0, usable_mb - workers * LOCUST_WORKER_MB)
+    for suite, cores in zip(browsers, split_evenly(usable, len(browsers)) if browsers else ()):
+        memory = usable_mb // len(browsers)
+        if suite == "playwright":
+            contexts = playwright_concurrency or max(1, min(
+                len(cores) * PLAYWRIGHT_CONTEXTS_PER_CORE,
+                (memory - PLAYWRIGHT_BROWSER_MB) // PLAYWRIGHT_CONTEXT_MB))
+            browser_count = max(1, math.ceil(contexts / PLAYWRIGHT_CONTEXTS_PER_BROWSER))
+            plan[suite] = {"workers": contexts, "browsers": browser_count, "cpus": cores,
+                           "memory_mb": browser_count * PLAYWRIGHT_BROWSER_MB + contexts * PLAYWRIGHT_CONTEXT_MB}
+        else:
+            drivers = selenium_workers or max(1, min(len(cores) * SELENIUM_DRIVERS_PER_CORE,
+                                                     memory // SELENIUM_DRIVER_MB))
+            plan[suite] = {"workers": drivers, "cpus": cores, "memory_mb": drivers * SELENIUM_DRIVER_MB}
+    return plan
+
+
+def print_plan(plan, cpus, memory_mb):
+    print(f"[INFO] Host: {len(cpus)} cores, {memory_mb} MB available "
+          f"(reserved: {RESERVED_CORES} core(s), {RESERVED_MB} MB)")
+    for suite, entry in plan.items():
+        extra = f", {entry['browsers']} browser(s)" if "browsers" in entry else ""
+        print(f"[INFO] {suite:<10} workers {entry['workers']}{extra}, cpus {format_cpus(entry['cpus'])}, "
+              f"~{entry['memory_mb']} MB")
+
+
+def format_cpus(cpus):
+    if not cpus:
+        return "-"
+    return f"{cpus[0]}-{cpus[-1]}" if len(cpus) > 1 else str(cpus[0])
+
+
+def suite_command(suite, entry, options):
+    metrics_file = os.path.join(options.output_dir, f"{suite}_metrics.txt")
+    env = dict(os.environ, PUSHGATEWAY_ADDRESS="")
+    if env.get("RESULT_STORE"):
+        # Suites run from the repository root, so a relative path would move
+        env.update(RESULT_STORE=os.path.abspath(env["RESULT_STORE"]), RESULT_RUN_GROUP=options.run_group)
+    if suite == "locust":
+        cmd = [sys.executable, "-m", "locust", "-f", SCRIPTS[suite], "--headless",
+               "-u", str(options.users), "-r", str(options.spawn_rate), "--run-time", options.run_time]
+        if entry["workers"] > 1:
+            cmd += ["--processes", str(entry["workers"])]
+        cmd += shlex.split(options.locust_args)
+        env.update(LOCUST_METRICS_FILE=metrics_file,
+                   LOCUST_HISTOGRAM_FILE=os.path.join(options.output_dir, "locust_latency_histograms.json"))
+    elif suite == "playwright":
+        cmd = [sys.executable, SCRIPTS[suite], "--mode", "async", "--concurrency", str(entry["workers"]),
+               "--browsers", str(entry["browsers"]), "--export-metrics", "--metrics-file", metrics_file]
+        env["NUM_TESTS"] = str(options.num_tests)
+    else:
+        cmd = [sys.executable, SCRIPTS[suite], "--workers", str(entry["workers"]),
+               "--export-metrics", "--metrics-file", metrics_file]
+        if options.prewarm:
+            cmd.append("--prewarm")
+        env["NUM_TESTS"] = str(options.num_tests)
+    return cmd, env, metrics_file
+
+
+def launch(suite, entry, options):
+    cmd, env, metrics_file = suite_command(suite, entry, options)
+    cpus = set(entry["cpus"])
+    preexec = None
+    if options.pin and cpus and hasattr(os, "sched_setaffinity"):
+        def preexec():
+            # Inherited by every process the suite starts (Locust workers, browsers, drivers)
+            os.sched_setaffinity(0, cpus)
+    log = open(os.path.join(options.output_dir, f"{suite}.log"), "wb")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, preexec_fn=preexec)
+    log.close()
+    return {"proc": proc, "metrics_file": metrics_file, "start": time.monotonic(), "duration": None}
+
+
+def terminate_all(running):
+    for r in running.values():
+        if r["proc"].poll() is None:
+            # SIGTERM lets Locust stop the test and still write its metrics file
+            r["proc"].terminate()
+            r["proc"].wait()
+
+
+def wait_all(running):
+    try:
+        while any(r["duration"] is None for r in running.values()):
+            for suite, r in running.items():
+                if r["duration"] is None and r["proc"].poll() is not None:
+                    r["duration"] = time.monotonic() - r["start"]
+                    print(f"[INFO] {suite} finished with exit code {r['proc'].returncode} "
+                          f"in {r['duration']:.1f} s")
+            time.sleep(POLL_INTERVAL)
+    finally:
+        terminate_all(running)
+
+
+class SuiteMetrics:
+    """Collector re-exporting the metric families parsed from the suites' text snapshots."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def collect(self):
+        families = {}
+        for path in self.paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                continue
+            for family in text_string_to_metric_families(text):
+                existing = families.get(family.name)
+                if existing is None:
+                    families[family.name] = family
+                elif existing.type == family.type:
+                    existing.samples.extend(family.samples)
+        yield from families.values()
+
+
+def build_registry(plan, running, cpus, memory_mb):
+    registry = CollectorRegistry()
+    registry.register(SuiteMetrics([r["metrics_file"] for r in running.values()]))
+    workers = Gauge("orchestrator_suite_workers", "Planned worker processes / contexts per suite", ["suite"],
+                    registry=registry)
+    cores = Gauge("orchestrator_suite_cpus", "Cores assigned to the suite", ["suite"], registry=registry)
+    exit_code = Gauge("orchestrator_suite_exit_code", "Exit code of the suite process", ["suite"],
+                      registry=registry)
+    duration = Gauge("orchestrator_suite_duration_seconds", "Wall time of the suite process", ["suite"],
+                     registry=registry)
+    for suite, r in running.items():
+        workers.labels(suite=suite).set(plan[suite]["workers"])
+        cores.labels(suite=suite).set(len(plan[suite]["cpus"]))
+        exit_code.labels(suite=suite).set(r["proc"].returncode)
+        duration.labels(suite=suite).set(r["duration"] or 0.0)
+    Gauge("orchestrator_host_cpus", "Cores available to the orchestrator", registry=registry).set(len(cpus))
+    Gauge("orchestrator_host_memory_bytes", "Memory available at the start",
+          registry=registry).set(memory_mb * 2 ** 20)
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all suites concurrently with one metric export.")
+    parser.add_argument("--suites", default=",".join(SUITES), help="Comma-separated subset of: " + ", ".join(SUITES))
+    parser.add_argument("--dry-run", action="store_true", help="Print the resource plan and exit")
+    parser.add_argument("--output-dir", default="orchestrator_output")
+    parser.add_argument("--metrics-file", default="orchestrator_metrics.txt")
+    parser.add_argument("--job", default="stress_tests")
+    parser.add_argument("--instance", default=os.getenv("ORCHESTRATOR_INSTANCE", "orchestrator"))
+    parser.add_argument("--no-push", action="store_true")
+    parser.add_argument("--no-pin", dest="pin", action="store_false", help="Do not pin suites to their cores")
+    parser.add_argument("--locust-share", type=float, default=LOCUST_SHARE,
+                        help="Share of usable cores for Locust workers when browser suites run alongside")
+    parser.add_argument("--locust-workers", type=int, default=0, help="Override the planned Locust processes")
+    parser.add_argument("--playwright-concurrency", type=int, default=0, help="Override the planned contexts")
+    parser.add_argument("--selenium-workers", type=int, default=0, help="Override the planned drivers")
+    parser.add_argument("--users", type=int, default=100, help="Locust users")
+    parser.add_argument("--spawn-rate", type=float, default=10, help="Locust spawn rate")
+    parser.add_argument("--run-time", default="1m", help="Locust run time")
+    parser.add_argument("--locust-args", default="", help="Extra Locust arguments")
+    parser.add_argument("--num-tests", type=int, default=int(os.getenv("NUM_TESTS", 100)),
+                        help="Iterations of each browser suite")
+    parser.add_argument("--prewarm", action="store_true", help="Selenium --prewarm")
+    options = parser.parse_args()
+
+    suites = [s.strip() for s in options.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+    cpus = host_cpus()
+    memory_mb = psutil.virtual_memory().available // 2 ** 20
+    plan = plan_resources(suites, cpus, memory_mb, options.locust_workers, options.playwright_concurrency,
+                          options.selenium_workers, options.locust_share)
+    print_plan(plan, cpus, memory_mb)
+    if options.dry_run:
+        return 0
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    options.output_dir = os.path.abspath(options.output_dir)
+    options.run_group = os.getenv("RESULT_RUN_GROUP") or f"{options.instance}-{time.strftime('%Y%m%dT%H%M%S')}"
+    running = {}
+    try:
+        for suite in suites:
+            running[suite] = launch(suite, plan[suite], options)
+    except BaseException:
+        terminate_all(running)
+        raise
+    wait_all(running)
+
+    registry = build_registry(plan, running, cpus, memory_mb)
+    with open(options.metrics_file, "wb") as f:
+        f.write(generate_latest(registry))
+    print(f"[INFO] Metrics of {len(running)} suite(s) written to {options.metrics_file}")
+    gateway = os.getenv("PUSHGATEWAY_ADDRESS", "localhost:9091")
+    if not options.no_push and gateway:
+        try:
+            push_to_gateway(gateway, job=options.job, grouping_key={"instance": options.instance},
+                            registry=registry)
+            print(f"[INFO] Metrics pushed to Pushgateway at: {gateway} with job: {options.job}")
+        except Exception as e:
+            print("[ERROR] Failed to push metrics:", e)
+    failed = [suite for suite, r in running.items() if r["proc"].returncode != 0]
+    if failed:
+        print(f"[ERROR] Suite(s) failed: {', '.join(failed)} (logs in {options.output_dir})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""
+auth_state.py
+Zapamiętany stan zalogowania (browser_common/auth_state_base.py) w Playwright:
+plik to natywny storage state, więc każdy nowy kontekst startuje zalogowany
+przez browser.new_context(storage_state=...).
+"""
+
+from auth_state_base import AuthStateBase
+
+
+class AuthState(AuthStateBase):
+    def context_options(self):
+        """Argumenty dla browser.new_context(); pusty słownik, gdy stan jest wyłączony."""
+        if self.enabled:
+            return {"storage_state": self.path}
+        return {}
+
+    def save(self, context):
+        context.storage_state(path=self.path)
+
+    async def save_async(self, context):
+        await context.storage_state(path=self.path)
@@ -0,0 +1,24 @@
+"""
+navigation_timing.py
+Odczyt metryk przeglądarki (browser_common/navigation_timing_base.py) ze strony
+Playwright: page.evaluate() czeka na Promise z TIMING_JS.
+"""
+
+from navigation_timing_base import TIMING_JS, NavigationTimingBase
+
+
+class NavigationTimingMetrics(NavigationTimingBase):
+    def collect(self, page, label):
+        # Brak metryk (np. strona w trakcie nawigacji) nie jest błędem testu
+        try:
+            timing = page.evaluate(TIMING_JS)
+        except Exception:
+            return
+        self.observe(timing, label)
+
+    async def collect_async(self, page, label):
+        try:
+            timing = await page.evaluate(TIMING_JS)
+        except Exception:
+            return
+        self.observe(timing, label)
@@ -0,0 +1,47 @@
+"""
+network_policy.py
+Podpięcie wspólnej polityki ruchu sieciowego (browser_common/network_policy_base.py)
+pod BrowserContext Playwright: blokowanie przez context.route(), HAR przez
+record_har_path (nagrywanie) i context.route_from_har() (odtwarzanie).
+"""
+
+from network_policy_base import NetworkPolicyBase
+
+
+class NetworkPolicy(NetworkPolicyBase):
+    default_har_file = "playwright.har"
+
+    def context_options(self, record=True):
+        """Argumenty dla browser.new_context(); nagrywa tylko kontekst z record=True."""
+        if self.har_mode == "record" and record:
+            return {"record_har_path": self.har_file, "record_har_content": "embed"}
+        return {}
+
+    # --- API synchroniczne ---
+    def install(self, context):
+        # Trasy wywoływane są od ostatnio dodanej: najpierw blokowanie, potem HAR
+        if self.har_mode == "replay":
+            context.route_from_har(self.har_file, not_found="abort")
+        if self.blocks_anything:
+            context.route("**/*", self._handle)
+
+    def _handle(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            route.abort()
+        else:
+            route.fallback()
+
+    # --- API asynchroniczne ---
+    async def install_async(self, context):
+        if self.har_mode == "replay":
+            await context.route_from_har(self.har_file, not_found="abort")
+        if self.blocks_anything:
+            await context.route("**/*", self._handle_async)
+
+    async def _handle_async(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            await route.abort()
+        else:
+            await route.fallback()
@@ -1,18 +1,40 @@
 #!/usr/bin/env python3
 import os
+import sys
 import time
+import asyncio
 import argparse
+import selectors
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from prometheus_client import (
     CollectorRegistry, Counter, generate_latest, push_to_gateway
 )
 from colorama import init
+# Moduły wspólne dla obu suit przeglądarkowych; w katalogu suity są tylko adaptery
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "browser_common"))
+from network_policy import NetworkPolicy
+from navigation_timing import NavigationTimingMetrics
+from saturation_monitor import SaturationMonitor
+from recycling import RecyclePolicy
+from auth_state import AuthState
+from sampling_profiler import SamplingProfiler
+
+# Magazyn wyników wspólny dla wszystkich suit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "result_store"))
+from result_store import record_run
 
 init(autoreset=True)
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--export-metrics", action="store_true")
 parser.add_argument("--metrics-file", type=str, default="playwright_metrics.txt")
+parser.add_argument("--mode", choices=["sync", "async"], default=os.getenv("PLAYWRIGHT_MODE", "sync"),
+                    help="sync: jedna strona, iteracje po kolei; async: wiele BrowserContextów równolegle")
+parser.add_argument("--concurrency", type=int, default=int(os.getenv("CONCURRENCY", 10)),
+                    help="Liczba równoległych BrowserContextów (tryb async)")
+parser.add_argument("--browsers", type=int, default=int(os.getenv("BROWSERS", 1)),
+                    help="Liczba procesów Chromium, między które rozdzielane są konteksty (tryb async)")
 args = parser.parse_args()
 
 # Ustawienia z ENV lub domyślne
@@ -20,9 +42,35 @@ NUM_TESTS = int(os.getenv("NUM_TESTS", 1))
 LOGIN = os.getenv("LOGIN", "student")
 PASSWORD = os.getenv("PASSWORD", "Password123")
 PUSHGATEWAY_ADDRESS = os.getenv("PUSHGATEWAY_ADDRESS", "localhost:9091").rstrip("/")
+# Lokalna baza SQLite z historią przebiegów (pusta = wyłączona, patrz result_store.py)
+RESULT_STORE = os.getenv("RESULT_STORE", "")
 
 # Limit czasu (w sekundach) – dla pozytywnych testów
 MAX_DURATION = 3.8
+# Maksymalny czas oczekiwania na nawigację / komunikat (ms)
+NAVIGATION_TIMEOUT = int(os.getenv("NAVIGATION_TIMEOUT", 10000))
+
+# Adres testowanej strony, wspólny dla wszystkich suit (np. lokalny target_server)
+TARGET_BASE_URL = os.getenv("TARGET_BASE_URL", "https://practicetestautomation.com").rstrip("/")
+LOGIN_URL = f"{TARGET_BASE_URL}/practice-test-login/"
+SUCCESS_URL = f"{TARGET_BASE_URL}/logged-in-successfully/"
+# Rozpoznajemy scenariusz (positive/negative)
+SCENARIO = "positive" if (LOGIN == "student" and PASSWORD == "Password123") else "negative"
+# Blokowanie zasobów / HAR (patrz network_policy.py)
+NETWORK_POLICY = NetworkPolicy.from_env(LOGIN_URL)
+# Po kliknięciu "Submit" czekamy na stronę sukcesu albo widoczny komunikat błędu
+AFTER_SUBMIT_SELECTOR = "#error:visible, a:has-text('Log out')"
+# Nowy kontekst/przeglądarka po N iteracjach lub po przekroczeniu RSS (patrz recycling.py)
+RECYCLE = RecyclePolicy.from_env()
+if RECYCLE.enabled and NETWORK_POLICY.har_mode == "record":
+    # HAR zapisywany jest przy zamknięciu kontekstu – każdy recykling nadpisałby plik
+    print("[INFO] HAR_MODE=record: browser recycling disabled.")
+    RECYCLE = RecyclePolicy()
+# Zapamiętana sesja zamiast formularza (patrz auth_state.py)
+AUTH_STATE = AuthState.from_env()
+if AUTH_STATE.enabled and SCENARIO != "positive":
+    print("[WARN] AUTH_STATE applies to the positive scenario only; logging in with the form.")
+    AUTH_STATE.enabled = False
 
 # Rejestr do Prometheusa
 registry = CollectorRegistry()
@@ -48,70 +96,308 @@ TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER = Counter(
     "Total positive tests that unexpectedly failed",
     registry=registry
 )
+# Fazy nawigacji mierzone w przeglądarce (DNS, connect, TTFB, DOM complete, FCP/LCP)
+NAVIGATION_TIMING = NavigationTimingMetrics(registry, "playwright")
+# Nasycenie maszyny testującej (CPU/RSS przeglądarek, rdzenie, deskryptory), próbkowane w tle
+SATURATION = SaturationMonitor("playwright", interval=int(os.getenv("MONITOR_INTERVAL_MS", 250)) / 1000)
+registry.register(SATURATION)
+BROWSER_RECYCLE_COUNTER = Counter(
+    "playwright_browser_recycles_total",
+    "Browser contexts (sync: whole browsers) restarted by the recycling policy",
+    ["reason"],
+    registry=registry
+)
+# Profiler próbkujący: gdzie wątek główny spędza czas (patrz sampling_profiler.py)
+PROFILER = SamplingProfiler.from_env("playwright")
+if PROFILER.enabled:
+    registry.register(PROFILER)
 # =============================
 
+
+def record_result(logged_in, success_message, logged_out, duration):
+    """
+    Jedno miejsce decydujące, który licznik zwiększyć – wspólne dla trybu sync i async,
+    więc wyniki są liczone tak samo niezależnie od liczby równoległych kontekstów.
+    """
+    if SCENARIO == "positive":
+        # Pozytywny scenariusz: zalogowanie, komunikat, wylogowanie i czas w normie
+        if logged_in and success_message and logged_out and duration <= MAX_DURATION:
+            TEST_PASSED_COUNTER.inc()
+        else:
+            TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER.inc()
+    else:
+        # Negatywny scenariusz: zalogowanie się oznacza nieoczekiwany sukces
+        if logged_in:
+            TEST_NEGATIVE_UNEXPECTED_PASS_COUNTER.inc()
+        else:
+            TEST_FAILED_COUNTER.inc()
+
+
+def run_iteration(page):
+    start_time = time.perf_counter()
+    # Przechodzimy do strony logowania
+    page.goto(LOGIN_URL)
+    # Odczyt metryk przeglądarki nie wlicza się do czasu iteracji
+    timing_start = time.perf_counter()
+    NAVIGATION_TIMING.collect(page, "login")
+    timing_overhead = time.perf_counter() - timing_start
+    page.fill("#username", LOGIN)
+    page.fill("#password", PASSWORD)
+    page.click("#submit")
+
+    # Zamiast time.sleep(0.2): czekamy na stronę sukcesu albo na komunikat błędu
+    try:
+        page.wait_for_selector(AFTER_SUBMIT_SELECTOR, timeout=NAVIGATION_TIMEOUT)
+    except Exception:
+        pass
+
+    duration = time.perf_counter() - start_time - timing_overhead
+    logged_in = "logged-in-successfully" in page.url
+    success_message = False
+    logged_out = False
+    if logged_in:
+        NAVIGATION_TIMING.collect(page, "logged_in")
+        content = page.content()
+        success_message = "Logged In Successfully" in content or "Congratulations" in content
+        if success_message:
+            # Sprawdzamy wylogowanie – czekamy na powrót do strony logowania
+            page.click("text=Log out")
+            try:
+                page.wait_for_url("**/practice-test-login/**", timeout=NAVIGATION_TIMEOUT)
+                logged_out = True
+            except Exception:
+                logged_out = False
+    return logged_in, success_message, logged_out, duration
+
+
+async def run_iteration_async(page):
+    start_time = time.perf_counter()
+    await page.goto(LOGIN_URL)
+    # Odczyt metryk przeglądarki nie wlicza się do czasu iteracji
+    timing_start = time.perf_counter()
+    await NAVIGATION_TIMING.collect_async(page, "login")
+    timing_overhead = time.perf_counter() - timing_start
+    await page.fill("#username", LOGIN)
+    await page.fill("#password", PASSWORD)
+    await page.click("#submit")
+
+    # Zamiast time.sleep(0.2): czekamy na stronę sukcesu albo na komunikat błędu
+    try:
+        await page.wait_for_selector(AFTER_SUBMIT_SELECTOR, timeout=NAVIGATION_TIMEOUT)
+    except Exception:
+        pass
+
+    duration = time.perf_counter() - start_time - timing_overhead
+    logged_in = "logged-in-successfully" in page.url
+    success_message = False
+    logged_out = False
+    if logged_in:
+        await NAVIGATION_TIMING.collect_async(page, "logged_in")
+        content = await page.content()
+        success_message = "Logged In Successfully" in content or "Congratulations" in content
+        if success_message:
+            # Sprawdzamy wylogowanie – czekamy na powrót do strony logowania
+            await page.click("text=Log out")
+            try:
+                await page.wait_for_url("**/practice-test-login/**", timeout=NAVIGATION_TIMEOUT)
+                logged_out = True
+            except Exception:
+                logged_out = False
+    return logged_in, success_message, logged_out, duration
+
+
+def run_authenticated_iteration(page):
+    """Scenariusz po logowaniu: kontekst ma już zapamiętaną sesję, formularz jest pomijany."""
+    start_time = time.perf_counter()
+    page.goto(SUCCESS_URL)
+    duration = time.perf_counter() - start_time
+    logged_in = "logged-in-successfully" in page.url
+    success_message = False
+    if logged_in:
+        NAVIGATION_TIMING.collect(page, "logged_in")
+        content = page.content()
+        success_message = "Logged In Successfully" in content or "Congratulations" in content
+    # Bez wylogowania – unieważniłoby zapamiętaną sesję; dla record_result warunek jest spełniony
+    return logged_in, success_message, True, duration
+
+
+async def run_authenticated_iteration_async(page):
+    start_time = time.perf_counter()
+    await page.goto(SUCCESS_URL)
+    duration = time.perf_counter() - start_time
+    logged_in = "logged-in-successfully" in page.url
+    success_message = False
+    if logged_in:
+        await NAVIGATION_TIMING.collect_async(page, "logged_in")
+        content = await page.content()
+        success_message = "Logged In Successfully" in content or "Congratulations" in content
+    return logged_in, success_message, True, duration
+
+
+def ensure_auth_state(browser):
+    """Loguje się formularzem (bez wylogowania) i zapisuje stan sesji, jeśli plik jest nieaktualny."""
+    if AUTH_STATE.fresh():
+        return
+    context = browser.new_context(**NETWORK_POLICY.context_options(record=False))
+    NETWORK_POLICY.install(context)
+    try:
+        page = context.new_page()
+        page.goto(LOGIN_URL)
+        page.fill("#username", LOGIN)
+        page.fill("#password", PASSWORD)
+        page.click("#submit")
+        page.wait_for_url("**/logged-in-successfully/**", timeout=NAVIGATION_TIMEOUT)
+        AUTH_STATE.save(context)
+    finally:
+        context.close()
+    print(f"[INFO] Auth state saved to {AUTH_STATE.path}")
+
+
+async def ensure_auth_state_async(browser):
+    if AUTH_STATE.fresh():
+        return
+    context = await browser.new_context(**NETWORK_POLICY.context_options(record=False))
+    await NETWORK_POLICY.install_async(context)
+    try:
+        page = await context.new_page()
+        await page.goto(LOGIN_URL)
+        await page.fill("#username", LOGIN)
+        await page.fill("#password", PASSWORD)
+        await page.click("#submit")
+        await page.wait_for_url("**/logged-in-successfully/**", timeout=NAVIGATION_TIMEOUT)
+        await AUTH_STATE.save_async(context)
+    finally:
+        await context.close()
+    print(f"[INFO] Auth state saved to {AUTH_STATE.path}")
+
+
+async def context_worker(browser, next_iteration, record_har, sessions):
+    iteration = run_authenticated_iteration_async if AUTH_STATE.enabled else run_iteration_async
+
+    async def open_page():
+        # Każdy worker ma własny, izolowany BrowserContext (cookies, storage)
+        context = await browser.new_context(**NETWORK_POLICY.context_options(record=record_har),
+                                            **AUTH_STATE.context_options())
+        await NETWORK_POLICY.install_async(context)
+        return context, await context.new_page()
+
+    context, page = await open_page()
+    session_iterations = 0
+    try:
+        while next_iteration():
+            # Procesy Chromium są wspólne dla kontekstów, więc recyklingowi podlega sam kontekst
+            reason = RECYCLE.check(session_iterations, sessions) if session_iterations else None
+            if reason:
+                BROWSER_RECYCLE_COUNTER.labels(reason=reason).inc()
+                await context.close()
+                context, page = await open_page()
+                session_iterations = 0
+            try:
+                record_result(*await iteration(page))
+            except Exception:
+                TEST_FAILED_COUNTER.inc()
+            session_iterations += 1
+    finally:
+        await context.close()
+
+
+async def run_login_test_async():
+    remaining = [NUM_TESTS]
+
+    def next_iteration():
+        # Pętla zdarzeń jest jednowątkowa, więc zwykły licznik wystarcza
+        if remaining[0] <= 0:
+            return False
+        remaining[0] -= 1
+        return True
+
+    concurrency = max(1, min(args.concurrency, NUM_TESTS))
+    browser_count = max(1, min(args.browsers, concurrency))
+    async with async_playwright() as p:
+        browsers = await asyncio.gather(*[p.chromium.launch(headless=True) for _ in range(browser_count)])
+        try:
+            if AUTH_STATE.enabled:
+                await ensure_auth_state_async(browsers[0])
+            await asyncio.gather(*[
+                # HAR nagrywa tylko pierwszy kontekst – pozostałe powtarzają ten sam przepływ
+                context_worker(browsers[i % browser_count], next_iteration, record_har=(i == 0),
+                               sessions=concurrency)
+                for i in range(concurrency)
+            ])
+        finally:
+            await asyncio.gather(*[b.close() for b in browsers], return_exceptions=True)
+
+
+def open_page(browser):
+    context = browser.new_context(**NETWORK_POLICY.context_options(), **AUTH_STATE.context_options())
+    NETWORK_POLICY.install(context)
+    return context, context.new_page()
+
+
 def run_login_test():
+    iteration = run_authenticated_iteration if AUTH_STATE.enabled else run_iteration
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
+        if AUTH_STATE.enabled:
+            ensure_auth_state(browser)
+        context, page = open_page(browser)
+        session_iterations = 0
 
         for _ in range(NUM_TESTS):
-            start_time = time.time()
-
+            reason = RECYCLE.check(session_iterations) if session_iterations else None
+            if reason:
+                # Nowa przeglądarka zwalnia też pamięć procesu przeglądarki, nie tylko renderera
+                BROWSER_RECYCLE_COUNTER.labels(reason=reason).inc()
+                context.close()
+                browser.close()
+                browser = p.chromium.launch(headless=True)
+                context, page = open_page(browser)
+                session_iterations = 0
             try:
-                # Przechodzimy do strony logowania
-                page.goto("https://practicetestautomation.com/practice-test-login/")
-                page.fill("#username", LOGIN)
-                page.fill("#password", PASSWORD)
-                page.click("#submit")
-                time.sleep(0.2)
-
-                duration = time.time() - start_time
-                current_url = page.url
-
-                # Rozpoznajemy scenariusz (positive/negative)
-                scenario = "positive" if (LOGIN == "student" and PASSWORD == "Password123") else "negative"
-
-                if scenario == "positive":
-                    # Pozytywny scenariusz: oczekujemy, że użytkownik zostanie zalogowany
-                    if "logged-in-successfully" in current_url:
-                        content = page.content()
-                        if ("Logged In Successfully" in content or "Congratulations" in content):
-                            # Sprawdzamy wylogowanie
-                            page.click("text=Log out")
-                            time.sleep(0.2)
-                            if "practice-test-login" in page.url:
-                                # Jeśli czas jest w normie, test "przeszedł"
-                                if duration <= MAX_DURATION:
-                                    TEST_PASSED_COUNTER.inc()
-                                else:
-                                    # Jeśli trwa za długo – tylko nieoczekiwane niepowodzenie
-                                    TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER.inc()
-                            else:
-                                TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER.inc()
-                        else:
-                            TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER.inc()
-                    else:
-                        TEST_POSITIVE_UNEXPECTED_FAIL_COUNTER.inc()
-
-                else:
-                    # Negatywny scenariusz: oczekujemy błędnego logowania (czyli nie zalogowania się)
-                    if "logged-in-successfully" in current_url:
-                        # Użytkownik zalogował się nieoczekiwanie
-                        TEST_NEGATIVE_UNEXPECTED_PASS_COUNTER.inc()
-                    else:
-                        # Test negatywny – niezależnie od czasu, zwiększamy tylko TEST_FAILED_COUNTER
-                        TEST_FAILED_COUNTER.inc()
-
+                record_result(*iteration(page))
             except Exception:
                 TEST_FAILED_COUNTER.inc()
+            session_iterations += 1
 
+        # HAR zapisywany jest przy zamknięciu kontekstu
+        context.close()
         browser.close()
 
 
+# Kategorie profilu; czekanie pętli asyncio (także pod API sync) to czekanie na przeglądarkę
+PROFILER.label("iteration", run_iteration, run_iteration_async,
+               run_authenticated_iteration, run_authenticated_iteration_async)
+PROFILER.label("auth", ensure_auth_state, ensure_auth_state_async)
+PROFILER.label("timing", NavigationTimingMetrics.collect, NavigationTimingMetrics.collect_async)
+PROFILER.label("metrics", record_result)
+PROFILER.label("browser_wait", selectors.DefaultSelector.select)
+
+
 if __name__ == "__main__":
-    run_login_test()
+    started = time.time()
+    overall_start = time.perf_counter()
+    SATURATION.start()
+    if PROFILER.enabled:
+        PROFILER.start()
+    try:
+        if args.mode == "async":
+            asyncio.run(run_login_test_async())
+        else:
+            run_login_test()
+    finally:
+        SATURATION.stop()
+        PROFILER.stop()
+    overall_duration = time.perf_counter() - overall_start
+    print(f"[INFO] {NUM_TESTS} iterations in {overall_duration:.2f} s "
+          f"({NUM_TESTS / overall_duration:.2f} it/s, mode: {args.mode})")
+    SATURATION.print_summary()
+    if PROFILER.enabled:
+        PROFILER.write_collapsed()
+        PROFILER.print_summary()
+        print("[INFO] Profile (collapsed stacks) saved to:", PROFILER.path)
+    if RESULT_STORE:
+        record_run(RESULT_STORE, "playwright", registry.collect(), started,
+                   metadata={"mode": args.mode, "scenario": SCENARIO, "iterations": NUM_TESTS})
 
     if args.export_metrics:
         metrics_output = generate_latest(registry).decode("utf-8")
@@ -126,12 +412,16 @@ if __name__ == "__main__":
         elif "positive" in args.metrics_file.lower():
             job_name = "playwright_tests_positive"
 
-        try:
-            push_to_gateway(
-                PUSHGATEWAY_ADDRESS,
-                job=job_name,
-                registry=registry
-            )
-            print(f"[INFO] Metrics pushed to Pushgateway at: {PUSHGATEWAY_ADDRESS} with job: {job_name}")
-        except Exception as e:
-            print("[ERROR] Failed to push metrics:", e)
+        if not PUSHGATEWAY_ADDRESS:
+            # Pusta zmienna = metryki zbiera i wysyła orkiestrator (orchestrator.py)
+            print("[INFO] PUSHGATEWAY_ADDRESS is empty, push skipped.")
+        else:
+            try:
+                push_to_gateway(
+                    PUSHGATEWAY_ADDRESS,
+                    job=job_name,
+                    registry=registry
+                )
+                print(f"[INFO] Metrics pushed to Pushgateway at: {PUSHGATEWAY_ADDRESS} with job: {job_name}")
+            except Exception as e:
+                print("[ERROR] Failed to push metrics:", e)
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+result_store.py
+Local SQLite store of test results, for trends across many runs.
+
+The text snapshots (locust_metrics.txt, ...) are overwritten by every run and
+the Pushgateway keeps only the latest value per job, so history lives here:
+with RESULT_STORE=<path> every suite saves its final metric set and the
+environment at test stop (one row in `runs`), and the CLI below answers
+trend, diff and percentile-history queries through the indexes without
+reading any snapshot file.
+
+Schema:
+  runs           id, suite, started, finished, run_group, label, host,
+                 git_commit, metadata (JSON: argv, platform, CPU count and
+                 the suites' env settings; credentials are left out)
+  metric_values  counters, gauges and histogram/summary _count/_sum, one row
+                 per run, metric, endpoint and remaining labels
+  percentiles    summary quantiles and quantiles estimated from histogram
+                 buckets (QUANTILES), same key plus quantile
+
+The endpoint is the request `name` (Locust) or the `page` (browser suites);
+the other labels are kept as sorted "key=value,..." text. Histogram buckets
+themselves are not stored.
+
+Environment:
+  RESULT_STORE      database path; empty = runs are not stored (default)
+  RESULT_RUN_GROUP  groups the runs of one orchestrated run (set by orchestrator.py)
+  RESULT_LABEL      free-form label, e.g. a build number or a branch
+
+Usage:
+  python result_store/result_store.py --db results.db runs --suite locust
+  python result_store/result_store.py --db results.db trend locust_request_total --endpoint "Login Page"
+  python result_store/result_store.py --db results.db percentiles locust_request_duration_seconds --last 50
+  python result_store/result_store.py --db results.db diff            # latest run vs. the one before
+  python result_store/result_store.py --db results.db ingest selenium selenium_metrics.txt
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINT_LABELS = ("name", "page")
+# Quantiles estimated from histogram buckets
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# Environment settings saved with every run
+ENV_PREFIXES = (
+    "LOCUST_", "TARGET_", "PLAYWRIGHT_", "SELENIUM_", "SEARCH_", "RECYCLE_", "AUTH_STATE", "HAR_",
+    "BLOCK_", "PROFILE", "MONITOR_", "NUM_TESTS", "CONCURRENCY", "BROWSERS", "RESULT_",
+)
+SECRET_MARKERS = ("PASSWORD", "TOKEN", "SECRET")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    suite TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    run_group TEXT,
+    label TEXT,
+    host TEXT,
+    git_commit TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_suite_started ON runs (suite, started);
+CREATE INDEX IF NOT EXISTS runs_group ON runs (run_group);
+CREATE TABLE IF NOT EXISTS metric_values (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric, endpoint, labels)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metric_values_metric ON metric_values (metric, endpoint, run_id);
+CREATE TABLE IF NOT EXISTS percentiles (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    quantile REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric, endpoint, labels, quantile)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS percentiles_metric ON percentiles (metric, endpoint, quantile, run_id);
+"""
+
+
+# ---------- flattening metric families ----------
+def split_labels(labels):
+    """(endpoint, "k=v,..." of the remaining labels)"""
+    endpoint = ""
+    rest = dict(labels)
+    for key in ENDPOINT_LABELS:
+        if key in rest:
+            endpoint = rest.pop(key)
+            break
+    return endpoint, ",".join(f"{k}={v}" for k, v in sorted(rest.items()))
+
+
+def bucket_quantile(quantile, buckets):
+    """Linear interpolation inside the bucket holding the quantile (as histogram_quantile())."""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return None
+    rank = quantile * total
+    lower, lower_count = 0.0, 0.0
+    for upper, count in buckets:
+        if count >= rank:
+            if upper == float("inf"):
+                return lower
+            if count == lower_count:
+                return upper
+            return lower + (upper - lower) * (rank - lower_count) / (count - lower_count)
+        lower, lower_count = upper, count
+    return lower
+
+
+def flatten(families):
+    """
+    Metric families (registry.collect() or the text parser) -> (values, percentiles)
+    rows without the run id.
+    """
+    values = {}
+    percentiles = {}
+    for family in families:
+        buckets = defaultdict(list)
+        for sample in family.samples:
+            name, labels, value = sample.name, sample.labels, sample.value
+            if name.endswith("_created") or value != value:
+                continue
+            if name.endswith("_bucket") and "le" in labels:
+                labels = dict(labels)
+                upper = float(labels.pop("le"))
+                buckets[split_labels(labels)].append((upper, value))
+            elif family.type == "summary" and "quantile" in labels:
+                labels = dict(labels)
+                quantile = float(labels.pop("quantile"))
+                percentiles[(family.name, *split_labels(labels), quantile)] = value
+            else:
+                values[(name, *split_labels(labels))] = value
+        for (endpoint, labels), series in buckets.items():
+            for quantile in QUANTILES:
+                value = bucket_quantile(quantile, series)
+                if value is not None:
+                    percentiles[(family.name, endpoint, labels, quantile)] = value
+    return values, percentiles
+
+
+def read_snapshot(file_path):
+    from prometheus_client.parser import text_string_to_metric_families
+    with open(file_path, encoding="utf-8") as f:
+        return list(text_string_to_metric_families(f.read()))
+
+
+# ---------- run metadata ----------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment_metadata(extra=None):
+    settings = {
+        key: value for key, value in os.environ.items()
+        if key.startswith(ENV_PREFIXES) and not any(marker in key for marker in SECRET_MARKERS)
+    }
+    metadata = {
+        "argv": sys.argv[1:],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "env": dict(sorted(settings.items())),
+    }
+    metadata.update(extra or {})
+    return metadata
+
+
+# ---------- store ----------
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        # Suites started together by the orchestrator write concurrently
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def save_run(self, suite, families, started, finished, metadata=None, run_id=None):
+        """
+        Stores one run and returns its id. With `run_id` the run's metrics are replaced,
+        e.g. when a Locust master re-exports after the workers' late reports.
+        """
+        metadata = environment_metadata(metadata)
+        values, percentiles = flatten(families)
+        with self.db:
+            if run_id is None:
+                run_id = self.db.execute(
+                    "INSERT INTO runs (suite, started, finished, run_group, label, host, git_commit, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (suite, started, finished, os.getenv("RESULT_RUN_GROUP") or None,
+                     os.getenv("RESULT_LABEL") or None, socket.gethostname(), git_commit(),
+                     json.dumps(metadata)),
+                ).lastrowid
+            else:
+                self.db.execute("UPDATE runs SET finished = ?, metadata = ? WHERE id = ?",
+                                (finished, json.dumps(metadata), run_id))
+                self.db.execute("DELETE FROM metric_values WHERE run_id = ?", (run_id,))
+                self.db.execute("DELETE FROM percentiles WHERE run_id = ?", (run_id,))
+            self.db.executemany("INSERT INTO metric_values VALUES (?, ?, ?, ?, ?)",
+                                [(run_id, *key, value) for key, value in values.items()])
+            self.db.executemany("INSERT INTO percentiles VALUES (?, ?, ?, ?, ?, ?)",
+                                [(run_id, *key, value) for key, value in percentiles.items()])
+        return run_id
+
+    # --- queries ---
+    def runs(self, suite=None, limit=20):
+        query = "SELECT id, suite, started, finished, run_group, label, git_commit FROM runs"
+        params = []
+        if suite:
+            query += " WHERE suite = ?"
+            params.append(suite)
+        query += " ORDER BY started DESC, id DESC LIMIT ?"
+        return self.db.execute(query, params + [limit]).fetchall()
+
+    def latest_runs(self, suite=None, count=2):
+        return [row[0] for row in self.runs(suite, count)]
+
+    def run_suite(self, run_id):
+        row = self.db.execute("SELECT suite FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _filters(endpoint, labels, suite, table="v"):
+        where, params = [], []
+        if endpoint is not None:
+            where.append(f"{table}.endpoint = ?")
+            params.append(endpoint)
+        if labels is not None:
+            where.append(f"{table}.labels = ?")
+            params.append(labels)
+        if suite:
+            where.append("r.suite = ?")
+            params.append(suite)
+        return "".join(f" AND {w}" for w in where), params
+
+    def trend(self, metric, endpoint=None, labels=None, suite=None, limit=50):
+        """(run id, started, suite, endpoint, labels, value) of the last `limit` runs, oldest first."""
+        where, params = self._filters(endpoint, labels, suite)
+        rows = self.db.execute(
+            "SELECT r.id, r.started, r.suite, v.endpoint, v.labels, v.value "
+            "FROM metric_values v JOIN runs r ON r.id = v.run_id "
+            f"WHERE v.metric = ?{where} ORDER BY r.started DESC, r.id DESC LIMIT ?",
+            [metric] + params + [limit],
+        ).fetchall()
+        return rows[::-1]
+
+    def percentile_history(self, metric, endpoint=None, labels=None, suite=None, limit=50):
+        """{(run id, started, endpoint, labels): {quantile: value}} of the last `limit` runs, oldest first."""
+        where, params = self._filters(endpoint, labels, suite, table="p")
+        run_ids = [row[0] for row in self.db.execute(
+            "SELECT DISTINCT p.run_id FROM percentiles p JOIN runs r ON r.id = p.run_id "
+            f"WHERE p.metric = ?{where} ORDER BY p.run_id DESC LIMIT ?",
+            [metric] + params + [limit],
+        )]
+        history = {}
+        if not run_ids:
+            return history
+        marks = ",".join("?" * len(run_ids))
+        for run_id, started, endpoint_value, labels_value, quantile, value in self.db.execute(
+            "SELECT r.id, r.started, p.endpoint, p.labels, p.quantile, p.value "
+            "FROM percentiles p JOIN runs r ON r.id = p.run_id "
+            f"WHERE p.metric = ?{where} AND p.run_id IN ({marks}) "
+            "ORDER BY r.started, r.id, p.endpoint, p.labels, p.quantile",
+            [metric] + params + run_ids,
+        ):
+            history.setdefault((run_id, started, endpoint_value, labels_value), {})[quantile] = value
+        return history
+
+    def diff(self, run_a, run_b, prefix=None):
+        """[(metric, endpoint, labels, value a, value b)] for every series of either run."""
+        glob = f"{prefix}*" if prefix else "*"
+        rows = []
+        for table, metric in (("metric_values", "metric"),
+                              ("percentiles", "metric || '{quantile=' || quantile || '}'")):
+            query = (
+                f"SELECT {metric}, endpoint, labels, "
+                "SUM(CASE WHEN run_id = ? THEN value END), SUM(CASE WHEN run_id = ? THEN value END) "
+                f"FROM {table} WHERE run_id IN (?, ?) AND metric GLOB ? "
+                f"GROUP BY {metric}, endpoint, labels"
+            )
+            rows.extend(self.db.execute(query, (run_a, run_b, run_a, run_b, glob)).fetchall())
+        return sorted(rows)
+
+
+def record_run(path, suite, families, started, finished=None, metadata=None, run_id=None):
+    """Saves a suite's final metrics from its test-stop hook; returns the run id (None on failure)."""
+    try:
+        store = ResultStore(path)
+        try:
+            run_id = store.save_run(suite, families, started, finished or time.time(), metadata, run_id)
+        finally:
+            store.close()
+        print(f"[INFO] Run {run_id} ({suite}) stored in {path}")
+        return run_id
+    except Exception as e:
+        print(f"[ERROR] Failed to store results in {path}: {e}")
+        return run_id
+
+
+# ---------- CLI ----------
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    return f"{value:.6g}"
+
+
+def relative_change(a, b):
+    if a is None or b is None:
+        return None
+    if a == 0:
+        return 0.0 if b == 0 else float("inf")
+    return (b - a) / abs(a)
+
+
+def print_table(header, rows):
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(str(h)), *(len(row[i]) for row in rows)) if rows else len(str(h))
+              for i, h in enumerate(header)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+def command_ingest(store, options):
+    families = read_snapshot(options.file)
+    finished = options.finished or os.path.getmtime(options.file)
+    started = options.started or finished
+    run_id = store.save_run(options.suite, families, started, finished, {"snapshot": options.file})
+    print(f"Run {run_id} ({options.suite}) stored from {options.file}")
+
+
+def command_runs(store, options):
+    print_table(("run", "suite", "started", "duration_s", "group", "label", "commit"), [
+        (run_id, suite, format_time(started), f"{finished - started:.1f}", group or "-", label or "-", commit or "-")
+        for run_id, suite, started, finished, group, label, commit in store.runs(options.suite, options.last)
+    ])
+
+
+def command_trend(store, options):
+    rows = store.trend(options.metric, options.endpoint, options.labels, options.suite, options.last)
+    if options.json:
+        print(json.dumps([dict(zip(("run", "started", "suite", "endpoint", "labels", "value"), row))
+                          for row in rows], indent=2))
+        return
+    previous = {}
+    table = []
+    for run_id, started, suite, endpoint, labels, value in rows:
+        change = relative_change(previous.get((endpoint, labels)), value)
+        previous[(endpoint, labels)] = value
+        table.append((run_id, format_time(started), suite, endpoint or "-", labels or "-", format_value(value),
+                      "-" if change is None else f"{change:+.1%}"))
+    print_table(("run", "started", "suite", "endpoint", "labels", "value", "change"), table)
+
+
+def command_percentiles(store, options):
+    history = store.percentile_history(options.metric, options.endpoint, options.labels, options.suite,
+                                       options.last)
+    quantiles = sorted({q for values in history.values() for q in values})
+    if options.json:
+        print(json.dumps([
+            {"run": run_id, "started": started, "endpoint": endpoint, "labels": labels,
+             "quantiles": {str(q): v for q, v in values.items()}}
+            for (run_id, started, endpoint, labels), values in history.items()
+        ], indent=2))
+        return
+    print_table(("run", "started", "endpoint", "labels", *(f"p{q * 100:g}" for q in quantiles)), [
+        (run_id, format_time(started), endpoint or "-", labels or "-", *(format_value(values.get(q)) for q in quantiles))
+        for (run_id, started, endpoint, labels), values in history.items()
+    ])
+
+
+def command_diff(store, options):
+    run_b = options.run_b
+    if run_b is None:
+        latest = store.latest_runs(options.suite, 1)
+        if not latest:
+            sys.exit("No runs stored.")
+        run_b = latest[0]
+    run_a = options.run_a
+    if run_a is None:
+        # The run before run_b of the same suite
+        previous = store.db.execute(
+            "SELECT id FROM runs WHERE suite = ? AND (started, id) < (SELECT started, id FROM runs WHERE id = ?) "
+            "ORDER BY started DESC, id DESC LIMIT 1",
+            (store.run_suite(run_b), run_b),
+        ).fetchone()
+        if previous is None:
+            sys.exit(f"No run to compare run {run_b} with.")
+        run_a = previous[0]
+    rows = []
+    for metric, endpoint, labels, a, b in store.diff(run_a, run_b, options.metric):
+        change = relative_change(a, b)
+        if change is not None and abs(change) < options.min_change:
+            continue
+        rows.append((metric, endpoint, labels, a, b, change))
+    # Largest changes first, series present in only one run at the end
+    rows.sort(key=lambda row: (row[5] is None, -abs(row[5] or 0)))
+    if options.json:
+        print(json.dumps({"run_a": run_a, "run_b": run_b, "series": [
+            dict(zip(("metric", "endpoint", "labels", "a", "b", "change"), row)) for row in rows
+        ]}, indent=2))
+        return
+    print(f"Run {run_a} -> run {run_b}")
+    print_table(("metric", "endpoint", "labels", f"run {run_a}", f"run {run_b}", "change"), [
+        (metric, endpoint or "-", labels or "-", format_value(a), format_value(b),
+         "-" if change is None else f"{change:+.1%}")
+        for metric, endpoint, labels, a, b, change in rows
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local result store.")
+    parser.add_argument("--db", default=os.getenv("RESULT_STORE") or "results.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Store a metrics text snapshot as a run")
+    ingest.add_argument("suite")
+    ingest.add_argument("file")
+    ingest.add_argument("--started", type=float, help="Unix time (default: the file's mtime)")
+    ingest.add_argument("--finished", type=float, help="Unix time (default: the file's mtime)")
+    ingest.set_defaults(handler=command_ingest)
+
+    runs = commands.add_parser("runs", help="List stored runs, newest first")
+    runs.add_argument("--suite")
+    runs.add_argument("--last", type=int, default=20)
+    runs.set_defaults(handler=command_runs)
+
+    for name, handler, help_text in (
+        ("trend", command_trend, "Value of a counter/gauge across runs"),
+        ("percentiles", command_percentiles, "Percentile history of a histogram/summary across runs"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("metric")
+        command.add_argument("--endpoint", help="Request name (Locust) or page (browser suites)")
+        command.add_argument("--labels", help='Remaining labels exactly as stored, e.g. "instance=locust_jenkins"')
+        command.add_argument("--suite")
+        command.add_argument("--last", type=int, default=50)
+        command.add_argument("--json", action="store_true")
+        command.set_defaults(handler=handler)
+
+    diff = commands.add_parser("diff", help="Compare two runs (default: the latest run and the one before)")
+    diff.add_argument("run_a", type=int, nargs="?")
+    diff.add_argument("run_b", type=int, nargs="?")
+    diff.add_argument("--suite", help="Suite of the latest run when no runs are given")
+    diff.add_argument("--metric", help="Metric name prefix")
+    diff.add_argument("--min-change", type=float, default=0.0, help="Hide relative changes below this (0.05 = 5%%)")
+    diff.add_argument("--json", action="store_true")
+    diff.set_defaults(handler=command_diff)
+
+    options = parser.parse_args()
+    if options.command != "ingest" and not os.path.exists(options.db):
+        sys.exit(f"No result store at {options.db}")
+    store = ResultStore(options.db)
+    try:
+        options.handler(store, options)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
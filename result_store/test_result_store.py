@@ -0,0 +1,86 @@
+import pytest
+
+from result_store import ResultStore, bucket_quantile, flatten, read_snapshot, split_labels
+
+SNAPSHOT = """\
+# HELP locust_request_total Requests
+# TYPE locust_request_total counter
+locust_request_total{name="Login Page",method="GET",response_code="200"} 90.0
+locust_request_total{name="Login",method="POST",response_code="500"} 10.0
+# HELP locust_request_duration_seconds Durations
+# TYPE locust_request_duration_seconds histogram
+locust_request_duration_seconds_bucket{name="Login Page",le="0.1"} 50.0
+locust_request_duration_seconds_bucket{name="Login Page",le="0.2"} 90.0
+locust_request_duration_seconds_bucket{name="Login Page",le="+Inf"} 100.0
+locust_request_duration_seconds_count{name="Login Page"} 100.0
+locust_request_duration_seconds_sum{name="Login Page"} 12.5
+locust_request_duration_seconds_created{name="Login Page"} 1.7e9
+# HELP selenium_page_seconds Page durations
+# TYPE selenium_page_seconds summary
+selenium_page_seconds{page="login",quantile="0.5"} 0.8
+selenium_page_seconds{page="login",quantile="0.99"} 2.5
+selenium_page_seconds_count{page="login"} 40.0
+selenium_page_seconds_sum{page="login"} 36.0
+"""
+
+
+def families(tmp_path, text=SNAPSHOT):
+    path = tmp_path / "metrics.txt"
+    path.write_text(text, encoding="utf-8")
+    return read_snapshot(str(path))
+
+
+def test_split_labels_takes_the_endpoint_out():
+    assert split_labels({"name": "Login", "method": "POST", "instance": "w1"}) == ("Login", "instance=w1,method=POST")
+    assert split_labels({"page": "login"}) == ("login", "")
+    assert split_labels({"reason": "cpu"}) == ("", "reason=cpu")
+
+
+def test_bucket_quantile_interpolates_like_histogram_quantile():
+    buckets = [(0.2, 90.0), (0.1, 50.0), (float("inf"), 100.0)]
+    assert bucket_quantile(0.5, buckets) == pytest.approx(0.1)
+    assert bucket_quantile(0.25, buckets) == pytest.approx(0.05)
+    assert bucket_quantile(0.7, buckets) == pytest.approx(0.15)
+    # Quantiles in the +Inf bucket report the highest finite bound
+    assert bucket_quantile(0.95, buckets) == pytest.approx(0.2)
+    # Empty low buckets only move the lower bound of the interpolation
+    assert bucket_quantile(0.5, [(0.1, 0.0), (0.2, 0.0), (0.4, 10.0), (float("inf"), 10.0)]) == pytest.approx(0.3)
+    assert bucket_quantile(0.5, []) is None
+    assert bucket_quantile(0.5, [(0.1, 0.0), (float("inf"), 0.0)]) is None
+
+
+def test_flatten_keeps_values_and_percentiles(tmp_path):
+    values, percentiles = flatten(families(tmp_path))
+    assert values == {
+        ("locust_request_total", "Login Page", "method=GET,response_code=200"): 90.0,
+        ("locust_request_total", "Login", "method=POST,response_code=500"): 10.0,
+        ("locust_request_duration_seconds_count", "Login Page", ""): 100.0,
+        ("locust_request_duration_seconds_sum", "Login Page", ""): 12.5,
+        ("selenium_page_seconds_count", "login", ""): 40.0,
+        ("selenium_page_seconds_sum", "login", ""): 36.0,
+    }
+    assert percentiles[("selenium_page_seconds", "login", "", 0.99)] == 2.5
+    histogram = {q: v for (metric, _, _, q), v in percentiles.items() if metric == "locust_request_duration_seconds"}
+    assert histogram == pytest.approx({0.5: 0.1, 0.9: 0.2, 0.95: 0.2, 0.99: 0.2})
+
+
+def test_diff_pairs_the_series_of_two_runs(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    try:
+        run_a = store.save_run("locust", families(tmp_path), 1000.0, 1060.0)
+        changed = SNAPSHOT.replace('response_code="200"} 90.0', 'response_code="200"} 95.0')
+        changed = changed.replace('locust_request_total{name="Login",method="POST",response_code="500"} 10.0\n', "")
+        run_b = store.save_run("locust", families(tmp_path, changed), 2000.0, 2060.0)
+
+        rows = store.diff(run_a, run_b, prefix="locust_request_total")
+        assert rows == [
+            ("locust_request_total", "Login", "method=POST,response_code=500", 10.0, None),
+            ("locust_request_total", "Login Page", "method=GET,response_code=200", 90.0, 95.0),
+        ]
+        quantiles = {row[0]: row[3:] for row in store.diff(run_a, run_b, prefix="selenium_page_seconds")
+                     if "quantile" in row[0]}
+        assert quantiles == {"selenium_page_seconds{quantile=0.5}": (0.8, 0.8),
+                             "selenium_page_seconds{quantile=0.99}": (2.5, 2.5)}
+        assert store.latest_runs("locust") == [run_b, run_a]
+    finally:
+        store.close()
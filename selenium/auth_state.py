@@ -0,0 +1,61 @@
+"""
+auth_state.py
+Zapamiętany stan zalogowania (browser_common/auth_state_base.py) w Selenium:
+WebDriver nie zna storage state, więc cookies i localStorage zapisujemy i
+wczytujemy sami, w formacie Playwright.
+"""
+
+import json
+from auth_state_base import AuthStateBase
+
+# Wartości sameSite akceptowane przez WebDriver
+SAME_SITE_VALUES = ("Strict", "Lax", "None")
+
+
+class AuthState(AuthStateBase):
+    def save(self, driver):
+        """Zapisuje cookies i localStorage bieżącej strony (driver musi być zalogowany)."""
+        cookies = [{
+            "name": c["name"],
+            "value": c["value"],
+            "domain": c.get("domain", ""),
+            "path": c.get("path", "/"),
+            "expires": c.get("expiry", -1),
+            "httpOnly": c.get("httpOnly", False),
+            "secure": c.get("secure", False),
+            "sameSite": c.get("sameSite", "Lax"),
+        } for c in driver.get_cookies()]
+        origin = driver.execute_script("return window.location.origin")
+        local_storage = driver.execute_script("return Object.entries(window.localStorage)")
+        state = {
+            "cookies": cookies,
+            "origins": [{"origin": origin, "localStorage": [{"name": k, "value": v} for k, v in local_storage]}],
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def load(self, driver, url):
+        """
+        Otwiera `url` (cookies można ustawić tylko dla bieżącej domeny), ustawia cookies
+        i localStorage z pliku i zwraca liczbę ustawionych cookies.
+        """
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        driver.get(url)
+        for c in state.get("cookies", []):
+            # Bez "domain": cookie trafia do bieżącego hosta, niezależnie od zapisu ".domena" / "domena"
+            cookie = {"name": c["name"], "value": c["value"], "path": c.get("path", "/"),
+                      "httpOnly": c.get("httpOnly", False), "secure": c.get("secure", False)}
+            if c.get("expires", -1) > 0:
+                cookie["expiry"] = int(c["expires"])
+            if c.get("sameSite") in SAME_SITE_VALUES:
+                cookie["sameSite"] = c["sameSite"]
+            driver.add_cookie(cookie)
+        origin = driver.execute_script("return window.location.origin")
+        for entry in state.get("origins", []):
+            if entry.get("origin") != origin:
+                continue
+            for item in entry.get("localStorage", []):
+                driver.execute_script("window.localStorage.setItem(arguments[0], arguments[1]);",
+                                      item["name"], item["value"])
+        return len(state.get("cookies", []))
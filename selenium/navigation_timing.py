@@ -0,0 +1,23 @@
+"""
+navigation_timing.py
+Odczyt metryk przeglądarki (browser_common/navigation_timing_base.py) przez WebDriver.
+
+collect() zwraca listę próbek zamiast obserwować je od razu, żeby procesy puli
+WebDriverów mogły odesłać je do procesu głównego (observe_samples()).
+"""
+
+from navigation_timing_base import TIMING_JS, NavigationTimingBase
+
+# execute_async_script przekazuje callback jako ostatni argument
+SELENIUM_TIMING_JS = "const done = arguments[arguments.length - 1]; (" + TIMING_JS + ")().then(done);"
+
+
+class NavigationTimingMetrics(NavigationTimingBase):
+    def collect(self, driver, page):
+        """Próbki (rodzaj, etykiety, sekundy) dla bieżącej strony."""
+        # Brak metryk (np. strona w trakcie nawigacji) nie jest błędem testu
+        try:
+            timing = driver.execute_async_script(SELENIUM_TIMING_JS)
+        except Exception:
+            return []
+        return self.timing_samples(timing, page)
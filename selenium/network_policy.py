@@ -0,0 +1,112 @@
+"""
+network_policy.py
+Podpięcie wspólnej polityki ruchu sieciowego (browser_common/network_policy_base.py)
+pod WebDriver Selenium.
+
+Samo blokowanie typów/wzorców działa przez CDP (Network.setBlockedURLs) bez dodatkowych
+zależności. Blokowanie hostów zewnętrznych i HAR wymagają przechwytywania żądań,
+czyli pakietu selenium-wire (pip install selenium-wire).
+"""
+
+import json
+import base64
+from selenium import webdriver
+from network_policy_base import NetworkPolicyBase
+
+# Typy zasobów (nazwy jak w Playwright) -> wzorce URL dla CDP Network.setBlockedURLs
+RESOURCE_TYPE_PATTERNS = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "stylesheet": ["*.css*"],
+    "script": ["*.js*"],
+    "media": ["*.mp4*", "*.webm*", "*.mp3*", "*.ogg*"],
+}
+# Typy zasobów -> wartości nagłówka Sec-Fetch-Dest (tryb selenium-wire)
+RESOURCE_TYPE_DESTS = {
+    "image": {"image"},
+    "font": {"font"},
+    "stylesheet": {"style"},
+    "script": {"script"},
+    "media": {"video", "audio", "track"},
+}
+# Nagłówki, których nie odtwarzamy – treść z HAR jest już zdekodowana
+SKIPPED_REPLAY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def load_har_responses(har_file):
+    """(method, url) -> (status, headers, body) z pliku HAR (ostatni wpis wygrywa)."""
+    with open(har_file, encoding="utf-8") as f:
+        har = json.load(f)
+    responses = {}
+    for entry in har["log"]["entries"]:
+        request, response = entry["request"], entry["response"]
+        content = response.get("content", {})
+        text = content.get("text") or ""
+        body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+        headers = [(h["name"], h["value"]) for h in response.get("headers", [])
+                   if h["name"].lower() not in SKIPPED_REPLAY_HEADERS]
+        responses[(request["method"], request["url"])] = (response["status"], headers, body)
+    return responses
+
+
+class NetworkPolicy(NetworkPolicyBase):
+    default_har_file = "selenium.har"
+
+    def __init__(self, first_party_url, **kwargs):
+        super().__init__(first_party_url, **kwargs)
+        self._blocked_dests = set()
+        for t in self.block_types:
+            self._blocked_dests |= RESOURCE_TYPE_DESTS.get(t, set())
+        self._replay = load_har_responses(self.har_file) if self.har_mode == "replay" else None
+
+    @property
+    def needs_interceptor(self):
+        return self.har_mode != "off" or self.block_third_party
+
+    def cdp_blocked_urls(self):
+        urls = list(self.block_patterns)
+        for t in self.block_types:
+            urls.extend(RESOURCE_TYPE_PATTERNS.get(t, []))
+        return urls
+
+    def blocks_type(self, fetch_dest):
+        # selenium-wire nie zna typu zasobu – porównujemy nagłówek Sec-Fetch-Dest
+        return fetch_dest in self._blocked_dests
+
+    def create_driver(self, chrome_options):
+        if not self.needs_interceptor:
+            driver = webdriver.Chrome(options=chrome_options)
+            blocked = self.cdp_blocked_urls()
+            if blocked:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked})
+            return driver
+        try:
+            from seleniumwire import webdriver as wire_webdriver
+        except ImportError:
+            raise RuntimeError("HAR_MODE / BLOCK_THIRD_PARTY require selenium-wire: pip install selenium-wire")
+        driver = wire_webdriver.Chrome(
+            options=chrome_options,
+            seleniumwire_options={"enable_har": self.har_mode == "record"}
+        )
+        driver.request_interceptor = self._intercept
+        return driver
+
+    def _intercept(self, request):
+        if self.should_block(request.url, request.headers.get("Sec-Fetch-Dest")):
+            request.abort()
+            return
+        if self._replay is not None:
+            recorded = self._replay.get((request.method, request.url))
+            if recorded is None:
+                request.abort()
+            else:
+                status, headers, body = recorded
+                request.create_response(status_code=status, headers=headers, body=body)
+
+    def save_har(self, driver):
+        if self.har_mode != "record":
+            return
+        with open(self.har_file, "w", encoding="utf-8") as f:
+            f.write(driver.har)
+        print(f"[INFO] HAR recorded to: {self.har_file}")
@@ -11,19 +11,50 @@ Skrypt Selenium, który:
 Testy wykonują się przy użyciu Selenium – symulując logowanie pozytywne (dla poprawnych danych)
 oraz negatywne (dla błędnych danych). Metryki (sukcesy, porażki, "performance issues") są aktualizowane
 na bieżąco.
+
+Z --workers N iteracje są rozdzielane na pulę N procesów, z których każdy trzyma
+własny, "ciepły" WebDriver przez cały przebieg. Procesy zwracają liczniki i komunikaty
+błędów do procesu głównego, który scala je w `registry` przed eksportem.
+
+W długich przebiegach driver może być restartowany po N iteracjach lub po przekroczeniu
+progu RSS przeglądarki (recycling.py), a z AUTH_STATE=1 iteracje zaczynają od
+zapamiętanej sesji zamiast formularza (auth_state.py).
+
+Z PROFILE=1 profiler próbkujący (sampling_profiler.py) pokazuje, gdzie skrypt spędza
+czas (iteracja, komendy WebDrivera, metryki); procesy puli oddają próbki razem z
+wynikami porcji.
+
+Z RESULT_STORE=<ścieżka> końcowe metryki i ustawienia przebiegu trafiają do lokalnej
+bazy SQLite (result_store/result_store.py), z której CLI liczy trendy i porównania.
 """
 
 import os
 import time
 import sys
+import math
 import argparse
-from selenium import webdriver
+import multiprocessing
+from multiprocessing import util as mp_util
+from multiprocessing.pool import IMapIterator
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.remote.remote_connection import RemoteConnection
 from prometheus_client import CollectorRegistry, Counter, generate_latest
 from colorama import init
+# Moduły wspólne dla obu suit przeglądarkowych; w katalogu suity są tylko adaptery
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "browser_common"))
+from network_policy import NetworkPolicy
+from navigation_timing import NavigationTimingMetrics
+from saturation_monitor import SaturationMonitor
+from recycling import RecyclePolicy, REASONS as RECYCLE_REASONS
+from auth_state import AuthState
+from sampling_profiler import SamplingProfiler
+
+# Magazyn wyników wspólny dla wszystkich suit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "result_store"))
+from result_store import record_run
 
 # Inicjalizacja colorama
 init(autoreset=True)
@@ -34,6 +65,10 @@ parser.add_argument("--export-metrics", action="store_true",
                     help="Export metrics to a file instead of pushing them directly.")
 parser.add_argument("--metrics-file", type=str, default="selenium_metrics.txt",
                     help="Name of the file where metrics will be saved (if --export-metrics is used).")
+parser.add_argument("--workers", type=int, default=int(os.getenv("SELENIUM_WORKERS", 1)),
+                    help="Number of worker processes, each with its own WebDriver (1 = run in this process).")
+parser.add_argument("--prewarm", action="store_true",
+                    help="Load the login page once in every worker before the timed iterations.")
 args = parser.parse_args()
 
 # --- Konfiguracja z ENV ---
@@ -41,6 +76,27 @@ NUM_TESTS = int(os.getenv("NUM_TESTS", 1))
 LOGIN = os.getenv("LOGIN", "student")
 PASSWORD = os.getenv("PASSWORD", "Password123")
 PUSHGATEWAY_ADDRESS = os.getenv("PUSHGATEWAY_ADDRESS", "localhost:9091")
+# Lokalna baza SQLite z historią przebiegów (pusta = wyłączona, patrz result_store.py)
+RESULT_STORE = os.getenv("RESULT_STORE", "")
+# Adres testowanej strony, wspólny dla wszystkich suit (np. lokalny target_server)
+TARGET_BASE_URL = os.getenv("TARGET_BASE_URL", "https://practicetestautomation.com").rstrip("/")
+LOGIN_URL = f"{TARGET_BASE_URL}/practice-test-login/"
+SUCCESS_URL = f"{TARGET_BASE_URL}/logged-in-successfully/"
+# Ile porcji iteracji przypada na jednego workera (mniejsze porcje = lepsze wyrównanie obciążenia)
+CHUNKS_PER_WORKER = 4
+# Blokowanie zasobów / HAR (patrz network_policy.py)
+NETWORK_POLICY = NetworkPolicy.from_env(LOGIN_URL)
+# Nowy driver po N iteracjach lub po przekroczeniu RSS przeglądarki (patrz recycling.py)
+RECYCLE = RecyclePolicy.from_env()
+if RECYCLE.enabled and NETWORK_POLICY.har_mode == "record":
+    # HAR zapisywany jest z ostatniego drivera – recykling zgubiłby wcześniejsze wpisy
+    print("[INFO] HAR_MODE=record: driver recycling disabled.")
+    RECYCLE = RecyclePolicy()
+# Zapamiętana sesja zamiast formularza (patrz auth_state.py)
+AUTH_STATE = AuthState.from_env()
+if AUTH_STATE.enabled and not (LOGIN == "student" and PASSWORD == "Password123"):
+    print("[WARN] AUTH_STATE applies to the positive scenario only; logging in with the form.")
+    AUTH_STATE.enabled = False
 
 # --- Prometheus registry i definicje liczników ---
 registry = CollectorRegistry()
@@ -64,30 +120,96 @@ PERFORMANCE_NEGATIVE_COUNTER = Counter(
     "Total number of negative tests that unexpectedly passed or had very short duration",
     registry=registry
 )
+# Fazy nawigacji mierzone w przeglądarce (DNS, connect, TTFB, DOM complete, FCP/LCP)
+NAVIGATION_TIMING = NavigationTimingMetrics(registry, "selenium")
+# Nasycenie maszyny testującej (CPU/RSS przeglądarek i workerów, rdzenie, deskryptory), próbkowane w tle
+SATURATION = SaturationMonitor("selenium", interval=int(os.getenv("MONITOR_INTERVAL_MS", 250)) / 1000)
+registry.register(SATURATION)
+DRIVER_RECYCLE_COUNTER = Counter(
+    "selenium_driver_recycles_total",
+    "WebDrivers restarted by the recycling policy",
+    ["reason"],
+    registry=registry
+)
+# Profiler próbkujący: gdzie wątek główny spędza czas (patrz sampling_profiler.py)
+PROFILER = SamplingProfiler.from_env("selenium")
+if PROFILER.enabled:
+    registry.register(PROFILER)
+
+
+def new_counts():
+    counts = {"success": 0, "failure": 0, "positive_perf": 0, "negative_perf": 0}
+    counts.update({f"recycle_{reason}": 0 for reason in RECYCLE_REASONS})
+    return counts
+
+
+def apply_counts(counts):
+    """Przenosi zliczone wyniki do liczników Prometheusa (w procesie głównym)."""
+    TEST_SUCCESS_COUNTER.inc(counts["success"])
+    TEST_FAILURE_COUNTER.inc(counts["failure"])
+    PERFORMANCE_POSITIVE_COUNTER.inc(counts["positive_perf"])
+    PERFORMANCE_NEGATIVE_COUNTER.inc(counts["negative_perf"])
+    for reason in RECYCLE_REASONS:
+        DRIVER_RECYCLE_COUNTER.labels(reason=reason).inc(counts[f"recycle_{reason}"])
+
+
+def run_authenticated_iteration(driver, i, counts, failures, timing_samples):
+    """Scenariusz po logowaniu: driver ma już zapamiętaną sesję, formularz jest pomijany."""
+    iteration_start = time.time() * 1000
+    try:
+        driver.get(SUCCESS_URL)
+        duration = time.time() * 1000 - iteration_start
+        if "logged-in-successfully" not in driver.current_url:
+            counts["failure"] += 1
+            failures.append(f"Iteration {i + 1}: Session not authenticated, got: {driver.current_url}")
+            return
+        timing_samples.extend(NAVIGATION_TIMING.collect(driver, "logged_in"))
+        page_source = driver.page_source
+        if "Logged In Successfully" in page_source or "Congratulations" in page_source:
+            # Bez wylogowania – unieważniłoby zapamiętaną sesję
+            counts["success"] += 1
+        else:
+            counts["failure"] += 1
+            failures.append(f"Iteration {i + 1}: Missing success message.")
+        if duration > 4000:
+            counts["positive_perf"] += 1
+    except Exception as e:
+        counts["failure"] += 1
+        failures.append(f"Iteration {i + 1}: Exception: {e}")
 
 
-def run_login_test(driver):
+def run_login_test(session, iterations=NUM_TESTS, first_iteration=0):
     """
-    Wykonuje test logowania NUM_TESTS razy przy użyciu Selenium.
+    Wykonuje test logowania `iterations` razy przy użyciu Selenium (driver z `session`,
+    restartowany przez politykę recyklingu).
     W scenariuszu pozytywnym (poprawne dane) sprawdzamy obecność określonych komunikatów
     i przycisku "Log out". W scenariuszu negatywnym (błędne dane) oczekujemy komunikatu o błędzie.
-    Aktualizujemy liczniki sukcesów, porażek oraz "performance issues".
+    Zwraca zliczone sukcesy, porażki oraz "performance issues" (bez dotykania liczników),
+    listę błędów, czas trwania i próbki metryk nawigacji – dzięki temu ta sama funkcja
+    działa w procesach puli.
     """
-    # Główny, dłuższy wait (np. do 10s) – w razie wolniejszych odpowiedzi
-    wait = WebDriverWait(driver, 10)
-    # Krótszy wait (np. do 2s) – zamiast time.sleep(2)
-    short_wait = WebDriverWait(driver, 2)
-
-    positive_perf_issues = 0
-    negative_perf_issues = 0
+    counts = new_counts()
     failures = []
+    timing_samples = []
     overall_start = time.time() * 1000  # ms
 
-    for i in range(NUM_TESTS):
+    for i in range(first_iteration, first_iteration + iterations):
+        driver = session.next_iteration(counts)
+        if AUTH_STATE.enabled:
+            run_authenticated_iteration(driver, i, counts, failures, timing_samples)
+            continue
+        # Główny, dłuższy wait (np. do 10s) – w razie wolniejszych odpowiedzi
+        wait = WebDriverWait(driver, 10)
+        # Krótszy wait (np. do 2s) – zamiast time.sleep(2)
+        short_wait = WebDriverWait(driver, 2)
         iteration_start = time.time() * 1000
         try:
-            driver.get("https://practicetestautomation.com/practice-test-login/")
+            driver.get(LOGIN_URL)
             wait.until(EC.presence_of_element_located((By.ID, "username")))
+            # Odczyt metryk przeglądarki nie wlicza się do czasu iteracji
+            timing_start = time.time() * 1000
+            timing_samples.extend(NAVIGATION_TIMING.collect(driver, "login"))
+            iteration_start += time.time() * 1000 - timing_start
 
             # Wpisywanie danych do formularza
             driver.find_element(By.ID, "username").clear()
@@ -115,12 +237,15 @@ def run_login_test(driver):
             # --- SCENARIUSZ POZYTYWNY ---
             if LOGIN == "student" and PASSWORD == "Password123":
                 if "logged-in-successfully" not in current_url:
-                    TEST_FAILURE_COUNTER.inc()
+                    counts["failure"] += 1
                     failures.append(f"Iteration {i + 1}: Expected success URL, got: {current_url}")
                 else:
+                    timing_start = time.time() * 1000
+                    timing_samples.extend(NAVIGATION_TIMING.collect(driver, "logged_in"))
+                    iteration_start += time.time() * 1000 - timing_start
                     page_source = driver.page_source
                     if not ("Logged In Successfully" in page_source or "Congratulations" in page_source):
-                        TEST_FAILURE_COUNTER.inc()
+                        counts["failure"] += 1
                         failures.append(f"Iteration {i + 1}: Missing success message.")
                     else:
                         # Próbujemy znaleźć przycisk "Log out"
@@ -137,28 +262,28 @@ def run_login_test(driver):
                                     pass
 
                                 if "practice-test-login" not in driver.current_url:
-                                    TEST_FAILURE_COUNTER.inc()
+                                    counts["failure"] += 1
                                     failures.append(
                                         f"Iteration {i + 1}: Failed to return to login page after logout."
                                     )
                                 else:
-                                    TEST_SUCCESS_COUNTER.inc()
+                                    counts["success"] += 1
                             else:
-                                TEST_FAILURE_COUNTER.inc()
+                                counts["failure"] += 1
                                 failures.append(f"Iteration {i + 1}: 'Log out' button not visible.")
                         except Exception as e:
-                            TEST_FAILURE_COUNTER.inc()
+                            counts["failure"] += 1
                             failures.append(f"Iteration {i + 1}: Exception while clicking logout button: {e}")
 
                 # Sprawdzenie czasu wykonania
                 duration = time.time() * 1000 - iteration_start
                 if duration > 4000:
-                    positive_perf_issues += 1
+                    counts["positive_perf"] += 1
 
             # --- SCENARIUSZ NEGATYWNY ---
             else:
                 if "logged-in-successfully" in current_url:
-                    TEST_FAILURE_COUNTER.inc()
+                    counts["failure"] += 1
                     failures.append(f"Iteration {i + 1}: Unexpected login with invalid credentials.")
                     # Spróbuj się wylogować, jeśli przycisk się pojawi
                     try:
@@ -181,41 +306,190 @@ def run_login_test(driver):
                         "Your username is invalid!" in error_text or
                         "Your password is invalid!" in error_text
                     ):
-                        TEST_SUCCESS_COUNTER.inc()
+                        counts["success"] += 1
                     else:
-                        TEST_FAILURE_COUNTER.inc()
+                        counts["failure"] += 1
                         failures.append(f"Iteration {i + 1}: Unexpected error message: {error_text}")
 
                 # Sprawdzenie czasu wykonania
                 duration = time.time() * 1000 - iteration_start
                 if duration < 1000:
-                    negative_perf_issues += 1
+                    counts["negative_perf"] += 1
 
         except Exception as e:
-            TEST_FAILURE_COUNTER.inc()
+            counts["failure"] += 1
             failures.append(f"Iteration {i + 1}: Exception: {e}")
 
-    # Zliczanie „performance issues”
-    PERFORMANCE_POSITIVE_COUNTER.inc(positive_perf_issues)
-    PERFORMANCE_NEGATIVE_COUNTER.inc(negative_perf_issues)
-
     overall_duration = time.time() * 1000 - overall_start
-    return failures, overall_duration
+    return counts, failures, overall_duration, timing_samples
 
 
-def main():
+def create_driver():
     chrome_options = Options()
     # Dodatkowe argumenty dla uruchomienia w trybie headless
     chrome_options.add_argument("--headless")  # Można użyć "--headless=new" (dla Chrome 109+)
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--disable-dev-shm-usage")  # uniknięcie małej partycji /dev/shm
     chrome_options.add_argument("--no-sandbox")  # wyłącza sandbox, wymagane w niektórych środowiskach
+    return NETWORK_POLICY.create_driver(chrome_options)
 
-    driver = webdriver.Chrome(options=chrome_options)
+
+def prewarm_driver(driver):
+    # Pierwsze wejście na stronę (DNS, TLS, cache) poza mierzonymi iteracjami
     try:
-        failures, overall_duration = run_login_test(driver)
+        driver.get(LOGIN_URL)
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "username")))
+    except Exception as e:
+        print(f"[WARN] Pre-warm failed: {e}")
+
+
+def ensure_auth_state():
+    """Loguje się formularzem (bez wylogowania) i zapisuje stan sesji, jeśli plik jest nieaktualny."""
+    if AUTH_STATE.fresh():
+        return
+    driver = create_driver()
+    try:
+        wait = WebDriverWait(driver, 10)
+        driver.get(LOGIN_URL)
+        wait.until(EC.presence_of_element_located((By.ID, "username")))
+        driver.find_element(By.ID, "username").send_keys(LOGIN)
+        driver.find_element(By.ID, "password").send_keys(PASSWORD)
+        driver.find_element(By.ID, "submit").click()
+        wait.until(EC.url_contains("logged-in-successfully"))
+        AUTH_STATE.save(driver)
     finally:
         driver.quit()
+    print(f"[INFO] Auth state saved to {AUTH_STATE.path}")
+
+
+class DriverSession:
+    """
+    WebDriver z polityką recyklingu: przed iteracją sprawdzamy RECYCLE i w razie potrzeby
+    zamykamy przeglądarkę i tworzymy nową (z zapamiętaną sesją albo pre-warmem).
+    """
+
+    def __init__(self, prewarm=False):
+        self.prewarm = prewarm
+        self.driver = None
+        self.iterations = 0
+        self.start()
+
+    def start(self):
+        self.driver = create_driver()
+        self.iterations = 0
+        if AUTH_STATE.enabled:
+            # Wczytanie sesji otwiera stronę logowania, więc działa też jak pre-warm
+            AUTH_STATE.load(self.driver, LOGIN_URL)
+        elif self.prewarm:
+            prewarm_driver(self.driver)
+
+    def next_iteration(self, counts):
+        reason = RECYCLE.check(self.iterations) if self.iterations else None
+        if reason:
+            counts[f"recycle_{reason}"] += 1
+            self.quit()
+            self.start()
+        self.iterations += 1
+        return self.driver
+
+    def quit(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+
+# --- Pula procesów: każdy proces ma jeden WebDriver (restartowany przez recykling) ---
+_pool_session = None
+
+
+def pool_worker_init(prewarm):
+    global _pool_session
+    if PROFILER.enabled:
+        PROFILER.reset()
+        PROFILER.start()
+    _pool_session = DriverSession(prewarm)
+    # Zamknięcie przeglądarki przy normalnym wyjściu procesu z puli (pool.close() + join())
+    mp_util.Finalize(None, _pool_session.quit, exitpriority=10)
+
+
+def pool_run_chunk(chunk):
+    first_iteration, iterations = chunk
+    result = run_login_test(_pool_session, iterations, first_iteration)
+    # Próbki profilu od poprzedniej porcji wracają do procesu głównego razem z wynikami
+    profile = (f"worker-{os.getpid()}", PROFILER.take_report()) if PROFILER.enabled else None
+    return result + (profile,)
+
+
+def split_iterations(total, chunk_count):
+    chunk_size = max(1, math.ceil(total / chunk_count))
+    return [(start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+
+
+def run_login_test_pool(workers, prewarm):
+    """
+    Rozdziela NUM_TESTS iteracji na porcje wykonywane przez pulę `workers` procesów.
+    Zwraca scalone liczniki, błędy (w kolejności iteracji), całkowity czas i próbki metryk nawigacji.
+    """
+    overall_start = time.time() * 1000
+    counts = new_counts()
+    failures = []
+    timing_samples = []
+    chunks = split_iterations(NUM_TESTS, workers * CHUNKS_PER_WORKER)
+    pool = multiprocessing.Pool(processes=workers, initializer=pool_worker_init, initargs=(prewarm,))
+    try:
+        for chunk_counts, chunk_failures, _, chunk_samples, chunk_profile in pool.imap(pool_run_chunk, chunks):
+            for key, value in chunk_counts.items():
+                counts[key] += value
+            failures.extend(chunk_failures)
+            timing_samples.extend(chunk_samples)
+            if chunk_profile:
+                worker, report = chunk_profile
+                PROFILER.merge_report(report, worker)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return counts, failures, time.time() * 1000 - overall_start, timing_samples
+
+
+# Kategorie profilu (proces główny i procesy puli)
+PROFILER.label("iteration", run_login_test, run_authenticated_iteration)
+PROFILER.label("driver_start", DriverSession.start, DriverSession.quit)
+PROFILER.label("auth", ensure_auth_state)
+PROFILER.label("timing", NavigationTimingMetrics.collect)
+PROFILER.label("webdriver", RemoteConnection.execute)
+PROFILER.label("pool_wait", IMapIterator.next)
+
+
+def main():
+    workers = max(1, min(args.workers, NUM_TESTS))
+    if workers > 1 and NETWORK_POLICY.har_mode == "record":
+        # Jeden plik HAR = jedna przeglądarka; nagrywamy przebieg jednoprocesowy
+        print("[INFO] HAR_MODE=record: running with a single worker.")
+        workers = 1
+    started = time.time()
+    SATURATION.start()
+    if PROFILER.enabled:
+        PROFILER.start()
+    try:
+        if AUTH_STATE.enabled:
+            ensure_auth_state()
+        if workers > 1:
+            counts, failures, overall_duration, timing_samples = run_login_test_pool(workers, args.prewarm)
+        else:
+            session = DriverSession(args.prewarm)
+            try:
+                counts, failures, overall_duration, timing_samples = run_login_test(session)
+                NETWORK_POLICY.save_har(session.driver)
+            finally:
+                session.quit()
+    finally:
+        SATURATION.stop()
+        PROFILER.stop()
+    apply_counts(counts)
+    NAVIGATION_TIMING.observe_samples(timing_samples)
 
     # Eksport metryk do pliku, jeśli użyto --export-metrics
     if args.export_metrics:
@@ -233,6 +507,16 @@ def main():
             print(" -", fail)
 
     print(f"[INFO] Overall test duration: {overall_duration:.2f} ms")
+    if overall_duration > 0:
+        print(f"[INFO] Throughput: {NUM_TESTS / (overall_duration / 1000):.2f} iterations/s ({workers} worker(s))")
+    SATURATION.print_summary()
+    if PROFILER.enabled:
+        PROFILER.write_collapsed()
+        PROFILER.print_summary()
+        print(f"[INFO] Profile (collapsed stacks) saved to: {PROFILER.path}")
+    if RESULT_STORE:
+        record_run(RESULT_STORE, "selenium", registry.collect(), started,
+                   metadata={"workers": workers, "iterations": NUM_TESTS})
     sys.exit(0)
 
 
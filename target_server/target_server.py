@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+target_server.py
+Local stand-in for practicetestautomation.com, for offline benchmarking.
+
+Reproduces what the suites touch:
+  GET  /practice-test-login/      login form (#username, #password, #submit)
+  POST /practice-test-login/      credentials check; success -> 303 to
+                                  /logged-in-successfully/ with a session cookie,
+                                  failure -> form with #error
+                                  ("Your username is invalid!" / "Your password is invalid!")
+  GET  /logged-in-successfully/   "Logged In Successfully" page with a "Log out" link
+  GET  /logout/                   clears the session, 302 back to the login page
+
+Plain asyncio protocol (HTTP/1.1 keep-alive and pipelining, no framework);
+pages are pre-rendered once, so a process serves tens of thousands of
+requests per second. uvloop is used when installed.
+
+Usage:
+  python target_server/target_server.py --port 8080 --processes 0 \\
+      --latency lognormal:20:0.5 --error-rate 0.01
+
+Point the suites at it with TARGET_BASE_URL=http://127.0.0.1:8080
+
+Latency distributions (milliseconds, added before each response):
+  none | fixed:MS | uniform:MIN:MAX | exponential:MEAN | lognormal:MEDIAN:SIGMA
+"""
+
+import os
+import sys
+import math
+import random
+import signal
+import socket
+import asyncio
+import argparse
+import secrets
+import multiprocessing
+from collections import deque
+from urllib.parse import parse_qs
+
+USERNAME = "student"
+PASSWORD = "Password123"
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="UTF-8"><title>{title}</title></head>
+<body><section id="login"><div class="post-content">{content}</div></section></body></html>"""
+
+LOGIN_FORM = """<h2>Test login</h2>
+<form method="post" action="/practice-test-login/">
+<div id="form">
+  <label for="username">Username</label><input type="text" name="username" id="username">
+  <label for="password">Password</label><input type="password" name="password" id="password">
+  <button id="submit" type="submit" class="btn">Submit</button>
+</div>
+{error}
+</form>"""
+
+SUCCESS_CONTENT = """<h1 class="post-title">Logged In Successfully</h1>
+<p><strong>Congratulations student. You successfully logged in!</strong></p>
+<a href="/logout/" class="wp-block-button__link">Log out</a>"""
+
+STATUS_TEXT = {200: "OK", 302: "Found", 303: "See Other", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+               502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def render(title, content):
+    return PAGE_TEMPLATE.format(title=title, content=content).encode("utf-8")
+
+
+def response(status, body=b"", headers=(), keep_alive=True):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Status')}",
+             "Server: target-server",
+             f"Content-Length: {len(body)}"]
+    if body:
+        lines.append("Content-Type: text/html; charset=UTF-8")
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    if not keep_alive:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def parse_latency(spec):
+    """Latency spec -> callable returning a delay in seconds (None for no delay)."""
+    kind, *params = spec.split(":")
+    values = [float(p) / 1000 for p in params]
+    if kind == "none":
+        return None
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda: random.expovariate(1.0 / values[0])
+    if kind == "lognormal" and len(params) == 2:
+        mu, sigma = math.log(values[0]), float(params[1])
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+class Site:
+    """Pre-rendered responses; sessions are random tokens, nothing is stored per user."""
+
+    def __init__(self, username=USERNAME, password=PASSWORD, latency=None,
+                 error_rate=0.0, error_status=503, drop_rate=0.0):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.login_page = render("Test Login", LOGIN_FORM.format(error=""))
+        self.success_page = render("Logged In Successfully", SUCCESS_CONTENT)
+        self.error_pages = {
+            field: render("Test Login", LOGIN_FORM.format(
+                error=f'<div id="error" class="show">Your {field} is invalid!</div>'))
+            for field in ("username", "password")
+        }
+        self.error_body = render("Error", f"<h1>{error_status} {STATUS_TEXT.get(error_status, '')}</h1>")
+        self.not_found = render("Not Found", "<h1>Page not found</h1>")
+
+    def handle(self, method, path, headers, body, keep_alive):
+        """Response bytes, or None to drop the connection (error injection)."""
+        if self.drop_rate and random.random() < self.drop_rate:
+            return None
+        if self.error_rate and random.random() < self.error_rate:
+            return response(self.error_status, self.error_body, keep_alive=keep_alive)
+        path = path.split("?", 1)[0]
+        if not path.endswith("/"):
+            path += "/"
+        if path in ("/", "/practice-test-login/"):
+            if method == "POST":
+                return self._login(body, keep_alive)
+            if method in ("GET", "HEAD"):
+                return response(200, self.login_page, keep_alive=keep_alive)
+            return response(405, keep_alive=keep_alive)
+        if path == "/logged-in-successfully/":
+            # The real page is static too: it renders without a session
+            return response(200, self.success_page, keep_alive=keep_alive)
+        if path == "/logout/":
+            return response(302, headers=(("Location", "/practice-test-login/"),
+                                          ("Set-Cookie", "session=; Path=/; Max-Age=0")),
+                            keep_alive=keep_alive)
+        return response(404, self.not_found, keep_alive=keep_alive)
+
+    def _login(self, body, keep_alive):
+        form = parse_qs(body.decode("utf-8", "replace"))
+        username = form.get("username", [""])[0]
+        password = form.get("password", [""])[0]
+        if username != self.username:
+            return response(200, self.error_pages["username"], keep_alive=keep_alive)
+        if password != self.password:
+            return response(200, self.error_pages["password"], keep_alive=keep_alive)
+        token = secrets.token_hex(16)
+        return response(303, headers=(("Location", "/logged-in-successfully/"),
+                                      ("Set-Cookie", f"session={token}; Path=/; HttpOnly")),
+                        keep_alive=keep_alive)
+
+
+class HttpProtocol(asyncio.Protocol):
+    """
+    Minimal HTTP/1.1 server side. Responses to pipelined requests are written
+    in request order; with a latency distribution a response waits at least
+    until the one before it was written (head-of-line, like a real server).
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self.loop = asyncio.get_running_loop()
+        self.transport = None
+        self.buffer = bytearray()
+        self.queue = deque()
+        self.last_when = 0.0
+        self.timer = None
+        self.closing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.queue.clear()
+        self.closing = True
+
+    def data_received(self, data):
+        self.buffer += data
+        while not self.closing:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    self._send(response(400, keep_alive=False), close=True)
+                return
+            lines = bytes(self.buffer[:end]).decode("latin-1").split("\r\n")
+            try:
+                method, path, version = lines[0].split(" ", 2)
+            except ValueError:
+                self._send(response(400, keep_alive=False), close=True)
+                return
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_BODY_BYTES or "chunked" in headers.get("transfer-encoding", ""):
+                self._send(response(413, keep_alive=False), close=True)
+                return
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = bytes(self.buffer[end + 4:end + 4 + length])
+            del self.buffer[:end + 4 + length]
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+            data = self.site.handle(method, path, headers, body, keep_alive)
+            if data is None:
+                self.transport.abort()
+                self.closing = True
+                return
+            if method == "HEAD":
+                data = data[:data.find(b"\r\n\r\n") + 4]
+            self._send(data, close=not keep_alive)
+
+    def _send(self, data, close=False):
+        if close:
+            self.closing = True
+        delay = self.site.latency() if self.site.latency else 0.0
+        if delay <= 0 and not self.queue:
+            self._write(data, close)
+            return
+        when = max(self.loop.time() + delay, self.last_when)
+        self.last_when = when
+        self.queue.append((when, data, close))
+        if self.timer is None:
+            self.timer = self.loop.call_at(when, self._flush_queue)
+
+    def _flush_queue(self):
+        self.timer = None
+        now = self.loop.time()
+        while self.queue and self.queue[0][0] <= now:
+            _, data, close = self.queue.popleft()
+            self._write(data, close)
+        if self.queue:
+            self.timer = self.loop.call_at(self.queue[0][0], self._flush_queue)
+
+    def _write(self, data, close):
+        if self.transport.is_closing():
+            return
+        self.transport.write(data)
+        if close:
+            self.transport.close()
+
+
+def new_event_loop():
+    try:
+        import uvloop
+        return uvloop.new_event_loop()
+    except ImportError:
+        return asyncio.new_event_loop()
+
+
+def serve(host, port, site, reuse_port=False):
+    loop = new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(loop.create_server(
+        lambda: HttpProtocol(site), host, port, reuse_port=reuse_port or None, backlog=4096))
+    try:
+        loop.run_until_complete(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.close()
+
+
+def serve_worker(host, port, options):
+    # Every process gets its own random stream for latency/error injection
+    random.seed()
+    serve(host, port, build_site(options), reuse_port=True)
+
+
+def build_site(options):
+    return Site(options.username, options.password, parse_latency(options.latency),
+                options.error_rate, options.error_status, options.drop_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the practice login site.")
+    parser.add_argument("--host", default=os.getenv("TARGET_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("TARGET_PORT", 8080)))
+    parser.add_argument("--processes", type=int, default=int(os.getenv("TARGET_PROCESSES", 1)),
+                        help="Serving processes sharing the port (SO_REUSEPORT); 0 = one per core.")
+    parser.add_argument("--latency", default=os.getenv("TARGET_LATENCY", "none"),
+                        help="none | fixed:MS | uniform:MIN:MAX | exponential:MEAN | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("TARGET_ERROR_RATE", 0)),
+                        help="Fraction of requests answered with --error-status.")
+    parser.add_argument("--error-status", type=int, default=int(os.getenv("TARGET_ERROR_STATUS", 503)))
+    parser.add_argument("--drop-rate", type=float, default=float(os.getenv("TARGET_DROP_RATE", 0)),
+                        help="Fraction of requests whose connection is reset without a response.")
+    parser.add_argument("--username", default=USERNAME)
+    parser.add_argument("--password", default=PASSWORD)
+    options = parser.parse_args()
+    parse_latency(options.latency)
+
+    processes = options.processes or os.cpu_count() or 1
+    if processes > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("[WARN] SO_REUSEPORT is not available on this platform, serving from one process")
+        processes = 1
+    print(f"Serving http://{options.host}:{options.port}/practice-test-login/ "
+          f"({processes} process(es), latency {options.latency}, errors {options.error_rate:g}, "
+          f"drops {options.drop_rate:g})")
+    if processes == 1:
+        serve(options.host, options.port, build_site(options))
+        return
+    workers = [multiprocessing.Process(target=serve_worker, args=(options.host, options.port, options), daemon=True)
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    # Terminating the parent (e.g. from a benchmark harness) must not orphan the workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()